@@ -1,19 +1,96 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, abort, send_from_directory, send_file
+import shutil
+import threading
+from flask import Flask, Response, render_template, request, redirect, url_for, abort, send_from_directory, jsonify
 # Original line might still work with yours: from pii_redactor import pii_redactor 
 # Replace all instances of PiiRedactor with pii_redactor if yours no longer works
 from modules.pii_redactor import PiiRedactor
-from io import BytesIO
-import zipfile
+from modules.jobs import Job, JobQueue, load_job
+from modules.workspace import WorkspaceStore
+from modules.cache import ResultCache
+from modules.zipstream import stream_zip
+from modules import metrics
+from modules.spacy import memo_stats
+from modules.windows import WINDOW_OVERLAP, WINDOW_SIZE
+from werkzeug.utils import secure_filename
 
-redactor = PiiRedactor()
+# Redacted outputs of files seen before, RESULT_CACHE_DIR adds a disk tier shared by every worker
+result_cache = ResultCache(
+    max_items = int(os.environ.get('RESULT_CACHE_ITEMS', 128)),
+    max_bytes = int(os.environ.get('RESULT_CACHE_MB', 64)) * 1024 * 1024,
+    disk_path = os.environ.get('RESULT_CACHE_DIR') or None,
+    disk_max_bytes = int(os.environ.get('RESULT_CACHE_DISK_MB', 1024)) * 1024 * 1024,
+    disk_ttl = float(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 3600))
+)
+
+# NER tier for this deployment (trf, lg, md, sm or regex), requests can pick another one of
+# NER_TIERS (comma separated, every tier whose model is installed by default). Each tier picked
+# loads its model in every worker, so list only those the workers have the memory for.
+# Batching for the NLP model, every page and file in a request is fed through `nlp.pipe`,
+# texts longer than NER_WINDOW_SIZE characters in windows with NER_WINDOW_OVERLAP of context.
+# PDFs of more than PDF_CHUNK_SIZE pages are split across PDF_WORKERS processes (per gunicorn
+# worker) when it's above 1, PDF_CHUNK_SIZE pages per task.
+# Redacted PDFs are saved with PDF_GARBAGE (0-4), PDF_CLEAN and PDF_DEFLATE (0 or 1).
+# REGEX_PATTERN_TIMEOUT and REGEX_DOCUMENT_TIMEOUT are the seconds one regex pattern and all of
+# them may spend on a text or PDF page (0 for no limit), so pathological input can't pin a worker.
+# Running out of either fails the document rather than returning it partly redacted
+redactor = PiiRedactor(
+    tier = os.environ.get('NER_TIER', 'trf'),
+    tiers = [ tier.strip() for tier in os.environ['NER_TIERS'].split(',') ] if os.environ.get('NER_TIERS') else None,
+    batch_size = int(os.environ.get('NLP_BATCH_SIZE', 8)),
+    n_process = int(os.environ.get('NLP_N_PROCESS', 1)),
+    ner_window_size = int(os.environ.get('NER_WINDOW_SIZE', WINDOW_SIZE)),
+    ner_window_overlap = int(os.environ.get('NER_WINDOW_OVERLAP', WINDOW_OVERLAP)),
+    pdf_workers = int(os.environ.get('PDF_WORKERS', 1)),
+    pdf_chunk_size = int(os.environ.get('PDF_CHUNK_SIZE', 16)),
+    pdf_garbage = int(os.environ.get('PDF_GARBAGE', 3)),
+    pdf_clean = os.environ.get('PDF_CLEAN', '1') == '1',
+    pdf_deflate = os.environ.get('PDF_DEFLATE', '1') == '1',
+    regex_pattern_timeout = float(os.environ.get('REGEX_PATTERN_TIMEOUT', 0)) or None,
+    regex_document_timeout = float(os.environ.get('REGEX_DOCUMENT_TIMEOUT', 0)) or None,
+    cache = result_cache,
+    load = False
+)
+
+# With PRELOAD_MODEL=1 (the default) the model is loaded at import, which under gunicorn's
+# preload_app (see gunicorn.conf.py) happens once in the master, and the forked workers share
+# it copy-on-write. It's only run after the fork, inference starts thread pools that can
+# deadlock a forked child: gunicorn.conf.py sets WARM_UP_AFTER_FORK=1 and warms up every
+# worker once it's forked. Otherwise (PRELOAD_MODEL=0 loads the model in every worker) it's
+# warmed up in the background here. /readyz fails until it's done
+def warm_up_in_background():
+    threading.Thread(target=redactor.warm_up, name="model-warm-up", daemon=True).start()
+
+if os.environ.get('PRELOAD_MODEL', '1') == '1':
+    redactor.load()
+
+if os.environ.get('WARM_UP_AFTER_FORK') != '1':
+    warm_up_in_background()
+
+# Per stage, per pattern and per page timings served on /metrics, METRICS_ENABLED=0 turns them off.
+# Every gunicorn worker process keeps its own
+metrics.registry.enabled = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# Uploads are redacted in the background, at most JOB_WORKERS at a time with up to
+# JOB_QUEUE_DEPTH more waiting, each stopped once it has run JOB_TIMEOUT seconds (0 for no
+# limit). The deadline is checked between files, PDF pages and NLP batches
+jobs = JobQueue(
+    workers = int(os.environ.get('JOB_WORKERS', 2)),
+    max_queued = int(os.environ.get('JOB_QUEUE_DEPTH', 16)),
+    timeout = float(os.environ.get('JOB_TIMEOUT', 600)),
+    ttl = float(os.environ.get('WORKSPACE_TTL', 3600))
+)
 
 app=Flask(__name__)
 
 # Files can be up to 16MB
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+# Except text sent to /upload-large, which is streamed to disk and redacted in chunks
+app.config['MAX_LARGE_CONTENT_LENGTH'] = int(os.environ.get('MAX_LARGE_UPLOAD_MB', 1024)) * 1024 * 1024
 # Allow these files
 app.config['UPLOAD_EXTENSIONS'] = ['.txt', '.pdf', '.docx']
+# Only plain text can be redacted in chunks
+app.config['LARGE_UPLOAD_EXTENSIONS'] = ['.txt']
 # Send files to upload folder
 app.config['UPLOAD_PATH'] = 'uploads/'
 app.config['RESULT_PATH'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
@@ -21,72 +98,303 @@ app.config['RESULT_PATH'] = os.path.join(os.path.dirname(os.path.abspath(__file_
 os.makedirs(app.config['UPLOAD_PATH'], exist_ok=True)
 os.makedirs(app.config['RESULT_PATH'], exist_ok=True)
 
+# Every request gets its own upload and result folders (and its job's state), deleted
+# WORKSPACE_TTL seconds after their last change. Nothing is shared between requests
+# or kept in memory only, so any number of gunicorn workers and threads can serve them
+workspaces = WorkspaceStore(app.config['UPLOAD_PATH'], app.config['RESULT_PATH'], ttl=float(os.environ.get('WORKSPACE_TTL', 3600)))
+# When gunicorn preloads the app, the cleanup thread runs in the master, forked workers don't inherit it
+workspaces.start_cleanup(interval=float(os.environ.get('WORKSPACE_CLEANUP_INTERVAL', 60)))
+
+def split_upload_name(filename: str, default: str) -> tuple[str, str]:
+    """
+    Splits an uploaded file's name into a safe stem to name its outputs
+    after and its lower-cased extension. The extension comes from the name
+    as uploaded: `secure_filename()` drops non-ASCII characters, which turns
+    "报告.pdf" into "pdf" without an extension.
+
+    Parameters:
+        filename:   The name the file was uploaded with
+        default:    Stem used when nothing of the uploaded one is safe to keep
+
+    Returns:
+        name:       The safe stem and the extension, with its dot
+    """
+    stem, ext = os.path.splitext(filename)
+
+    return secure_filename(stem) or default, ext.lower()
+
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', ner_tiers=redactor.tiers, default_tier=redactor.tier)
 
 @app.route('/', methods=['POST'])
 def upload_files():
-    # Clears files every run
-    for filename in os.listdir(app.config['RESULT_PATH']):
-        file_path = os.path.join(app.config['RESULT_PATH'], filename)
-        if os.path.isfile(file_path):
-            os.remove(file_path)
+    # Let the request pick a faster/more accurate NER tier than the default
+    tier = request.form.get('ner_tier') or redactor.tier
+    if tier not in redactor.tiers:
+        abort(400)
+
+    if jobs.is_full():
+        return queue_full()
 
-    redacted_text = None
     redacted_files = []
+    # (data, file type) of everything to redact, done in one batch straight from memory
+    items = []
    
     text_input = request.form.get('text_input')
+    text_output = None
     if text_input and text_input.strip():
-        text_input_file_path = os.path.join(app.config['UPLOAD_PATH'], 'text_input.txt')
-        with open(text_input_file_path, 'w', encoding='utf-8') as file:
-            file.write(text_input)
-        output_path = os.path.join(app.config['RESULT_PATH'], 'text_input_redacted.txt') 
-        redactor.redact_wrapper(text_input_file_path, output_path)
-        with open(output_path, 'r', encoding='utf-8') as file:
-            redacted_text = file.read()
-        redacted_files.append('text_input_redacted.txt')
+        items.append((text_input, 'txt'))
+        text_output = 'text_input_redacted.txt'
+        redacted_files.append(text_output)
 
     for uploaded_file in request.files.getlist('file'):
         if uploaded_file.filename:
-            file_path = os.path.join(app.config['UPLOAD_PATH'], uploaded_file.filename)
-            uploaded_file.save(file_path)
+            name, ext = split_upload_name(uploaded_file.filename, f"upload_{len(redacted_files) + 1}")
+            if ext not in app.config['UPLOAD_EXTENSIONS']:
+                abort(400)
+
+            items.append((uploaded_file.read(), ext[1:]))
+            redacted_files.append(f"{name}_redacted{ext}")
+
+    workspace = workspaces.create()
+
+    def run(job: Job) -> dict:
+        with metrics.report() as report:
+            results = redactor.redact_data(items, tier=tier, progress=job.progress)
+
+        # Only the redacted outputs are written, to be downloaded later
+        for redacted_filename, result in zip(redacted_files, results):
+            output_path = os.path.join(workspace.result_path, redacted_filename)
+            if isinstance(result, bytes):
+                with open(output_path, 'wb') as file:
+                    file.write(result)
+            else:
+                with open(output_path, 'w', encoding='utf-8') as file:
+                    file.write(result)
 
-            name, ext = os.path.splitext(uploaded_file.filename)
-            redacted_filename = f"{name}_redacted{ext}"
-            output_path = os.path.join(app.config['RESULT_PATH'], redacted_filename)
+        return { 'text_output': text_output, 'redacted_files': redacted_files, 'report': report.to_dict() }
 
-            redactor.redact_wrapper(file_path, output_path)
-            redacted_files.append(redacted_filename)
+    if jobs.submit(workspace.id, run, total=len(items), path=workspace.state_path) is None:
+        workspaces.remove(workspace)
+        return queue_full()
+
+    return redirect(url_for('job_page', job_id=workspace.id), code=303)
+
+def queue_full():
+    return 'Too many redaction jobs are queued, please try again shortly.', 503, { 'Retry-After': '30' }
+
+def get_job(job_id):
+    workspace = get_workspace(job_id)
+
+    # The job may be running in another worker process, its saved state is used then
+    job = jobs.get(job_id) or load_job(workspace.state_path)
+    if job is None:
+        abort(404)
+    return job
+
+def get_workspace(job_id):
+    workspace = workspaces.get(job_id)
+    if workspace is None:
+        abort(404)
+    return workspace
+
+@app.route('/jobs')
+def job_stats():
+    return jsonify(jobs.get_stats())
+
+@app.route('/cache')
+def cache_stats():
+    # Result cache, then the memos of entity verdicts and patterns shared across documents
+    return jsonify({ **result_cache.get_stats(), 'memo': memo_stats() })
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the worker is up and answering, warm or not
+    return jsonify({ 'status': 'ok' })
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: the default tier's model is loaded and has run once
+    if not redactor.is_warm():
+        return jsonify({ 'status': 'warming up' }), 503
+
+    return jsonify({ 'status': 'ready', 'tier': redactor.tier })
+
+@app.route('/metrics')
+def metrics_page():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/jobs/<job_id>')
+def job_page(job_id):
+    job = get_job(job_id)
+
+    # Shows the progress until the job is done, then its results
+    if job.get_status() != 'done':
+        return render_template('job.html', job=job)
+
+    redacted_text = None
+    if job.result['text_output']:
+        with open(os.path.join(get_workspace(job_id).result_path, job.result['text_output']), 'r', encoding='utf-8') as file:
+            redacted_text = file.read()
 
     return render_template(
         'results.html',
+        job_id=job_id,
         redacted_text=redacted_text,
-        redacted_files=redacted_files
+        redacted_files=job.result['redacted_files']
     )
 
-@app.route('/download-all')
-def download_all():
-    memory_file = BytesIO()
-    with zipfile.ZipFile(memory_file, 'w') as zf: 
-        # Iterate over every file in /results
-        for filename in os.listdir(app.config['RESULT_PATH']):
-            file_path = os.path.join(app.config['RESULT_PATH'], filename)
-            if os.path.isfile(file_path):
-                # arcname will keep whatever filename in the zip, this can be changed
-                zf.write(file_path, arcname=filename)
-    memory_file.seek(0)
-    return send_file(
-        memory_file,
+@app.route('/jobs/<job_id>/status')
+def job_status(job_id):
+    job = get_job(job_id)
+    status = job.to_dict()
+
+    if job.get_status() == 'done':
+        status['redacted_files'] = [ url_for('download_file', job_id=job_id, filename=file) for file in job.result['redacted_files'] ]
+        status['report'] = job.result.get('report')
+
+    return jsonify(status)
+
+@app.route('/api/redact', methods=['POST'])
+def api_redact():
+    # A batch of texts redacted in one call and one NLP pass, e.g.
+    # {"texts": ["Call John Doe at 555-123-4567", ...], "ner_tier": "sm"} -> {"texts": ["Call [NAME] at [PHONE]", ...]}
+    # With "report": true the timings of the call are returned too
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        abort(400)
+
+    texts = body.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        abort(400)
+
+    tier = body.get('ner_tier') or redactor.tier
+    if tier not in redactor.tiers:
+        abort(400)
+
+    # Runs in the request, but still backs off while the job queue is full
+    if jobs.is_full():
+        return queue_full()
+
+    if not body.get('report'):
+        return jsonify({ 'texts': redactor.redact_data([ (text, 'txt') for text in texts ], tier=tier) })
+
+    with metrics.report() as report:
+        results = redactor.redact_data([ (text, 'txt') for text in texts ], tier=tier)
+
+    return jsonify({ 'texts': results, 'report': report.to_dict() })
+
+@app.route('/api/scan', methods=['POST'])
+def api_scan():
+    # Finds PII without redacting anything, in JSON texts like /api/redact or in uploaded
+    # files (form field "file", .txt, .pdf or .docx). "first_hit" stops each document at
+    # its first finding, e.g. {"texts": ["Call John Doe"], "first_hit": true} ->
+    # {"results": [{"pii": true, "findings": [{"category": "ner", "label": "[NAME]", "start": 5, "end": 13}]}]}
+    files = [ uploaded_file for uploaded_file in request.files.getlist('file') if uploaded_file.filename ]
+
+    if files:
+        options = request.form
+        items = []
+        names = []
+
+        for uploaded_file in files:
+            name, ext = split_upload_name(uploaded_file.filename, f"upload_{len(names) + 1}")
+            if ext not in app.config['UPLOAD_EXTENSIONS']:
+                abort(400)
+
+            items.append( (uploaded_file.read(), ext[1:]) )
+            names.append(f"{name}{ext}")
+    else:
+        options = request.get_json(silent=True)
+        if not isinstance(options, dict):
+            abort(400)
+
+        texts = options.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            abort(400)
+
+        items = [ (text, 'txt') for text in texts ]
+        names = None
+
+    tier = options.get('ner_tier') or redactor.tier
+    if tier not in redactor.tiers:
+        abort(400)
+
+    # Form fields are strings, JSON ones booleans
+    first_hit = options.get('first_hit') in (True, '1', 'true')
+
+    if jobs.is_full():
+        return queue_full()
+
+    results = redactor.scan_data(items, tier=tier, first_hit=first_hit)
+
+    if names is not None:
+        results = [ { 'filename': name, **result } for name, result in zip(names, results) ]
+
+    return jsonify({ 'results': results })
+
+@app.route('/upload-large', methods=['POST', 'PUT'])
+def upload_large():
+    # Raw text body instead of a form, e.g.
+    # curl -T export.log "http://localhost:5000/upload-large?filename=export.txt"
+    # then poll the returned status URL and download the result from it once done
+    request.max_content_length = app.config['MAX_LARGE_CONTENT_LENGTH']
+
+    tier = request.args.get('ner_tier') or redactor.tier
+    if tier not in redactor.tiers:
+        abort(400)
+
+    name, ext = split_upload_name(request.args.get('filename', 'large_input.txt'), 'large_input')
+    if ext not in app.config['LARGE_UPLOAD_EXTENSIONS']:
+        abort(400)
+
+    filename = f"{name}{ext}"
+
+    if jobs.is_full():
+        return queue_full()
+
+    workspace = workspaces.create()
+
+    # Copy the body to disk in blocks rather than holding it in memory
+    input_path = os.path.join(workspace.upload_path, filename)
+    with open(input_path, 'wb') as file:
+        shutil.copyfileobj(request.stream, file, 1024 * 1024)
+
+    redacted_filename = f"{name}_redacted{ext}"
+    output_path = os.path.join(workspace.result_path, redacted_filename)
+
+    def run(job: Job) -> dict:
+        # The job only has one step, but the timeout is still checked after every chunk
+        with metrics.report() as report:
+            redactor.redact_text_stream(input_path, output_path, tier=tier, progress=lambda written: job.progress(0))
+
+        job.progress(1)
+        return { 'text_output': None, 'redacted_files': [ redacted_filename ], 'report': report.to_dict() }
+
+    if jobs.submit(workspace.id, run, total=1, path=workspace.state_path) is None:
+        workspaces.remove(workspace)
+        return queue_full()
+
+    return jsonify({ 'id': workspace.id, 'status_url': url_for('job_status', job_id=workspace.id) }), 202
+
+@app.route('/jobs/<job_id>/download-all')
+def download_all(job_id):
+    workspace = get_workspace(job_id)
+    # arcname will keep whatever filename in the zip, this can be changed
+    files = [ (os.path.join(workspace.result_path, filename), filename) for filename in workspace.get_result_files() ]
+
+    # The zip is sent as it's built, chunk by chunk, instead of being put together in memory first
+    return Response(
+        stream_zip(files),
         mimetype = 'application/zip',
-        as_attachment = True,
-        download_name = 'redacted_files.zip'
+        headers = { 'Content-Disposition': 'attachment; filename=redacted_files.zip' }
     )
 
 
-@app.route('/download/<filename>')
-def download_file(filename):
-    return send_from_directory(app.config['RESULT_PATH'], filename, as_attachment=True)
+@app.route('/jobs/<job_id>/download/<filename>')
+def download_file(job_id, filename):
+    return send_from_directory(get_workspace(job_id).result_path, filename, as_attachment=True)
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,203 @@
+"""
+Synthetic PII corpus for the benchmarks.
+
+Documents are filler prose with PII mixed in at a configurable density,
+covering what the regex patterns and the NER model look for: SSNs, phone
+numbers, emails, driver license numbers, names with and without honorifics
+and dates in several formats. The same seed always gives the same corpus,
+so runs on different machines or commits redact exactly the same input.
+
+Usage (from the repository root):
+    python -m benchmarks.corpus OUTPUT_FOLDER [--docs 10] [--size-kb 64] [--density 0.2] [--formats txt pdf docx] [--seed 0]
+"""
+import argparse
+import os
+import random
+import docx
+import pymupdf as fitz
+
+FILLER = (
+    "the patient was seen in clinic today for a follow up visit and reported feeling better "
+    "since the last appointment with no new complaints about sleep appetite or energy levels "
+    "the care team reviewed the medication list and discussed the plan for the coming weeks "
+    "including lab work a referral and a reminder to schedule the next routine check in "
+    "records were updated and a copy of the summary was sent to the primary office"
+).split()
+
+FIRST_NAMES = [ "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "David", "Elizabeth", "Maria", "Wei", "Aisha", "Carlos", "Priya", "Olga" ]
+LAST_NAMES = [ "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez", "Nguyen", "Okafor", "Kowalski", "Haddad", "Tanaka", "Novak" ]
+HONORIFICS = [ "Mr.", "Mrs.", "Ms.", "Dr.", "Mx." ]
+MONTHS = [ "January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December" ]
+DOMAINS = [ "example.com", "mail.example.org", "clinic.example.net" ]
+
+# Lines per PDF page and the font they are written in
+PDF_LINES_PER_PAGE = 60
+PDF_FONT_SIZE = 9
+
+def _name(rng: random.Random) -> str:
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    return f"{rng.choice(HONORIFICS)} {name}" if rng.random() < 0.4 else name
+
+
+def _date(rng: random.Random) -> str:
+    year, month, day = rng.randint(1940, 2024), rng.randint(1, 12), rng.randint(1, 28)
+
+    return rng.choice([
+        f"{month:02d}/{day:02d}/{year}",
+        f"{MONTHS[month - 1]} {day}, {year}",
+        f"{day} {MONTHS[month - 1]} {year}",
+        f"{year}-{month:02d}-{day:02d}",
+    ])
+
+
+def _driver_license(rng: random.Random) -> str:
+    letter = chr(rng.randint(ord("A"), ord("Z")))
+
+    return rng.choice([
+        f"{letter}{rng.randint(0, 9999999):07d}",
+        f"{letter}{rng.randint(0, 99999999):08d}",
+        f"{rng.randint(0, 999999999):09d}",
+    ])
+
+
+def pii_sentence(rng: random.Random) -> str:
+    """
+    Returns a sentence carrying one random piece of PII, next to the label
+    a real document would put it behind.
+    """
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+
+    return rng.choice([
+        lambda: f"SSN: {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}.",
+        lambda: f"Call {_name(rng)} at ({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(1000, 9999)}.",
+        lambda: f"Phone {rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)} is on file.",
+        lambda: f"Contact email {first.lower()}.{last.lower()}@{rng.choice(DOMAINS)} for questions.",
+        lambda: f"Driver License: {_driver_license(rng)} was verified.",
+        lambda: f"{_name(rng)} was seen by {_name(rng)} today.",
+        lambda: f"Date of birth {_date(rng)}, admitted on {_date(rng)}.",
+    ])()
+
+
+def generate_text(size: int, density: float, seed: int = 0) -> str:
+    """
+    Generates a document of about `size` characters.
+
+    Parameters:
+        size:       Characters to generate, the last line may go a little over
+        density:    Share of sentences (0 to 1) that carry a piece of PII
+        seed:       Seed of the generator, the same seed gives the same text
+
+    Returns:
+        text:       Lines of a few sentences each
+    """
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+
+    while length < size:
+        sentences = []
+
+        for _ in range(rng.randint(2, 5)):
+            if rng.random() < density:
+                sentences.append(pii_sentence(rng))
+            else:
+                words = rng.sample(FILLER, rng.randint(6, 14))
+                sentences.append(" ".join(words).capitalize() + ".")
+
+        line = " ".join(sentences)
+        lines.append(line)
+        length += len(line) + 1
+
+    return "\n".join(lines) + "\n"
+
+
+def write_pdf(text: str, output_file: str):
+    """
+    Writes the text to a PDF, `PDF_LINES_PER_PAGE` wrapped lines a page.
+    """
+    doc = fitz.open()
+    lines = []
+
+    # Wrapped at a width that fits the page in the built-in Helvetica
+    for line in text.splitlines():
+        while len(line) > 110:
+            cut = line.rfind(" ", 0, 110)
+            cut = cut if cut > 0 else 110
+            lines.append(line[:cut])
+            line = line[cut:].lstrip()
+
+        lines.append(line)
+
+    for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+        page = doc.new_page()
+
+        for i, line in enumerate(lines[start:start + PDF_LINES_PER_PAGE]):
+            page.insert_text( (40, 50 + i * (PDF_FONT_SIZE + 3)), line, fontsize=PDF_FONT_SIZE )
+
+    doc.save(output_file, garbage=3, deflate=True)
+
+
+def write_docx(text: str, output_file: str):
+    """
+    Writes the text to a DOCX, a paragraph per line.
+    """
+    document = docx.Document()
+
+    for line in text.splitlines():
+        document.add_paragraph(line)
+
+    document.save(output_file)
+
+
+def generate_corpus(folder: str, *, docs: int = 10, size: int = 64 * 1024, density: float = 0.2, formats: tuple[str, ...] = ("txt", "pdf", "docx"), seed: int = 0) -> dict[str, list[str]]:
+    """
+    Writes `docs` documents in each format to `folder`. Document `i` has
+    the same text in every format.
+
+    Returns:
+        paths:      The paths of the documents written, by format
+    """
+    os.makedirs(folder, exist_ok=True)
+    paths = { file_type: [] for file_type in formats }
+
+    for i in range(docs):
+        text = generate_text(size, density, seed + i)
+
+        for file_type in formats:
+            path = os.path.join(folder, f"doc_{i:04d}.{file_type}")
+
+            match file_type:
+                case "txt":
+                    with open(path, "w") as file:
+                        file.write(text)
+                case "pdf":
+                    write_pdf(text, path)
+                case "docx":
+                    write_docx(text, path)
+                case _:
+                    raise Exception(f"Unknown corpus format `{file_type}`, expected txt, pdf or docx")
+
+            paths[file_type].append(path)
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PII corpus")
+    parser.add_argument("output", help="Folder to write the documents to")
+    parser.add_argument("--docs", type=int, default=10, help="Documents per format")
+    parser.add_argument("--size-kb", type=int, default=64, help="Size of each document's text")
+    parser.add_argument("--density", type=float, default=0.2, help="Share of sentences carrying PII")
+    parser.add_argument("--formats", nargs="+", default=[ "txt", "pdf", "docx" ], choices=[ "txt", "pdf", "docx" ])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.output, docs=args.docs, size=args.size_kb * 1024, density=args.density, formats=args.formats, seed=args.seed)
+
+    for file_type, files in paths.items():
+        print(f"{len(files)} {file_type} files in {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+DOCX redaction vs plain text redaction of the same content.
+
+Builds a large .docx out of the sample .txt files in `uploads/` (every line a
+paragraph, runs split mid-word with mixed formatting, every few paragraphs a
+table of the same lines), saves the text the DOCX path extracts from it as a
+.txt, and times `redact_docx()` against `redact_text()` over the two. Both
+see the same text, so the difference is the cost of reading and rewriting
+the document.
+
+Usage (from the repository root):
+    python -m benchmarks.docx_vs_text [--tier regex] [--copies 50] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+import docx
+from modules.docx import DocxText
+from modules.pii_redactor import PiiRedactor
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+def build_docx(lines: list[str], copies: int, output_file: str):
+    document = docx.Document()
+
+    for copy in range(copies):
+        for i, line in enumerate(lines):
+            paragraph = document.add_paragraph()
+
+            # Split every line over a few runs so replacements cross run boundaries
+            for j, start in enumerate(range(0, len(line), 7)):
+                run = paragraph.add_run(line[start:start + 7])
+                run.bold = j % 3 == 0
+                run.italic = j % 3 == 1
+
+            if i % 20 == 19:
+                table = document.add_table(rows=2, cols=2)
+
+                for k, cell in enumerate(table._cells):
+                    cell.text = lines[(i + k) % len(lines)]
+
+    document.save(output_file)
+
+
+def time_redaction(redact, input_file: str, output_file: str, repeat: int) -> float:
+    start = time.perf_counter()
+
+    for _ in range(repeat):
+        redact(input_file, output_file)
+
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DOCX redaction against the text path")
+    parser.add_argument("--tier", default="regex", choices=PiiRedactor.NER_TIERS)
+    parser.add_argument("--inputs", default=UPLOADS, help="Folder of .txt files to build the document from")
+    parser.add_argument("--copies", type=int, default=50, help="Times the sample text is repeated in the document")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lines = []
+    for path in sorted(glob.glob(os.path.join(args.inputs, "*.txt"))):
+        with open(path, "r") as file:
+            lines.extend( line for line in file.read().splitlines() if line.strip() )
+
+    if not lines:
+        raise SystemExit(f"No .txt files with text in {args.inputs}")
+
+    redactor = PiiRedactor(tier=args.tier)
+
+    with tempfile.TemporaryDirectory() as folder:
+        docx_file = os.path.join(folder, "large.docx")
+        txt_file = os.path.join(folder, "large.txt")
+        build_docx(lines, args.copies, docx_file)
+
+        with open(docx_file, "rb") as file:
+            text = DocxText(file.read()).get_text()
+
+        with open(txt_file, "w") as file:
+            file.write(text)
+
+        docx_seconds = time_redaction(redactor.redact_docx, docx_file, os.path.join(folder, "redacted.docx"), args.repeat)
+        txt_seconds = time_redaction(redactor.redact_text, txt_file, os.path.join(folder, "redacted.txt"), args.repeat)
+
+        mb = len(text.encode("utf-8")) / 2**20
+        paragraphs = text.count("\n")
+
+    print(f"Tier `{args.tier}`, {paragraphs} paragraphs, {mb:.2f} MB of text")
+    print("")
+    print("| Path | Seconds | MB/s | Paragraphs/s |")
+    print("|------|--------:|-----:|-------------:|")
+
+    for name, seconds in (("docx", docx_seconds), ("text", txt_seconds)):
+        print(f"| {name} | {seconds:.2f} | {mb / seconds:.2f} | {paragraphs / seconds:.0f} |")
+
+    print("")
+    print(f"DOCX overhead: {docx_seconds / txt_seconds:.1f}x the text path")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Cost of the driver license pattern.
+
+The US driver license formats are one list of ~37 patterns, mostly bare
+runs of digits. They run as a single alternation factored by common
+prefixes, only right after a license label, and only on texts the keyword
+index finds a label in. This compares, on the synthetic corpus, the time
+`RegexRedactor.find_spans()` spends on that pattern (from its timing
+report) with the time of every format run naively on its own, and the
+matches each finds.
+
+Usage (from the repository root):
+    python -m benchmarks.driver_license [--docs 10] [--size-kb 256] [--density 0.2] [--repeat 3]
+"""
+import argparse
+import time
+import regex as re
+from benchmarks.corpus import generate_text
+from modules import metrics
+from modules.regex import RegexRedactor
+
+REPLACE = "[DRIVER LICENSE #]"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the driver license pattern against its formats run naively")
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--size-kb", type=int, default=256, help="Size of each document's text")
+    parser.add_argument("--density", type=float, default=0.2, help="Share of sentences carrying PII")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    redactor = RegexRedactor()
+    formats = next( pattern for pattern, replace, *_ in redactor.get_regex_patterns() if replace == REPLACE )
+    naive = [ re.compile(pattern, re.M) for pattern in formats ]
+
+    texts = [ generate_text(args.size_kb * 1024, args.density, args.seed + i) for i in range(args.docs) ]
+    mb = sum( len(text.encode("utf-8")) for text in texts ) * args.repeat / 2**20
+
+    total = gated = naive_seconds = 0.0
+    gated_matches = naive_matches = 0
+
+    for _ in range(args.repeat):
+        for text in texts:
+            with metrics.report() as report:
+                start = time.perf_counter()
+                redactor.find_spans(text)
+                total += time.perf_counter() - start
+
+            for entry in report.to_dict()["patterns"]:
+                if entry["pattern"] == REPLACE:
+                    gated += entry["seconds"]
+                    gated_matches += entry["matches"]
+
+            start = time.perf_counter()
+            naive_matches += sum( 1 for pattern in naive for _ in pattern.finditer(text) )
+            naive_seconds += time.perf_counter() - start
+
+    print(f"{args.docs} documents of {args.size_kb} KB, PII density {args.density}, {len(formats)} license formats")
+    print("")
+    print("| Run | ms per MB | Share of `find_spans()` | Matches |")
+    print("|-----|----------:|------------------------:|--------:|")
+    print(f"| `find_spans()`, every pattern | {total * 1000 / mb:.1f} | 100% | - |")
+    print(f"| License pattern, gated | {gated * 1000 / mb:.2f} | {gated / total:.1%} | {gated_matches} |")
+    print(f"| License formats, naive | {naive_seconds * 1000 / mb:.1f} | {naive_seconds / total:.0%} | {naive_matches} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Accuracy vs throughput of the NER tiers over the files in `uploads/`.
+
+Every tier redacts the same .txt files and PDFs. Throughput is measured
+end to end through `PiiRedactor`, and entity accuracy is the agreement of
+each tier's PERSON/DATE entities with the most accurate tier that could be
+loaded (so the reference tier always scores 1.0). Tiers whose model isn't
+installed are skipped, by default every installed tier runs.
+
+Usage (from the repository root):
+    python -m benchmarks.ner_tiers [--tiers trf sm regex] [--repeat 3] [--output table.md]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+import pymupdf as fitz
+from modules.pii_redactor import PiiRedactor
+from modules.spacy import SpacyRedactor
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+LABELS = { "PERSON", "DATE" }
+
+def rss_mb() -> float | None:
+    """
+    Current resident set size of this process in MB (Linux only).
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return None
+
+
+def load_inputs(folder: str) -> tuple[list[str], list[str], list[str]]:
+    """
+    Returns the .txt paths, the PDF paths and the texts the NER model
+    sees for them (whole .txt files and the word text of every PDF page).
+    """
+    txt_paths = sorted(glob.glob(os.path.join(folder, "*.txt")))
+    pdf_paths = sorted(glob.glob(os.path.join(folder, "*.pdf")))
+    texts = []
+
+    for path in txt_paths:
+        with open(path, "r") as file:
+            texts.append(file.read())
+
+    for path in pdf_paths:
+        for page in fitz.open(path):
+            texts.append( " ".join( [w[4] for w in page.get_text("words")] ) )
+
+    return txt_paths, pdf_paths, texts
+
+
+def entities(redactor: PiiRedactor, texts: list[str]) -> set[tuple]:
+    spacy = redactor.get_spacy()
+
+    if spacy is None:
+        return set()
+
+    found = set()
+    for i, nlp_doc in enumerate(spacy.create_nlp_docs(texts)):
+        found.update( (i, ent.start_char, ent.end_char, ent.label_) for ent in nlp_doc.ents if ent.label_ in LABELS )
+
+    return found
+
+
+def score(found: set[tuple], reference: set[tuple]) -> tuple[float, float, float]:
+    if not reference:
+        return 1.0, 1.0, 1.0
+
+    hits = len(found & reference)
+    precision = hits / len(found) if found else 0.0
+    recall = hits / len(reference)
+    f1 = 2 * precision * recall / (precision + recall) if hits else 0.0
+
+    return precision, recall, f1
+
+
+def benchmark(tier: str, txt_paths: list[str], pdf_paths: list[str], texts: list[str], repeat: int) -> dict | None:
+    if tier != "regex" and tier not in SpacyRedactor.installed_tiers():
+        return None
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    redactor = PiiRedactor(tier=tier)
+
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    pages = len(texts) - len(txt_paths)
+    n_bytes = sum( len(text.encode("utf-8")) for text in texts )
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+
+        for _ in range(repeat):
+            for path in txt_paths:
+                redactor.redact_text(path, os.path.join(output_dir, os.path.basename(path)))
+
+            for path in pdf_paths:
+                redactor.redact_pdf(path, os.path.join(output_dir, os.path.basename(path)))
+
+        seconds = (time.perf_counter() - start) / repeat
+
+    return {
+        "tier": tier,
+        "load_s": load_seconds,
+        "rss_mb": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        "docs_per_s": (len(txt_paths) + pages) / seconds,
+        "mb_per_s": n_bytes / 2**20 / seconds,
+        "entities": entities(redactor, texts),
+    }
+
+
+def format_table(results: list[dict]) -> str:
+    reference = results[0]
+    rows = [
+        f"Reference tier for entity accuracy: `{reference['tier']}`",
+        "",
+        "| Tier | Load (s) | Model RSS (MB) | Pages+files/s | MB/s | Speedup | Precision | Recall | F1 |",
+        "|------|---------:|---------------:|--------------:|-----:|--------:|----------:|-------:|---:|",
+    ]
+
+    for result in results:
+        rss = f"{result['rss_mb']:.0f}" if result["rss_mb"] is not None else "-"
+        speedup = result["docs_per_s"] / reference["docs_per_s"]
+
+        if result["tier"] == "regex":
+            accuracy = "- | - | -"
+        else:
+            accuracy = " | ".join( f"{value:.2f}" for value in score(result["entities"], reference["entities"]) )
+
+        rows.append( f"| {result['tier']} | {result['load_s']:.1f} | {rss} | {result['docs_per_s']:.2f} | {result['mb_per_s']:.3f} | {speedup:.1f}x | {accuracy} |" )
+
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NER tiers over the sample uploads")
+    parser.add_argument("--tiers", nargs="+", default=[ *SpacyRedactor.installed_tiers(), "regex" ], choices=PiiRedactor.NER_TIERS)
+    parser.add_argument("--inputs", default=UPLOADS, help="Folder of .txt and .pdf files to redact")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Also write the markdown table to this file")
+    args = parser.parse_args()
+
+    txt_paths, pdf_paths, texts = load_inputs(args.inputs)
+    results = []
+
+    for tier in args.tiers:
+        result = benchmark(tier, txt_paths, pdf_paths, texts, args.repeat)
+
+        if result is None:
+            print(f"Skipping `{tier}`: model not installed")
+            continue
+
+        results.append(result)
+
+    if not results:
+        raise SystemExit("No tier could be loaded")
+
+    table = format_table(results)
+    print(table)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(table + "\n")
+
+
+if __name__ == "__main__":
+    main()
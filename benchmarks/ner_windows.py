@@ -0,0 +1,82 @@
+"""
+NER on long texts, whole vs in windows.
+
+Runs the model on synthetic texts of growing length the way it ran before
+(the whole text in one call, up to `nlp.max_length`) and in windows fed by
+length, and reports the time, the time per MB (flat when it scales
+linearly), the peak memory Python allocated, and how many of the whole
+text's entities the windows found at the same offsets.
+
+Usage (from the repository root):
+    python -m benchmarks.ner_windows [--tier sm] [--sizes-kb 64 256 960 4096] [--window-size 8192] [--window-overlap 512]
+"""
+import argparse
+import time
+import tracemalloc
+from benchmarks.corpus import generate_text
+from modules.spacy import SpacyRedactor
+from modules.windows import WINDOW_OVERLAP, WINDOW_SIZE, split_windows
+
+# spaCy's default `nlp.max_length`, the longest text the model takes whole
+MAX_LENGTH = 1_000_000
+
+def run(redactor: SpacyRedactor, text: str) -> tuple[float, float, set]:
+    """
+    Returns:
+        result:     Seconds, peak MB allocated (in a second, traced run)
+                    and the (start, end, label) of every entity
+    """
+    start = time.perf_counter()
+    nlp_doc = redactor.create_nlp_doc(text)
+    seconds = time.perf_counter() - start
+    entities = { (ent.start_char, ent.end_char, ent.label_) for ent in nlp_doc.ents }
+    del nlp_doc
+
+    tracemalloc.start()
+    redactor.create_nlp_doc(text)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+
+    return seconds, peak, entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark NER on long texts, whole vs in windows")
+    parser.add_argument("--tier", default="sm", choices=SpacyRedactor.MODELS)
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[64, 256, 960, 4096], help="Text sizes to run")
+    parser.add_argument("--window-size", type=int, default=WINDOW_SIZE)
+    parser.add_argument("--window-overlap", type=int, default=WINDOW_OVERLAP)
+    parser.add_argument("--density", type=float, default=0.2, help="Share of sentences carrying PII")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The whole text is one window as long as it fits the model
+    whole = SpacyRedactor(args.tier, window_size=MAX_LENGTH, window_overlap=0)
+    windowed = SpacyRedactor(args.tier, window_size=args.window_size, window_overlap=args.window_overlap)
+
+    print(f"Tier {args.tier}, windows of {args.window_size} characters with {args.window_overlap} of overlap")
+    print("")
+    print("| Text (KB) | Windows | Whole (s) | Whole (s/MB) | Whole peak (MB) | Windowed (s) | Windowed (s/MB) | Windowed peak (MB) | Entities found |")
+    print("|----------:|--------:|----------:|-------------:|----------------:|-------------:|----------------:|-------------------:|---------------:|")
+
+    for size_kb in args.sizes_kb:
+        text = generate_text(size_kb * 1024, args.density, args.seed)
+        mb = len(text) / 2**20
+        windows = len(split_windows(text, args.window_size, args.window_overlap))
+        seconds, peak, entities = run(windowed, text)
+
+        # Longer texts don't fit the model in one call
+        if len(text) <= MAX_LENGTH:
+            whole_seconds, whole_peak, whole_entities = run(whole, text)
+            found = len(entities & whole_entities) / max(1, len(whole_entities))
+            whole_row = f"{whole_seconds:.2f} | {whole_seconds / mb:.2f} | {whole_peak:.1f}"
+            found_row = f"{found:.2%}"
+        else:
+            whole_row = "- | - | -"
+            found_row = "-"
+
+        print(f"| {size_kb} | {windows} | {whole_row} | {seconds:.2f} | {seconds / mb:.2f} | {peak:.1f} | {found_row} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Drawing black boxes vs true redaction of PDFs.
+
+The rectangles to redact are found once per PDF, then applied two ways:
+`draw`, the old approach of one `page.draw_rect()` per rectangle, and
+`redact`, `redact_rects()` with one redaction pass per page. Each is timed
+together with saving the document, and for each the output size and the
+number of redacted words still extractable from the output are reported.
+
+Usage (from the repository root):
+    python -m benchmarks.pdf_redaction [--tier regex] [--garbage 3] [--no-clean] [--repeat 3]
+"""
+import argparse
+import glob
+import os
+import time
+import pymupdf as fitz
+from modules.pii_redactor import PiiRedactor
+from modules.words import redact_rects
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+
+def draw(page: fitz.Page, rects: list[fitz.Rect]):
+    for r in rects:
+        page.draw_rect(r, fill=(0,0,0), overlay=True)
+
+
+def redacted_words(input_file: str, page_rects: list[list[fitz.Rect]]) -> list[list[str]]:
+    """
+    Returns the words of every page that lie under one of its rectangles.
+    """
+    words = []
+
+    for page, rects in zip(fitz.open(input_file), page_rects):
+        words.append( [ w[4] for w in page.get_text("words") if any( fitz.Rect(w[:4]).intersect(r).get_area() > fitz.Rect(w[:4]).get_area() / 2 for r in rects ) ] )
+
+    return words
+
+
+def leaked(output: bytes, page_rects: list[list[fitz.Rect]], words: list[list[str]]) -> int:
+    """
+    Counts the redacted words whose text can still be extracted from under
+    the rectangles.
+    """
+    count = 0
+
+    for page, rects, page_words in zip(fitz.open(stream=output, filetype="pdf"), page_rects, words):
+        found = [ w[4] for w in page.get_text("words") if any( fitz.Rect(w[:4]).intersect(r).get_area() > fitz.Rect(w[:4]).get_area() / 2 for r in rects ) ]
+        count += sum( 1 for word in page_words if word in found )
+
+    return count
+
+
+def benchmark(apply, input_file: str, page_rects: list[list[fitz.Rect]], save_options: dict, repeat: int) -> tuple[float, bytes]:
+    seconds = 0.0
+
+    for _ in range(repeat):
+        doc = fitz.open(input_file)
+        start = time.perf_counter()
+
+        for page, rects in zip(doc, page_rects):
+            apply(page, rects)
+
+        output = doc.tobytes(**save_options)
+        seconds += time.perf_counter() - start
+
+    return seconds / repeat, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark drawn boxes against true PDF redaction")
+    parser.add_argument("--tier", default="regex", choices=PiiRedactor.NER_TIERS)
+    parser.add_argument("--inputs", default=UPLOADS, help="Folder of .pdf files to redact")
+    parser.add_argument("--garbage", type=int, default=3, choices=range(5))
+    parser.add_argument("--no-clean", dest="clean", action="store_false")
+    parser.add_argument("--no-deflate", dest="deflate", action="store_false")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    redactor = PiiRedactor(tier=args.tier)
+    save_options = { "garbage": args.garbage, "clean": args.clean, "deflate": args.deflate }
+
+    print(f"Tier `{args.tier}`, saved with {save_options}")
+    print("")
+    print("| PDF | Pages | Rects | Method | Seconds | Output KB | Leaked words |")
+    print("|-----|------:|------:|--------|--------:|----------:|-------------:|")
+
+    for input_file in sorted(glob.glob(os.path.join(args.inputs, "*.pdf"))):
+        page_rects = redactor.find_pdf_rects(input_file)
+        words = redacted_words(input_file, page_rects)
+        name = os.path.basename(input_file)
+        n_rects = sum( len(rects) for rects in page_rects )
+
+        for method, apply in (("draw", draw), ("redact", redact_rects)):
+            seconds, output = benchmark(apply, input_file, page_rects, save_options, args.repeat)
+
+            print(f"| {name} | {len(page_rects)} | {n_rects} | {method} | {seconds:.3f} | {len(output) / 1024:.0f} | {leaked(output, page_rects, words)} |")
+
+
+if __name__ == "__main__":
+    main()
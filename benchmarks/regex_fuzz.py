@@ -0,0 +1,173 @@
+"""
+Worst-case input fuzzing of the regex patterns.
+
+Every pattern of `RegexRedactor` is run on adversarial inputs at two
+sizes: runs of a short unit (letters, digits, spaces, separators and their
+mixes) that patterns with nested or unbounded quantifiers can backtrack
+over, alone or behind the pattern's own label literals (so label-anchored
+patterns actually start matching) and ending in a character that makes the
+match fail. How a pattern's time grows from the small input to the large one
+gives its growth exponent, 1 for linear and 2 for quadratic. Any pattern
+above `--max-exponent` on its worst input (once it takes long enough to
+time reliably) or running out of `--timeout` fails the run with status 1.
+The patterns of `KNOWN` are reported but only fail with `--strict`, the
+per-pattern and per-document time budgets of `RegexRedactor` bound them.
+
+Usage (from the repository root):
+    python -m benchmarks.regex_fuzz [--size 2000] [--growth 4] [--max-exponent 1.5] [--timeout 2] [--top 15] [--strict] [--pattern "[EMAIL]" ...]
+"""
+import argparse
+import math
+import time
+from modules.keywords import required_literals
+from modules.regex import RegexRedactor
+
+# Units repeated into the adversarial inputs
+UNITS = [
+    "a", "A", "1", " ", "a ", "A ", "1 ", "a1", "A1 ", "a,", "a, ", "Aa, ", "1-", "1.", "a.", "a-", "1/",
+    "-", ".", "_", "@", "a@", ":", "#", "\t", "\n", "a\n", "ab.", "a:",
+]
+
+# Appended to every input so matches fail at the very end
+TERMINATOR = "!"
+
+# Quadratic in how many of their starts share a line or a run of characters, they
+# can't be rewritten to stop retrying them without matching something else
+KNOWN = {
+    "[USER AGENT ID]":  "retries the rest of the line from every label on it",
+    "[PASSPORT #] 2":   "retries the rest of the line from every \"passport\" on it",
+}
+
+def inputs(pattern: str, size: int) -> dict[str, str]:
+    """
+    Builds the adversarial inputs of about `size` characters for a pattern.
+
+    Returns:
+        inputs:     Input by a short description of how it's made
+    """
+    labels = sorted(required_literals(pattern) or [], key=len)[:3]
+    result = {}
+
+    for unit in UNITS:
+        run = unit * (size // len(unit))
+        result[f"{unit!r} * n"] = run + TERMINATOR
+
+        for label in labels:
+            result[f"{label!r} + {unit!r} * n"] = f"{label} {run}{TERMINATOR}"
+
+            # Many labels each followed by a short run, every one a new start
+            repeated = f"{label} {unit * 8}{TERMINATOR} "
+            result[f"({label!r} + {unit!r} * 8) * n"] = repeated * max(1, size // len(repeated))
+
+    return result
+
+
+def run_time(pattern, text: str, timeout: float, repeat: int) -> float | None:
+    """
+    Best time of `repeat` runs of the pattern over `text`, None when it
+    ran out of `timeout` seconds.
+    """
+    best = math.inf
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        try:
+            for _ in pattern.finditer(text, timeout=timeout):
+                pass
+        except TimeoutError:
+            return None
+
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def fuzz(pattern, size: int, growth: int, timeout: float, repeat: int, floor: float) -> dict:
+    """
+    Returns:
+        worst:      The pattern's worst input, its times at both sizes and
+                    growth exponent, `timeout` True if it ran out of time
+    """
+    small = inputs(pattern.pattern, size)
+    large = inputs(pattern.pattern, size * growth)
+    worst = None
+
+    for name in small:
+        large_time = run_time(pattern, large[name], timeout, 1)
+
+        if large_time is None:
+            return { "input": name, "small_s": None, "large_s": None, "exponent": math.inf, "timeout": True }
+
+        # Only inputs slow enough to tell apart from noise are timed properly
+        if worst is not None and large_time <= worst["large_s"]:
+            continue
+
+        small_time = run_time(pattern, small[name], timeout, repeat)
+        large_time = run_time(pattern, large[name], timeout, repeat)
+
+        if small_time is None or large_time is None:
+            return { "input": name, "small_s": small_time, "large_s": large_time, "exponent": math.inf, "timeout": True }
+
+        exponent = math.log(max(large_time, 1e-9) / max(small_time, 1e-9), growth) if large_time >= floor else 1.0
+        worst = { "input": name, "small_s": small_time, "large_s": large_time, "exponent": exponent, "timeout": False }
+
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed worst-case inputs to every regex pattern and check its time grows linearly")
+    parser.add_argument("--size", type=int, default=2000, help="Characters of the small inputs")
+    parser.add_argument("--growth", type=int, default=4, help="How many times larger the large inputs are")
+    parser.add_argument("--max-exponent", type=float, default=1.5, help="Growth exponent above which a pattern fails, 1 is linear")
+    parser.add_argument("--timeout", type=float, default=2.0, help="Seconds a pattern may take on one input before it fails")
+    parser.add_argument("--floor", type=float, default=0.005, help="Seconds on the large input below which a pattern counts as linear")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Slowest patterns to list besides the failures")
+    parser.add_argument("--strict", action="store_true", help="Also fail on the known superlinear patterns")
+    parser.add_argument("--pattern", action="append", help="Only fuzz patterns of this name, e.g. \"[EMAIL]\" (repeatable)")
+    args = parser.parse_args()
+
+    redactor = RegexRedactor()
+    results = []
+
+    for name, (pattern, _) in zip(redactor.get_pattern_names(), redactor.get_compiled_patterns()):
+        if args.pattern and name not in args.pattern:
+            continue
+
+        results.append( (name, fuzz(pattern, args.size, args.growth, args.timeout, args.repeat, args.floor)) )
+
+    slow = [ name for name, worst in results if worst["timeout"] or worst["exponent"] > args.max_exponent ]
+    failed = [ name for name in slow if args.strict or name not in KNOWN ]
+    results.sort(key=lambda item: (not item[1]["timeout"], -(item[1]["large_s"] or 0)))
+
+    print(f"{len(results)} patterns, inputs of {args.size} and {args.size * args.growth} characters")
+    print("")
+    print("| Pattern | Worst input | Small (ms) | Large (ms) | Exponent | |")
+    print("|---------|-------------|-----------:|-----------:|---------:|-|")
+
+    for name, worst in results:
+        if name not in slow and results.index((name, worst)) >= args.top:
+            continue
+
+        small = f"{worst['small_s'] * 1000:.2f}" if worst["small_s"] is not None else "-"
+        large = f"{worst['large_s'] * 1000:.2f}" if worst["large_s"] is not None else f"> {args.timeout * 1000:.0f}"
+        status = "timeout" if worst["timeout"] else ("FAIL" if name in failed else ("known" if name in slow else "ok"))
+        print(f"| {name} | `{worst['input']}` | {small} | {large} | {worst['exponent']:.2f} | {status} |")
+
+    print("")
+
+    for name in slow:
+        if name not in failed:
+            print(f"Known: {name} {KNOWN[name]}")
+
+    if not failed:
+        print(f"Every other pattern grows at most with exponent {args.max_exponent}" if slow else f"Every pattern grows at most with exponent {args.max_exponent}")
+        return
+
+    print(f"{len(failed)} patterns grow faster than exponent {args.max_exponent} or time out: {', '.join(failed)}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Cold start time and per-worker memory of the app under gunicorn, with the
+model preloaded in the master (PRELOAD_MODEL=1) and loaded by every worker
+(PRELOAD_MODEL=0).
+
+For each mode gunicorn is started with `gunicorn.conf.py` and timed until
+`/readyz` answers 200 many times in a row (so every worker is warm), then
+the RSS, PSS (shared pages split between the processes sharing them) and
+private memory of the master and every worker are read from /proc. PSS is
+what a worker really costs when pages are shared copy-on-write.
+
+Linux only, gunicorn has to be installed.
+
+Usage (from the repository root):
+    python -m benchmarks.startup [--tier sm] [--workers 4]
+"""
+import argparse
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def memory_mb(pid: int) -> dict[str, float]:
+    """
+    RSS, PSS and private memory of a process in MB, from /proc/<pid>/smaps_rollup.
+    """
+    values = {}
+
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) / 1024
+
+    return {
+        "rss": values.get("Rss", 0.0),
+        "pss": values.get("Pss", 0.0),
+        "private": values.get("Private_Clean", 0.0) + values.get("Private_Dirty", 0.0),
+    }
+
+
+def children(pid: int) -> list[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return [ int(child) for child in file.read().split() ]
+
+
+def wait_ready(url: str, workers: int, timeout: float) -> float:
+    """
+    Polls `/readyz` until it answers 200 enough times in a row that every
+    worker has most likely answered.
+
+    Returns:
+        seconds:    Time until then
+    """
+    start = time.perf_counter()
+    streak = 0
+
+    while streak < workers * 10:
+        if time.perf_counter() - start > timeout:
+            raise Exception(f"The app wasn't ready after {timeout} seconds")
+
+        try:
+            with urllib.request.urlopen(url, timeout=5) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+            time.sleep(0.05)
+
+    return time.perf_counter() - start
+
+
+def measure(preload: bool, tier: str, workers: int, port: int, timeout: float) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        env = {
+            **os.environ,
+            "PRELOAD_MODEL": "1" if preload else "0",
+            "NER_TIER": tier,
+            "WEB_CONCURRENCY": str(workers),
+            "PORT": str(port),
+            # Nothing lingers in the repository's folders
+            "RESULT_CACHE_DIR": "",
+        }
+        process = subprocess.Popen(
+            [ sys.executable, "-m", "gunicorn", "app:app" ],
+            cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+        try:
+            seconds = wait_ready(f"http://127.0.0.1:{port}/readyz", workers, timeout)
+            master = memory_mb(process.pid)
+            worker_memory = [ memory_mb(pid) for pid in children(process.pid) ]
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+    average = lambda key: sum( memory[key] for memory in worker_memory ) / len(worker_memory)
+
+    return {
+        "mode": "preload" if preload else "per worker",
+        "ready_s": seconds,
+        "master_rss": master["rss"],
+        "worker_rss": average("rss"),
+        "worker_pss": average("pss"),
+        "worker_private": average("private"),
+        "total_pss": master["pss"] + sum( memory["pss"] for memory in worker_memory ),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold start and per-worker memory under gunicorn")
+    parser.add_argument("--tier", default="trf")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    if shutil.which("gunicorn") is None:
+        raise SystemExit("gunicorn isn't installed")
+
+    print(f"Tier `{args.tier}`, {args.workers} workers")
+    print("")
+    print("| Mode | Ready (s) | Master RSS (MB) | Worker RSS (MB) | Worker PSS (MB) | Worker private (MB) | Total PSS (MB) |")
+    print("|------|----------:|----------------:|----------------:|----------------:|--------------------:|---------------:|")
+
+    for preload in (False, True):
+        result = measure(preload, args.tier, args.workers, args.port, args.timeout)
+        print(f"| {result['mode']} | {result['ready_s']:.1f} | {result['master_rss']:.0f} | {result['worker_rss']:.0f} | {result['worker_pss']:.0f} | {result['worker_private']:.0f} | {result['total_pss']:.0f} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Offline benchmark suite over a synthetic PII corpus.
+
+Generates a corpus with `benchmarks.corpus` (or reuses one) and measures,
+for each stage:
+
+    text    `redact_text()` end to end on the .txt files
+    pdf     `redact_pdf()` end to end on the PDFs
+    docx    `redact_docx()` end to end on the DOCX files
+    regex   `RegexRedactor.find_spans()` alone on the .txt texts
+    ner     the NLP model and `SpacyRedactor.find_spans()` alone on the .txt texts
+
+throughput (documents or pages per second, MB of text per second), p50/p99
+latency per document and peak RSS. Every stage runs in a fresh process so
+its peak RSS is its own. Results can be saved as a baseline and later runs
+compared against it, any stage slower or bigger than the threshold allows
+is reported as a regression and makes the run exit with status 1.
+
+Usage (from the repository root):
+    python -m benchmarks.suite [--tier regex] [--docs 10] [--size-kb 64] [--density 0.2] [--save baseline.json]
+    python -m benchmarks.suite --compare baseline.json [--threshold 0.1]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.corpus import generate_corpus
+
+STAGES = [ "text", "pdf", "docx", "regex", "ner" ]
+
+# Metrics where higher is better, every other one is better lower
+HIGHER_IS_BETTER = { "docs_per_s", "pages_per_s", "mb_per_s" }
+
+def percentile(values: list[float], share: float) -> float:
+    """
+    Nearest-rank percentile of `values`, `share` between 0 and 1.
+    """
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak / 2**20 if platform.system() == "Darwin" else peak / 1024
+
+
+def run_stage(stage: str, tier: str, paths: list[str], repeat: int) -> dict:
+    """
+    Runs one stage over its documents in the calling (fresh) process.
+
+    Returns:
+        result:     The stage's metrics, or its reason for being skipped
+    """
+    import pymupdf as fitz
+    from modules.docx import DocxText
+    from modules.pii_redactor import PiiRedactor
+
+    redactor = PiiRedactor(tier=tier)
+    spacy = redactor.get_spacy()
+
+    if stage == "ner" and spacy is None:
+        return { "skipped": "no NER on the regex tier" }
+
+    texts = []
+    pages = 0
+
+    for path in paths:
+        match stage:
+            case "pdf":
+                with fitz.open(path) as doc:
+                    texts.append( "".join( page.get_text() for page in doc ) )
+                    pages += len(doc)
+            case "docx":
+                with open(path, "rb") as file:
+                    texts.append(DocxText(file.read()).get_text())
+            case _:
+                with open(path, "r") as file:
+                    texts.append(file.read())
+
+    honorifics_pattern = redactor.regex.get_honorifics_pattern()
+    latencies = []
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(repeat):
+            for path, text in zip(paths, texts):
+                output_path = os.path.join(output_dir, os.path.basename(path))
+                start = time.perf_counter()
+
+                match stage:
+                    case "text":
+                        redactor.redact_text(path, output_path)
+                    case "pdf":
+                        redactor.redact_pdf(path, output_path)
+                    case "docx":
+                        redactor.redact_docx(path, output_path)
+                    case "regex":
+                        redactor.regex.find_spans(text)
+                    case "ner":
+                        nlp_doc = spacy.create_nlp_docs([ text ])[0]
+                        spacy.find_spans(honorifics_pattern, text, nlp_doc)
+
+                latencies.append(time.perf_counter() - start)
+
+    seconds = sum(latencies)
+    mb = sum( len(text.encode("utf-8")) for text in texts ) * repeat / 2**20
+
+    result = {
+        "docs": len(paths),
+        "docs_per_s": len(paths) * repeat / seconds,
+        "mb_per_s": mb / seconds,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    if stage == "pdf":
+        result["pages_per_s"] = pages * repeat / seconds
+
+    return result
+
+
+def run_suite(stages: list[str], tier: str, paths: dict[str, list[str]], repeat: int) -> dict[str, dict]:
+    results = {}
+
+    for stage in stages:
+        stage_paths = paths[{ "pdf": "pdf", "docx": "docx" }.get(stage, "txt")]
+
+        # Spawned rather than forked so nothing this process loaded counts towards the stage's RSS
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[stage] = pool.submit(run_stage, stage, tier, stage_paths, repeat).result()
+
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], threshold: float) -> list[str]:
+    """
+    Compares every metric with the baseline's.
+
+    Returns:
+        regressions:    A line per metric worse than the baseline by more
+                        than `threshold` (a share, 0.1 for 10%)
+    """
+    regressions = []
+
+    for stage, result in results.items():
+        base = baseline.get(stage)
+
+        if base is None or "skipped" in result or "skipped" in base:
+            continue
+
+        for metric, value in result.items():
+            if metric == "docs" or metric not in base or not base[metric]:
+                continue
+
+            change = (value - base[metric]) / base[metric]
+
+            if metric in HIGHER_IS_BETTER:
+                change = -change
+
+            if change > threshold:
+                regressions.append( f"{stage} {metric}: {base[metric]:.2f} -> {value:.2f} ({change:+.0%} worse)" )
+
+    return regressions
+
+
+def format_table(results: dict[str, dict], baseline: dict[str, dict] | None) -> str:
+    rows = [
+        "| Stage | Docs/s | Pages/s | MB/s | p50 (ms) | p99 (ms) | Peak RSS (MB) |",
+        "|-------|-------:|--------:|-----:|---------:|---------:|--------------:|",
+    ]
+
+    for stage, result in results.items():
+        if "skipped" in result:
+            rows.append( f"| {stage} | skipped: {result['skipped']} | | | | | |" )
+            continue
+
+        base = (baseline or {}).get(stage, {})
+        cells = []
+
+        for metric in ("docs_per_s", "pages_per_s", "mb_per_s", "p50_ms", "p99_ms", "peak_rss_mb"):
+            if metric not in result:
+                cells.append("-")
+            elif base.get(metric):
+                cells.append( f"{result[metric]:.2f} ({(result[metric] - base[metric]) / base[metric]:+.0%})" )
+            else:
+                cells.append( f"{result[metric]:.2f}" )
+
+        rows.append( f"| {stage} | " + " | ".join(cells) + " |" )
+
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the redaction stages on a synthetic PII corpus")
+    parser.add_argument("--tier", default="regex", help="NER tier, `regex` skips the ner stage")
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--corpus", help="Folder to generate the corpus in (or reuse it from), a temporary one by default")
+    parser.add_argument("--docs", type=int, default=10, help="Documents per format")
+    parser.add_argument("--size-kb", type=int, default=64, help="Size of each document's text")
+    parser.add_argument("--density", type=float, default=0.2, help="Share of sentences carrying PII")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Save the results as a baseline to this file")
+    parser.add_argument("--compare", help="Baseline file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Share a metric may be worse than the baseline by")
+    args = parser.parse_args()
+
+    config = { "tier": args.tier, "docs": args.docs, "size_kb": args.size_kb, "density": args.density, "seed": args.seed }
+    baseline = None
+
+    if args.compare:
+        with open(args.compare, "r") as file:
+            saved = json.load(file)
+
+        if saved["config"] != config:
+            print(f"Warning: the baseline was run with {saved['config']}, not {config}")
+
+        baseline = saved["results"]
+
+    with tempfile.TemporaryDirectory() as folder:
+        corpus = args.corpus or folder
+        formats = [ "txt" ] + [ file_type for file_type in ("pdf", "docx") if file_type in args.stages ]
+        paths = generate_corpus(corpus, docs=args.docs, size=args.size_kb * 1024, density=args.density, formats=formats, seed=args.seed)
+
+        results = run_suite(args.stages, args.tier, paths, args.repeat)
+
+    print(f"Tier `{args.tier}`, {args.docs} documents of {args.size_kb} KB per format, PII density {args.density}")
+    print("")
+    print(format_table(results, baseline))
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({ "config": config, "results": results }, file, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        print("")
+
+        if not regressions:
+            print(f"No regressions beyond {args.threshold:.0%}")
+            return
+
+        print(f"Regressions beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
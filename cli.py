@@ -0,0 +1,88 @@
+"""
+Command line entry point for redacting files outside the Flask app.
+
+Usage (from the repository root):
+    python cli.py batch INPUT_DIR OUTPUT_DIR [--tier trf] [--workers N] [--manifest PATH] [--force] [--quiet]
+    python cli.py tail INPUT_FILE OUTPUT_FILE [--tier trf] [--checkpoint PATH] [--follow] [--interval 1]
+"""
+import argparse
+import sys
+from modules.batch import EXTENSIONS, BatchRunner
+from modules.pii_redactor import PiiRedactor
+from modules.tail import TailRedactor
+
+def batch(args: argparse.Namespace):
+    runner = BatchRunner(
+        args.input, args.output,
+        tier = args.tier,
+        workers = args.workers,
+        manifest_path = args.manifest,
+        extensions = args.extensions,
+        force = args.force
+    )
+
+    def progress(entry: dict):
+        if entry["status"] == "done":
+            if not args.quiet:
+                print(f"done    {entry['path']} ({entry['seconds']:.2f}s)")
+        else:
+            print(f"failed  {entry['path']}: {entry['error']}", file=sys.stderr)
+
+    summary = runner.run(progress)
+
+    print("")
+    print(f"{summary['files']} files: {summary['done']} redacted, {summary['skipped']} already done, {summary['failed']} failed")
+    print(f"{summary['mb']:.1f} MB in {summary['seconds']:.1f}s: {summary['files_per_s']:.2f} files/s, {summary['mb_per_s']:.2f} MB/s ({summary['worker_seconds']:.1f}s of worker time)")
+
+    if summary["failed"]:
+        raise SystemExit(1)
+
+
+def tail(args: argparse.Namespace):
+    follower = TailRedactor(PiiRedactor(tier=args.tier), args.input, args.output, checkpoint_path=args.checkpoint)
+
+    def progress(result: dict):
+        print(f"{result['read']} bytes redacted, {args.input} done up to byte {result['offset']}")
+
+    if not args.follow:
+        progress(follower.update())
+        return
+
+    try:
+        follower.follow(args.interval, progress)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redact PII from files")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # Whole folder trees, resumable
+    batch_parser = commands.add_parser("batch", help="Redact every file of a folder tree into a mirrored output tree")
+    batch_parser.add_argument("input", help="Folder to redact the files of, recursively")
+    batch_parser.add_argument("output", help="Folder to write the redacted files to")
+    batch_parser.add_argument("--tier", default="trf", choices=PiiRedactor.NER_TIERS, help="NER tier")
+    batch_parser.add_argument("--workers", type=int, help="Worker processes, each loads the model once (default: CPU count)")
+    batch_parser.add_argument("--manifest", help="Manifest of the files done, used to resume (default: OUTPUT/.redaction-manifest.jsonl)")
+    batch_parser.add_argument("--extensions", nargs="+", default=EXTENSIONS, help="File extensions to redact")
+    batch_parser.add_argument("--force", action="store_true", help="Redo files the manifest has as done")
+    batch_parser.add_argument("--quiet", action="store_true", help="Only report failures and the summary")
+    batch_parser.set_defaults(handler=batch)
+
+    # Growing files (logs), only what's appended since the last run
+    tail_parser = commands.add_parser("tail", help="Redact what was appended to a file since the last run, appending to the output")
+    tail_parser.add_argument("input", help="Text file to redact, e.g. a log")
+    tail_parser.add_argument("output", help="Redacted file to append to")
+    tail_parser.add_argument("--tier", default="trf", choices=PiiRedactor.NER_TIERS, help="NER tier")
+    tail_parser.add_argument("--checkpoint", help="Checkpoint of the offsets reached (default: OUTPUT.checkpoint.json)")
+    tail_parser.add_argument("--follow", action="store_true", help="Keep redacting what's appended until interrupted")
+    tail_parser.add_argument("--interval", type=float, default=1.0, help="Seconds between checks with --follow")
+    tail_parser.set_defaults(handler=tail)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
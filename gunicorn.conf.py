@@ -0,0 +1,31 @@
+# Gunicorn settings, read from the working directory when gunicorn starts
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import the app, and with it load the NER model, once in the master. Workers are
+# forked from it and share the model's memory copy-on-write instead of each loading
+# their own copy. PRELOAD_MODEL=0 goes back to loading per worker
+preload_app = os.environ.get('PRELOAD_MODEL', '1') == '1'
+
+# The model must not run before the fork (torch and OpenMP thread pools don't survive
+# it), so the preloaded app leaves warming up to `post_fork()`
+if preload_app:
+    os.environ['WARM_UP_AFTER_FORK'] = '1'
+
+def when_ready(server):
+    # Everything loaded so far is moved out of the garbage collector's reach, so
+    # collections in the workers don't touch (and copy) the pages they share
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    # Every worker runs the shared model once, in the background so it answers /healthz
+    if preload_app:
+        import app
+        app.warm_up_in_background()
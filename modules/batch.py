@@ -0,0 +1,295 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+# File types the batch runner redacts, like the ones the app accepts
+EXTENSIONS = [ ".txt", ".pdf", ".docx" ]
+
+MANIFEST_NAME = ".redaction-manifest.jsonl"
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Record of the files a batch run has handled, one JSON line appended per
+    file, so a run that's interrupted loses at most the files in flight. The
+    last line about a file wins, a half-written last line is ignored.
+    """
+    def __init__(self, path: str):
+        """
+        Parameters:
+            path:   The JSON lines file, created if it doesn't exist
+        """
+        self.__path = path
+        self.__entries: dict[str, dict] = {}
+        lines = 0
+
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+
+                    self.__entries[entry["path"]] = entry
+                    lines += 1
+
+        # Superseded lines are dropped once they make up most of the file
+        if lines > 2 * len(self.__entries):
+            self.__compact()
+
+        self.__file = open(path, "a")
+
+    def get(self, path: str) -> dict | None:
+        return self.__entries.get(path)
+
+    def get_entries(self) -> dict[str, dict]:
+        return self.__entries
+
+    def record(self, entry: dict):
+        """
+        Records the outcome of a file, `entry["path"]` being its path
+        relative to the input folder.
+        """
+        self.__entries[entry["path"]] = entry
+        self.__file.write(json.dumps(entry) + "\n")
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
+
+    def __compact(self):
+        # Written next to the file then renamed over it, so a crash keeps the old one
+        tmp_path = f"{self.__path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            for entry in self.__entries.values():
+                file.write(json.dumps(entry) + "\n")
+
+        os.replace(tmp_path, self.__path)
+
+
+class BatchRunner:
+    """
+    Redacts every file of a folder tree into a mirrored output tree with a
+    pool of worker processes, each loading the model once. Every file's
+    outcome goes to a manifest, files already redacted with the same tier,
+    patterns and model (the redactor's fingerprint) and unchanged since are
+    skipped, so an interrupted run picks up where it stopped. A worker dying
+    fails the file it was redacting, the run goes on with new workers.
+    """
+    def __init__(self, input_dir: str, output_dir: str, *, tier: str = "trf", workers: int | None = None, manifest_path: str | None = None, extensions: list[str] | None = None, force: bool = False):
+        """
+        Parameters:
+            input_dir:      Folder to redact the files of, recursively
+            output_dir:     Folder the redacted files are written to, at the
+                            same relative paths
+            tier:           NER tier, one of `PiiRedactor.NER_TIERS`
+            workers:        Number of worker processes, defaults to the CPU count
+            manifest_path:  JSON lines manifest, `MANIFEST_NAME` in the output folder by default
+            extensions:     File extensions to redact, `EXTENSIONS` by default.
+                            Matched regardless of case
+            force:          Whether to redo files the manifest has as done
+        """
+        if not os.path.isdir(input_dir):
+            raise Exception(f"The input folder doesn't exist: {input_dir}")
+
+        self.__input_dir = os.path.abspath(input_dir)
+        self.__output_dir = os.path.abspath(output_dir)
+        self.__tier = tier
+        self.__workers = workers or os.cpu_count() or 1
+        self.__manifest_path = manifest_path or os.path.join(self.__output_dir, MANIFEST_NAME)
+        self.__extensions = [ ext.lower() for ext in extensions or EXTENSIONS ]
+        self.__force = force
+        self.__pool: ProcessPoolExecutor | None = None
+
+    def find_files(self) -> list[str]:
+        """
+        Returns:
+            paths:      Paths relative to the input folder of every file to
+                        redact, sorted. The output folder is left out when
+                        it's inside the input folder
+        """
+        paths = []
+
+        for folder, dirs, files in os.walk(self.__input_dir):
+            dirs[:] = sorted( d for d in dirs if os.path.join(folder, d) != self.__output_dir )
+
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in self.__extensions:
+                    paths.append(os.path.relpath(os.path.join(folder, name), self.__input_dir))
+
+        return paths
+
+    def run(self, progress: Callable[[dict], None] | None = None) -> dict:
+        """
+        Redacts every file not already done.
+
+        Parameters:
+            progress:   Called with the manifest entry of every file once it's
+                        done or has failed
+
+        Returns:
+            summary:    Files done, skipped and failed, input MB and wall
+                        seconds of this run, with the throughput they give
+        """
+        progress = progress or (lambda entry: None)
+        os.makedirs(self.__output_dir, exist_ok=True)
+        manifest = Manifest(self.__manifest_path)
+        start = time.perf_counter()
+        summary = { "files": 0, "done": 0, "skipped": 0, "failed": 0, "bytes": 0, "worker_seconds": 0.0 }
+
+        self.__pool = self.__create_pool()
+
+        try:
+            # Only a worker has the model loaded to tell what it would redact with
+            fingerprint = self.__pool.submit(_get_fingerprint).result()
+            pending = []
+
+            for path in self.find_files():
+                summary["files"] += 1
+
+                if self.__is_done(manifest, path, fingerprint):
+                    summary["skipped"] += 1
+                else:
+                    pending.append(path)
+
+            if pending:
+                self.__redact(manifest, pending, fingerprint, summary, progress)
+        finally:
+            self.__pool.shutdown(cancel_futures=True)
+            self.__pool = None
+            manifest.close()
+
+        summary["seconds"] = time.perf_counter() - start
+        summary["mb"] = summary.pop("bytes") / 2**20
+        summary["files_per_s"] = summary["done"] / summary["seconds"] if summary["seconds"] else 0.0
+        summary["mb_per_s"] = summary["mb"] / summary["seconds"] if summary["seconds"] else 0.0
+
+        return summary
+
+    def __create_pool(self) -> ProcessPoolExecutor:
+        # Spawned rather than forked so workers don't inherit this process' threads
+        return ProcessPoolExecutor(
+            max_workers=self.__workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_batch_worker,
+            initargs=(self.__tier,),
+        )
+
+    def __is_done(self, manifest: Manifest, path: str, fingerprint: str) -> bool:
+        entry = manifest.get(path)
+
+        if self.__force or entry is None or entry["status"] != "done" or entry["tier"] != self.__tier:
+            return False
+
+        # Redacted with other patterns or another model (or before they were recorded)
+        if entry.get("fingerprint") != fingerprint:
+            return False
+
+        if not os.path.exists(os.path.join(self.__output_dir, path)):
+            return False
+
+        stat = os.stat(os.path.join(self.__input_dir, path))
+
+        if (stat.st_size, stat.st_mtime) == (entry["size"], entry["mtime"]):
+            return True
+
+        # Touched but maybe not changed, only the hash tells
+        if file_hash(os.path.join(self.__input_dir, path)) != entry["sha256"]:
+            return False
+
+        manifest.record({ **entry, "size": stat.st_size, "mtime": stat.st_mtime })
+
+        return True
+
+    def __redact(self, manifest: Manifest, paths: list[str], fingerprint: str, summary: dict, progress: Callable[[dict], None]):
+        queue = iter(paths)
+        running: dict[Future, tuple[str, os.stat_result]] = {}
+        # Files that were in flight when a worker died
+        suspects: list[str] = []
+
+        while True:
+            # Suspects are retried one at a time, so the file that kills a worker fails alone.
+            # Otherwise a few files per worker are in flight, so huge trees aren't all queued up front
+            limit = 1 if suspects else 2 * self.__workers
+
+            while len(running) < limit and (path := suspects.pop(0) if suspects else next(queue, None)) is not None:
+                stat = os.stat(os.path.join(self.__input_dir, path))
+                future = self.__pool.submit(_redact_file, os.path.join(self.__input_dir, path), os.path.join(self.__output_dir, path))
+                running[future] = (path, stat)
+
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            # A worker dying (crashing, or killed for its memory) breaks the pool and every
+            # file in flight comes back broken with it, the rest of the files go to a new pool
+            if any( isinstance(future.exception(), BrokenProcessPool) for future in finished ):
+                finished, _ = wait(running)
+                broken = [ future for future in finished if isinstance(future.exception(), BrokenProcessPool) ]
+
+                # With several in flight it's not known which one it was, they're all retried
+                # rather than failed. One that broke the pool alone is failed below
+                if len(broken) > 1:
+                    suspects += [ running.pop(future)[0] for future in broken ]
+
+                self.__pool.shutdown(cancel_futures=True)
+                self.__pool = self.__create_pool()
+
+            for future in finished:
+                if future not in running:
+                    continue
+
+                path, stat = running.pop(future)
+                entry = { "path": path, "tier": self.__tier, "fingerprint": fingerprint, "size": stat.st_size, "mtime": stat.st_mtime, "finished": time.time() }
+
+                try:
+                    entry.update(future.result(), status="done")
+                    summary["done"] += 1
+                    summary["bytes"] += stat.st_size
+                    summary["worker_seconds"] += entry["seconds"]
+                except Exception as e:
+                    entry.update(status="failed", error=str(e))
+                    summary["failed"] += 1
+
+                manifest.record(entry)
+                progress(entry)
+
+
+# Redactor of a batch worker process, loaded once by `_init_batch_worker()`
+_batch_worker_redactor = None
+
+def _init_batch_worker(tier: str):
+    from modules.pii_redactor import PiiRedactor
+
+    global _batch_worker_redactor
+    _batch_worker_redactor = PiiRedactor(tier=tier)
+
+
+def _get_fingerprint() -> str:
+    return _batch_worker_redactor.get_fingerprint()
+
+
+def _redact_file(input_path: str, output_path: str) -> dict:
+    digest = file_hash(input_path)
+    start = time.perf_counter()
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    _batch_worker_redactor.redact_wrapper(input_path, output_path)
+
+    return { "sha256": digest, "seconds": time.perf_counter() - start }
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Part of every key, bump it when a change to the redaction code itself
+# (rather than to its patterns or model) changes what the output looks like
+CACHE_VERSION = "2"
+
+def make_key(data: bytes, *fingerprints: str) -> str:
+    """
+    Content-addressed cache key: the hash of the input bytes together with
+    the fingerprints of whatever configuration the output depends on.
+    """
+    digest = hashlib.sha256(CACHE_VERSION.encode())
+
+    for fingerprint in fingerprints:
+        digest.update(b"\0" + fingerprint.encode())
+
+    digest.update(b"\0" + hashlib.sha256(data).digest())
+
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Cache of redacted outputs keyed by `make_key()`. Entries are kept in an
+    in-memory LRU tier and, if `disk_path` is set, in an on-disk tier shared
+    by every process pointed at the same folder. The disk tier drops entries
+    older than `disk_ttl` and evicts the least recently used ones once it
+    grows past `disk_max_bytes`.
+    """
+    def __init__(self, *, max_items: int = 128, max_bytes: int = 64 * 1024 * 1024, disk_path: str | None = None, disk_max_bytes: int = 1024 * 1024 * 1024, disk_ttl: float = 7 * 24 * 3600):
+        """
+        Parameters:
+            max_items:      Number of entries the memory tier holds
+            max_bytes:      Total size of the entries the memory tier holds
+            disk_path:      Folder of the disk tier, None for memory only
+            disk_max_bytes: Total size of the entries the disk tier holds
+            disk_ttl:       Seconds a disk entry lives after it was last used
+        """
+        self.__max_items = max_items
+        self.__max_bytes = max_bytes
+        self.__disk_path = disk_path
+        self.__disk_max_bytes = disk_max_bytes
+        self.__disk_ttl = disk_ttl
+
+        self.__entries: OrderedDict[str, bytes] = OrderedDict()
+        self.__bytes = 0
+        self.__lock = threading.Lock()
+        self.__stats = { "hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0 }
+
+        if disk_path is not None:
+            os.makedirs(disk_path, exist_ok=True)
+
+    def get(self, key: str) -> bytes | None:
+        """
+        Looks up a cached output, counting the hit or miss.
+
+        Parameters:
+            key:    The entry's key from `make_key()`
+
+        Returns:
+            data:   The cached output, or None on a miss
+        """
+        with self.__lock:
+            data = self.__entries.get(key)
+
+            if data is not None:
+                self.__entries.move_to_end(key)
+                self.__stats["hits"] += 1
+                self.__stats["memory_hits"] += 1
+                return data
+
+        data = self.__get_disk(key)
+
+        with self.__lock:
+            if data is None:
+                self.__stats["misses"] += 1
+                return None
+
+            self.__stats["hits"] += 1
+            self.__stats["disk_hits"] += 1
+            self.__put_memory(key, data)
+
+        return data
+
+    def put(self, key: str, data: bytes):
+        with self.__lock:
+            self.__stats["stores"] += 1
+            self.__put_memory(key, data)
+
+        if self.__disk_path is not None:
+            self.__put_disk(key, data)
+
+    def get_stats(self) -> dict:
+        with self.__lock:
+            lookups = self.__stats["hits"] + self.__stats["misses"]
+
+            return {
+                **self.__stats,
+                "hit_rate": self.__stats["hits"] / lookups if lookups else 0.0,
+                "memory_items": len(self.__entries),
+                "memory_bytes": self.__bytes,
+            }
+
+    def __put_memory(self, key: str, data: bytes):
+        # Called with the lock held. Entries too big for the whole tier only go to disk
+        if len(data) > self.__max_bytes:
+            return
+
+        if key in self.__entries:
+            self.__bytes -= len(self.__entries.pop(key))
+
+        self.__entries[key] = data
+        self.__bytes += len(data)
+
+        while len(self.__entries) > self.__max_items or self.__bytes > self.__max_bytes:
+            _, evicted = self.__entries.popitem(last=False)
+            self.__bytes -= len(evicted)
+            self.__stats["evictions"] += 1
+
+    def __disk_file(self, key: str) -> str:
+        return os.path.join(self.__disk_path, key[:2], key)
+
+    def __get_disk(self, key: str) -> bytes | None:
+        if self.__disk_path is None:
+            return None
+
+        path = self.__disk_file(key)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self.__disk_ttl:
+                os.remove(path)
+                return None
+
+            with open(path, "rb") as file:
+                data = file.read()
+
+            # The modification time doubles as the last use for TTL and LRU eviction
+            os.utime(path)
+        except OSError:
+            return None
+
+        return data
+
+    def __put_disk(self, key: str, data: bytes):
+        path = self.__disk_file(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Written next to the entry then renamed over it, so other processes never read half of it
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+
+        os.replace(tmp_path, path)
+        self.__evict_disk()
+
+    def __evict_disk(self):
+        now = time.time()
+        entries = []
+
+        for folder in os.scandir(self.__disk_path):
+            if not folder.is_dir():
+                continue
+
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+
+                entries.append( (stat.st_mtime, stat.st_size, entry.path) )
+
+        total = sum(size for _, size, _ in entries)
+
+        # Expired entries first, then the least recently used until the tier fits
+        for mtime, size, path in sorted(entries):
+            if now - mtime <= self.__disk_ttl and total <= self.__disk_max_bytes:
+                break
+
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            total -= size
+
+            with self.__lock:
+                self.__stats["evictions"] += 1
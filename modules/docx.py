@@ -0,0 +1,171 @@
+import bisect
+from io import BytesIO
+from typing import Iterator
+import docx
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import PartFactory, XmlPart
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from docx.text.run import Run
+from modules.spans import Span
+
+# Footnotes and endnotes are loaded as opaque blobs unless they're registered as
+# XML parts, which are saved from their (edited) XML
+PartFactory.part_type_for.setdefault(CT.WML_FOOTNOTES, XmlPart)
+PartFactory.part_type_for.setdefault(CT.WML_ENDNOTES, XmlPart)
+
+# Parts of the document besides its body holding text of their own
+STORY_RELATIONSHIPS = (RT.HEADER, RT.FOOTER, RT.FOOTNOTES, RT.ENDNOTES, RT.COMMENTS)
+
+class DocxText:
+    """
+    Text of a .docx document pulled out in bulk: every run of every
+    paragraph in the body (tables, text boxes and content controls
+    included), the headers and footers, footnotes, endnotes and comments,
+    joined into one text with a line break after each paragraph. Each run
+    remembers its character offsets in that text, so spans found in it
+    map straight back to the runs they cover and replacements are written
+    into those runs, keeping their formatting. Hyperlinks whose text is
+    redacted lose their target, which often holds the same PII.
+    """
+    def __init__(self, data: bytes):
+        """
+        Parameters:
+            data:   The .docx file's bytes
+        """
+        self.__document = docx.Document(BytesIO(data))
+        self.__runs: list[Run] = []
+        self.__starts: list[int] = []
+        self.__ends: list[int] = []
+        # Hyperlink element each run is part of and the part it's in, if any
+        self.__links: list[tuple | None] = []
+
+        texts = []
+        pos = 0
+
+        for part, paragraph in self.__paragraphs():
+            for run, link in self.__paragraph_runs(paragraph):
+                text = run.text
+                self.__runs.append(run)
+                self.__starts.append(pos)
+                self.__ends.append(pos + len(text))
+                self.__links.append( (link, part) if link is not None else None )
+                texts.append(text)
+                pos += len(text)
+
+            texts.append("\n")
+            pos += 1
+
+        self.__text = "".join(texts)
+
+    def get_text(self) -> str:
+        return self.__text
+
+    def apply_spans(self, spans: list[Span]):
+        """
+        Replaces every span with its replacement label. The label goes into
+        the run the span starts in, with that run's formatting, and the rest
+        of the span is removed from the runs after it. Every touched run is
+        rewritten once.
+
+        Parameters:
+            spans:  Non-overlapping spans of `get_text()` sorted by start offset
+        """
+        # Run index -> (start, end, replacement) edits in the run's own offsets
+        edits: dict[int, list[tuple[int, int, str]]] = {}
+
+        for start, end, replace in spans:
+            first = bisect.bisect_right(self.__ends, start)
+            last = bisect.bisect_left(self.__starts, end)
+
+            for i in range(first, last):
+                run_start = self.__starts[i]
+                local_start = max(start, run_start) - run_start
+                local_end = min(end, self.__ends[i]) - run_start
+
+                # Empty runs inside the span have nothing to remove
+                if local_start >= local_end:
+                    continue
+
+                edits.setdefault(i, []).append( (local_start, local_end, replace) )
+                replace = ""
+
+        unlinked = set()
+
+        for i, run_edits in edits.items():
+            text = self.__text[self.__starts[i]:self.__ends[i]]
+            parts = []
+            pos = 0
+
+            for local_start, local_end, replace in run_edits:
+                parts.append(text[pos:local_start])
+                parts.append(replace)
+                pos = local_end
+
+            parts.append(text[pos:])
+            self.__runs[i].text = "".join(parts)
+
+            if self.__links[i] is not None and id(self.__links[i][0]) not in unlinked:
+                unlinked.add(id(self.__links[i][0]))
+                self.__unlink(*self.__links[i])
+
+    def to_bytes(self) -> bytes:
+        output = BytesIO()
+        self.__document.save(output)
+
+        return output.getvalue()
+
+    def save(self, output_file: str):
+        self.__document.save(output_file)
+
+    def __paragraphs(self) -> Iterator[tuple[XmlPart, Paragraph]]:
+        """
+        Every paragraph of the body and of the other story parts, with the
+        part it's in. Paragraphs nested in a text box come after the one
+        holding the text box.
+        """
+        parts = [ self.__document.part ]
+        parts.extend( rel.target_part for rel in self.__document.part.rels.values() if not rel.is_external and rel.reltype in STORY_RELATIONSHIPS )
+
+        for part in parts:
+            for p in part.element.iter(qn("w:p")):
+                yield part, Paragraph(p, part)
+
+    def __paragraph_runs(self, paragraph: Paragraph) -> Iterator[tuple[Run, object | None]]:
+        """
+        Every run of the paragraph itself, in hyperlinks, content controls or
+        tracked insertions too, but not those of paragraphs nested in it,
+        with the hyperlink element it's part of.
+        """
+        p = paragraph._p
+
+        for r in p.iter(qn("w:r")):
+            link = None
+            parent = r.getparent()
+
+            while parent is not p and parent.tag != qn("w:p"):
+                if parent.tag == qn("w:hyperlink"):
+                    link = parent
+
+                parent = parent.getparent()
+
+            if parent is p:
+                yield Run(r, paragraph), link
+
+    def __unlink(self, link, part: XmlPart):
+        """
+        Removes the target of a hyperlink, and of every other hyperlink
+        sharing it, leaving its text as plain text.
+        """
+        r_id = link.get(qn("r:id"))
+        link.attrib.pop(qn("w:tooltip"), None)
+
+        if r_id is None:
+            return
+
+        for other in part.element.iter(qn("w:hyperlink")):
+            if other.get(qn("r:id")) == r_id:
+                del other.attrib[qn("r:id")]
+                other.attrib.pop(qn("w:tooltip"), None)
+
+        part.drop_rel(r_id)
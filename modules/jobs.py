@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+class Job:
+    """
+    State of one redaction job. The worker running it reports progress
+    through `progress()`, everyone else only reads it. With a `path` the
+    state is also saved there on every change, so other processes can
+    read it back with `load_job()`.
+
+    The timeout is cooperative: the worker calls `progress()` between its
+    steps and inside long ones (between PDF pages and NLP batches), and the
+    first call after the job's time is up stops it, only then is it marked
+    "timeout". A job that completes is "done" however long it took.
+    """
+    def __init__(self, job_id: str, total: int, timeout: float, *, path: str | None = None):
+        """
+        Parameters:
+            job_id:     Unique id of the job
+            total:      Number of steps (files) the job has
+            timeout:    Seconds the job may run for, 0 for no limit
+            path:       JSON file to save the job's state in
+        """
+        self.id = job_id
+        self.total = total
+        self.done = 0
+        self.status = "queued"
+        self.error: str | None = None
+        self.result: Any = None
+        self.created = time.time()
+        self.started: float | None = None
+        self.finished: float | None = None
+        self.__timeout = timeout
+        self.__path = path
+        self.__stopped = False
+
+    def timed_out(self) -> bool:
+        return self.__timeout > 0 and self.started is not None and (self.finished or time.time()) - self.started > self.__timeout
+
+    def was_stopped(self) -> bool:
+        # Whether `progress()` stopped the job because it ran out of time
+        return self.__stopped
+
+    def get_status(self) -> str:
+        return self.status
+
+    def progress(self, done: int):
+        """
+        Records that `done` of the job's steps are finished. Raises once
+        the job has run out of time, which stops it where it is.
+        """
+        # Checks from inside a step don't change anything worth saving
+        if done != self.done:
+            self.done = done
+            self.save()
+
+        if self.timed_out():
+            self.__stopped = True
+            raise Exception(f"Job {self.id} timed out after {self.__timeout} seconds")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.get_status(),
+            "progress": { "done": self.done, "total": self.total },
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    def save(self):
+        if self.__path is None:
+            return
+
+        state = {
+            "id": self.id,
+            "total": self.total,
+            "done": self.done,
+            "status": self.status,
+            "error": self.error,
+            "result": self.result,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "timeout": self.__timeout,
+        }
+
+        # Written next to the file then renamed over it, so readers never see half of it
+        tmp_path = f"{self.__path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(state, file)
+
+        os.replace(tmp_path, self.__path)
+
+
+def load_job(path: str) -> Job | None:
+    """
+    Reads back a job saved by another process.
+
+    Parameters:
+        path:   The JSON file the job was saved in
+
+    Returns:
+        job:    A copy of the job's state, or None if there's no such file
+    """
+    try:
+        with open(path, "r") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    job = Job(state["id"], state["total"], state["timeout"])
+
+    for key in ("done", "status", "error", "result", "created", "started", "finished"):
+        setattr(job, key, state[key])
+
+    return job
+
+
+class JobQueue:
+    """
+    Bounded local job queue. Jobs run on a fixed number of worker threads
+    and at most `max_queued` more jobs may wait for one, beyond that new
+    jobs are turned away instead of piling up. Finished jobs are forgotten
+    after `ttl` seconds.
+    """
+    def __init__(self, *, workers: int = 2, max_queued: int = 16, timeout: float = 600, ttl: float = 3600):
+        """
+        Parameters:
+            workers:    Number of jobs running at the same time
+            max_queued: Number of jobs allowed to wait for a worker
+            timeout:    Seconds a job may run for, 0 for no limit
+            ttl:        Seconds finished jobs are kept around for
+        """
+        self.__workers = workers
+        self.__max_queued = max_queued
+        self.__timeout = timeout
+        self.__ttl = ttl
+        self.__pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="redaction-job")
+        self.__jobs: dict[str, Job] = {}
+        self.__active = 0
+        self.__lock = threading.Lock()
+
+    def is_full(self) -> bool:
+        with self.__lock:
+            return self.__active >= self.__workers + self.__max_queued
+
+    def submit(self, job_id: str, run: Callable[[Job], Any], total: int, *, path: str | None = None) -> Job | None:
+        """
+        Queues a job.
+
+        Parameters:
+            job_id:     Unique id of the job
+            run:        Does the work, given the job to report progress on,
+                        and returns the job's result (JSON serializable if
+                        the job has a `path`)
+            total:      Number of steps (files) the job has
+            path:       JSON file to save the job's state in
+
+        Returns:
+            job:        The queued job, or None if the queue is full
+        """
+        with self.__lock:
+            if self.__active >= self.__workers + self.__max_queued:
+                return None
+
+            self.__forget_expired()
+
+            job = Job(job_id, total, self.__timeout, path=path)
+            self.__jobs[job_id] = job
+            self.__active += 1
+
+        job.save()
+        self.__pool.submit(self.__run, job, run)
+
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        return self.__jobs.get(job_id)
+
+    def get_stats(self) -> dict:
+        statuses = [ job.get_status() for job in list(self.__jobs.values()) ]
+
+        return {
+            "workers": self.__workers,
+            "max_queued": self.__max_queued,
+            "queued": statuses.count("queued"),
+            "running": statuses.count("running"),
+        }
+
+    def __forget_expired(self):
+        now = time.time()
+
+        for job_id, job in list(self.__jobs.items()):
+            if job.finished is not None and now - job.finished > self.__ttl:
+                del self.__jobs[job_id]
+
+    def __run(self, job: Job, run: Callable[[Job], Any]):
+        job.started = time.time()
+        job.status = "running"
+        job.save()
+
+        try:
+            job.result = run(job)
+            status = "done"
+        except Exception as e:
+            job.error = str(e)
+            status = "failed"
+        finally:
+            job.finished = time.time()
+
+            with self.__lock:
+                self.__active -= 1
+
+        job.status = "timeout" if status == "failed" and job.was_stopped() else status
+
+        try:
+            job.save()
+        except OSError:
+            # The workspace may already be gone
+            pass
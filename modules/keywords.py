@@ -0,0 +1,213 @@
+from modules.pattern_source import class_end, read_quantifier
+
+def _parse(pattern: str, i: int = 0) -> tuple[list[list[tuple]], int]:
+    """
+    Parses `pattern` from index `i` up to the closing parenthesis of the
+    current group into a list of alternatives. Each alternative is a list of
+    `(kind, value, min_repeat)` items where kind is "lit" for a literal
+    character, "group" for a required group and "other" for anything else.
+    """
+    alternatives = [[]]
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == ")":
+            return alternatives, i + 1
+
+        if char == "|":
+            alternatives.append([])
+            i += 1
+            continue
+
+        if char == "\\":
+            escaped = pattern[i + 1] if i + 1 < len(pattern) else ""
+            item = ("other", None) if escaped.isalnum() else ("lit", escaped)
+            i += 2
+        elif char == "[":
+            item = ("other", None)
+            i = class_end(pattern, i)
+        elif char == "(":
+            required = True
+
+            if pattern.startswith(("(?!", "(?<!"), i):
+                # Negative lookarounds never require anything to be present
+                required = False
+                i += 3 if pattern[i + 2] == "!" else 4
+            elif pattern.startswith("(?<=", i):
+                i += 4
+            elif pattern.startswith(("(?=", "(?:"), i):
+                i += 3
+            elif pattern.startswith(("(?P<", "(?<"), i):
+                i = pattern.index(">", i) + 1
+            elif pattern.startswith("(?", i):
+                # Inline flags, either scoped "(?i:...)" or global "(?i)"
+                end = i + 2
+
+                while pattern[end] not in ":)":
+                    end += 1
+
+                i = end + 1
+
+                if pattern[end] == ")":
+                    continue
+            else:
+                i += 1
+
+            inner, i = _parse(pattern, i)
+            item = ("group", inner) if required else ("other", None)
+        else:
+            item = ("other", None) if char in ".^$" else ("lit", char)
+            i += 1
+
+        minimum, i = read_quantifier(pattern, i)
+        alternatives[-1].append( (*item, minimum) )
+
+    return alternatives, i
+
+
+def _required(alternatives: list[list[tuple]]) -> set[str] | None:
+    """
+    Returns a set of literals where at least one must appear in any text
+    the parsed alternatives can match, or None when no such set exists.
+    """
+    found = set()
+
+    for sequence in alternatives:
+        literals = _required_in_sequence(sequence)
+
+        if literals is None:
+            return None
+
+        found |= literals
+
+    return found
+
+
+def _required_in_sequence(sequence: list[tuple]) -> set[str] | None:
+    candidates = []
+    run = ""
+
+    for kind, value, minimum in sequence:
+        if kind == "lit" and minimum >= 1:
+            run += value
+
+            # A repeated literal still requires itself but ends the run
+            if minimum == 1:
+                continue
+
+        if run:
+            candidates.append({run})
+            run = ""
+
+        if kind == "group" and minimum >= 1:
+            literals = _required(value)
+
+            if literals:
+                candidates.append(literals)
+
+    if run:
+        candidates.append({run})
+
+    if not candidates:
+        return None
+
+    # Prefer the candidate whose weakest literal is the most selective
+    return max(candidates, key=lambda literals: min(map(len, literals)))
+
+
+def required_literals(pattern: str) -> set[str] | None:
+    """
+    Extracts the literal strings a regex pattern can't match without. At
+    least one of the returned literals must appear in any matching text.
+
+    Parameters:
+        pattern:    The regex pattern source
+
+    Returns:
+        literals:   The set of required literals, or None if the pattern has
+                    no usable literal (e.g. it starts with a character class)
+    """
+    try:
+        alternatives, _ = _parse(pattern)
+    except (ValueError, IndexError):
+        return None
+
+    return _required(alternatives)
+
+
+def keyword_for(literal: str) -> str | None:
+    """
+    Picks the most selective whitespace-separated piece of `literal` as its
+    case-folded keyword. Single alphanumeric characters are too common to be
+    worth checking for.
+    """
+    pieces = literal.casefold().split()
+
+    if not pieces:
+        return None
+
+    keyword = max(pieces, key=len)
+
+    if len(keyword) < 2 and keyword.isalnum():
+        return None
+
+    return keyword
+
+
+class KeywordIndex:
+    """
+    Index from the literal keywords patterns are anchored on to the patterns
+    themselves. Scanning a text for the keywords first tells which patterns
+    can possibly match, so the rest don't have to run at all.
+    """
+    def __init__(self, patterns: list[str]):
+        self.__anchored: list[tuple[int, list[tuple[str, str]]]] = []
+        self.__always_run: list[int] = []
+
+        for index, pattern in enumerate(patterns):
+            literals = required_literals(pattern) or { "" }
+            anchors = [ (keyword_for(literal), literal.casefold()) for literal in sorted(literals) ]
+
+            if any(keyword is None for keyword, _ in anchors):
+                self.__always_run.append(index)
+                continue
+
+            self.__anchored.append( (index, anchors) )
+
+    def get_keywords(self) -> dict[int, list[str]]:
+        return { index: [ literal for _, literal in anchors ] for index, anchors in self.__anchored }
+
+    def get_always_run(self) -> list[int]:
+        return self.__always_run
+
+    def active(self, text: str) -> list[int]:
+        """
+        Finds which patterns need to run on `text`.
+
+        Parameters:
+            text:       The text about to be searched
+
+        Returns:
+            indices:    Sorted indices of the patterns with at least one of
+                        their literals in `text`, plus every "always run" pattern
+        """
+        folded = text.casefold()
+        indices = set(self.__always_run)
+        found = {}
+
+        # `str.__contains__` is a C-level substring search; for a few hundred
+        # strings this is far faster than one big alternation regex. Each
+        # literal is only looked for once its rarest word is known to be
+        # present, and every string is searched for at most once per text.
+        def contains(needle: str) -> bool:
+            if needle not in found:
+                found[needle] = needle in folded
+
+            return found[needle]
+
+        for index, anchors in self.__anchored:
+            if any(contains(keyword) and contains(literal) for keyword, literal in anchors):
+                indices.add(index)
+
+        return sorted(indices)
@@ -0,0 +1,245 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Report:
+    """
+    Timings of one request: seconds spent per stage, per regex pattern
+    (with its match count) and per PDF page (extracting its words, then
+    finding and redacting its PII, the batched NLP pass isn't split by page),
+    and the patterns that ran out of their time budget. Stages can nest,
+    e.g. "dates" is part of "spacy_spans", so their times don't add up to
+    the total.
+    """
+    def __init__(self):
+        self.__stages: dict[str, list] = {}
+        self.__patterns: dict[str, list] = {}
+        self.__pages: dict[tuple[str, int], dict[str, float]] = {}
+        self.__timeouts: dict[str, int] = {}
+        self.__lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float):
+        with self.__lock:
+            entry = self.__stages.setdefault(stage, [ 0.0, 0 ])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def add_pattern(self, pattern: str, seconds: float, matches: int):
+        with self.__lock:
+            entry = self.__patterns.setdefault(pattern, [ 0.0, 0, 0 ])
+            entry[0] += seconds
+            entry[1] += matches
+            entry[2] += 1
+
+    def add_page(self, document: str, page: int, stage: str, seconds: float):
+        with self.__lock:
+            stages = self.__pages.setdefault((document, page), {})
+            stages[stage] = stages.get(stage, 0.0) + seconds
+
+    def add_timeout(self, pattern: str):
+        with self.__lock:
+            self.__timeouts[pattern] = self.__timeouts.get(pattern, 0) + 1
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            report:     JSON serializable report, patterns sorted slowest first
+        """
+        with self.__lock:
+            return {
+                "stages": { stage: { "seconds": seconds, "calls": calls } for stage, (seconds, calls) in self.__stages.items() },
+                "patterns": [
+                    { "pattern": pattern, "seconds": seconds, "matches": matches, "calls": calls }
+                    for pattern, (seconds, matches, calls) in sorted(self.__patterns.items(), key=lambda item: -item[1][0])
+                ],
+                "pages": [ { "document": document, "page": page, **stages } for (document, page), stages in self.__pages.items() ],
+                "timeouts": [ { "pattern": pattern, "count": count } for pattern, count in self.__timeouts.items() ],
+            }
+
+
+class Metrics:
+    """
+    Process-wide counters and histograms, rendered in the Prometheus text
+    format. Disabled until `enabled` is set, so recording costs nothing
+    unless someone reads the metrics.
+    """
+    def __init__(self, *, enabled: bool = False):
+        self.enabled = enabled
+        self.__counters: dict[tuple[str, tuple], float] = {}
+        self.__histograms: dict[tuple[str, tuple], list] = {}
+        self.__help: dict[str, tuple[str, str]] = {}
+        self.__lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, text: str):
+        self.__help[name] = (kind, text)
+
+    def inc(self, name: str, labels: tuple[tuple[str, str], ...] = (), value: float = 1):
+        with self.__lock:
+            self.__counters[(name, labels)] = self.__counters.get((name, labels), 0) + value
+
+    def observe(self, name: str, labels: tuple[tuple[str, str], ...], value: float):
+        with self.__lock:
+            # Per bucket counts, then the sum and count of every observation
+            histogram = self.__histograms.setdefault((name, labels), [ [ 0 ] * len(BUCKETS), 0.0, 0 ])
+            index = bisect.bisect_left(BUCKETS, value)
+
+            if index < len(BUCKETS):
+                histogram[0][index] += 1
+
+            histogram[1] += value
+            histogram[2] += 1
+
+    def render(self) -> str:
+        """
+        Returns:
+            text:   Every metric in the Prometheus text exposition format
+        """
+        lines = []
+
+        with self.__lock:
+            counters = sorted(self.__counters.items())
+            histograms = sorted( (key, ([ *buckets ], total, count)) for key, (buckets, total, count) in self.__histograms.items() )
+
+        described = set()
+
+        def header(name: str):
+            if name not in described and name in self.__help:
+                kind, text = self.__help[name]
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+                described.add(name)
+
+        for (name, labels), value in counters:
+            header(name)
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), (buckets, total, count) in histograms:
+            header(name)
+            cumulative = 0
+
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    escaped = ( (key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for key, value in labels )
+
+    return "{" + ",".join( f'{key}="{value}"' for key, value in escaped ) + "}"
+
+
+# Metrics of this process, enabled by whoever serves them
+registry = Metrics()
+registry.describe("pii_redactor_stage_seconds", "histogram", "Seconds spent per redaction stage")
+registry.describe("pii_redactor_pattern_seconds_total", "counter", "Seconds spent running each regex pattern")
+registry.describe("pii_redactor_pattern_matches_total", "counter", "Matches of each regex pattern")
+registry.describe("pii_redactor_page_seconds", "histogram", "Seconds spent per PDF page and stage, besides the batched NLP pass")
+registry.describe("pii_redactor_documents_total", "counter", "Documents redacted, by file type")
+registry.describe("pii_redactor_pattern_timeouts_total", "counter", "Times a regex pattern ran out of its time budget")
+
+# Report of the request being handled in the current thread (or context), if any
+_report: ContextVar[Report | None] = ContextVar("redaction_report", default=None)
+_document: ContextVar[str] = ContextVar("redaction_document", default="")
+
+def is_enabled() -> bool:
+    """
+    Whether anything is recording, instrumented code skips its timing otherwise.
+    """
+    return registry.enabled or _report.get() is not None
+
+
+@contextmanager
+def report() -> Iterator[Report]:
+    """
+    Records the timings of everything run inside the block into a new report.
+    """
+    new_report = Report()
+    token = _report.set(new_report)
+
+    try:
+        yield new_report
+    finally:
+        _report.reset(token)
+
+
+@contextmanager
+def document(name: str) -> Iterator[None]:
+    """
+    Names the document pages recorded inside the block belong to.
+    """
+    token = _document.set(name)
+
+    try:
+        yield
+    finally:
+        _document.reset(token)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Records the time spent inside the block as a stage.
+    """
+    if not is_enabled():
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_stage(stage: str, seconds: float):
+    if registry.enabled:
+        registry.observe("pii_redactor_stage_seconds", (("stage", stage),), seconds)
+
+    if (current := _report.get()) is not None:
+        current.add_stage(stage, seconds)
+
+
+def record_pattern(pattern: str, seconds: float, matches: int):
+    if registry.enabled:
+        registry.inc("pii_redactor_pattern_seconds_total", (("pattern", pattern),), seconds)
+        registry.inc("pii_redactor_pattern_matches_total", (("pattern", pattern),), matches)
+
+    if (current := _report.get()) is not None:
+        current.add_pattern(pattern, seconds, matches)
+
+
+def record_timeout(pattern: str):
+    # Recorded whether or not timings are, a timeout fails the document
+    registry.inc("pii_redactor_pattern_timeouts_total", (("pattern", pattern),))
+
+    if (current := _report.get()) is not None:
+        current.add_timeout(pattern)
+
+
+def record_page(page: int, stage: str, seconds: float):
+    if registry.enabled:
+        registry.observe("pii_redactor_page_seconds", (("stage", stage),), seconds)
+
+    if (current := _report.get()) is not None:
+        current.add_page(_document.get(), page, stage, seconds)
+
+
+def record_document(file_type: str):
+    if registry.enabled:
+        registry.inc("pii_redactor_documents_total", (("file_type", file_type),))
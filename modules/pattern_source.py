@@ -0,0 +1,61 @@
+import regex as re
+
+# Characters a quantifier can start with
+QUANTIFIER_START = "?*+{"
+
+# What the regex module reads as a repeat between braces, `{,}` included
+BRACE_QUANTIFIER = re.compile(r"\{(\d*)(?:,\d*)?\}")
+
+def class_end(pattern: str, i: int) -> int:
+    """
+    Returns the index just past the character class starting at `pattern[i]`.
+    """
+    i += 1
+
+    if i < len(pattern) and pattern[i] == "^":
+        i += 1
+
+    # A leading "]" is a literal member of the class
+    if i < len(pattern) and pattern[i] == "]":
+        i += 1
+
+    while i < len(pattern) and pattern[i] != "]":
+        i += 2 if pattern[i] == "\\" else 1
+
+    return i + 1
+
+
+def read_quantifier(pattern: str, i: int) -> tuple[int, int]:
+    """
+    Reads an optional quantifier at `pattern[i]`.
+
+    Returns:
+        (min_repeat, next_index): the minimum repeat count (1 when there's
+                                  no quantifier) and the index after it
+    """
+    if i >= len(pattern) or pattern[i] not in QUANTIFIER_START:
+        return 1, i
+
+    char = pattern[i]
+    minimum = 1
+
+    if char in "?*":
+        minimum = 0
+        i += 1
+    elif char == "+":
+        i += 1
+    else:
+        matched = BRACE_QUANTIFIER.match(pattern, i)
+
+        # Not a valid quantifier (e.g. `{}` or `{a}`), so `{` is a literal character
+        if matched is None or matched.group() == "{}":
+            return 1, i
+
+        minimum = int(matched.group(1) or 0)
+        i = matched.end()
+
+    # Lazy or possessive suffix
+    if i < len(pattern) and pattern[i] in "?+":
+        i += 1
+
+    return minimum, i
@@ -1,16 +1,170 @@
+from __future__ import annotations
+import functools
 import os
+import threading
+import time
+import multiprocessing
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, TYPE_CHECKING, Callable, Iterable, Iterator
 import regex as re
-import pymupdf as fitz
 from modules.spacy import SpacyRedactor
 from modules.regex import RegexRedactor
+from modules.words import WordIndex, redact_rects
+from modules.spans import Span, SpanSet
+from modules.windows import WINDOW_OVERLAP, WINDOW_SIZE
+from modules import metrics, stream
+from modules.cache import ResultCache, make_key
+
+# PyMuPDF, SpaCy and python-docx are only imported once they're needed, so
+# starting up doesn't pay for the file types and models it hasn't seen yet
+if TYPE_CHECKING:
+    import pymupdf as fitz
+    from spacy.tokens import Doc
+    from modules.docx import DocxText
+
+# PyMuPDF isn't thread safe, every call into it from threads sharing the
+# process (e.g. concurrent jobs) goes through this lock
+_pymupdf_lock = threading.RLock()
 
 class PiiRedactor:
-    def __init__(self):
-        self.spacy = SpacyRedactor()
-        self.regex = RegexRedactor()
+    # NER engine tiers from most accurate to fastest, "regex" skips NER entirely
+    NER_TIERS = [ *SpacyRedactor.MODELS, "regex" ]
 
+    # File types redacted as documents rather than plain text, their data is bytes
+    BINARY_TYPES = [ "pdf", "docx" ]
 
-    def redact_wrapper(self, input_path: str, output_path: str):
+    def __init__(self, *, tier: str = "trf", batch_size: int = 8, n_process: int = 1, ner_window_size: int = WINDOW_SIZE, ner_window_overlap: int = WINDOW_OVERLAP, pdf_workers: int = 1, pdf_chunk_size: int = 16, pdf_garbage: int = 3, pdf_clean: bool = True, pdf_deflate: bool = True, regex_pattern_timeout: float | None = None, regex_document_timeout: float | None = None, tiers: list[str] | None = None, cache: ResultCache | None = None, load: bool = True):
+        """
+        Parameters:
+            tier:           Default NER tier, one of `tiers`
+            batch_size:     Number of texts (pages, files) fed to the NLP model per batch
+            n_process:      Number of processes to run the NLP model in
+            ner_window_size:    Characters of a longer text the NLP model sees at a time,
+                                long texts are split into windows fed to it by length
+            ner_window_overlap: Characters of context on each side of a window, entities
+                                crossing a window's edge are found whole through it
+            pdf_workers:    Number of worker processes PDF pages are split across,
+                            1 keeps PDF redaction in this process
+            pdf_chunk_size: Number of consecutive pages each PDF worker task handles
+            pdf_garbage:    Garbage collection level (0-4) redacted PDFs are saved with,
+                            higher levels make smaller files but save slower
+            pdf_clean:      Whether content streams of redacted PDFs are cleaned up on save
+            pdf_deflate:    Whether streams of redacted PDFs are compressed on save
+            regex_pattern_timeout:  Seconds one regex pattern may search one text (or PDF
+                                    page) for, a pattern running out of it is reported
+                                    and fails the document
+            regex_document_timeout: Seconds all regex patterns together may search one text
+                                    (or PDF page) for, running out of it fails the document
+            tiers:          NER tiers redactions may use, every tier whose model is
+                            installed (and "regex") by default. Each one a request
+                            picks loads its model in every process that redacts with it
+            cache:          Cache of redacted outputs, files already redacted with the
+                            same patterns and model are served from it
+            load:           Whether to load the default tier's model right away, otherwise
+                            it's loaded by `warm_up()` or the first redaction that needs it
+        """
+        if pdf_chunk_size < 1:
+            raise Exception("`pdf_chunk_size` must be at least 1")
+
+        if pdf_garbage not in range(5):
+            raise Exception("`pdf_garbage` must be between 0 and 4")
+
+        installed = [ *SpacyRedactor.installed_tiers(), "regex" ]
+        self.tiers = tiers if tiers is not None else installed
+
+        for name in self.tiers:
+            if name not in self.NER_TIERS:
+                raise Exception(f"Unknown NER tier `{name}`, expected one of: {', '.join(self.NER_TIERS)}")
+
+            if name not in installed:
+                raise Exception(f"The model of NER tier `{name}` ({SpacyRedactor.MODELS[name]}) isn't installed")
+
+        if tier not in self.tiers:
+            raise Exception(f"NER tier `{tier}` isn't available, expected one of: {', '.join(self.tiers)}")
+
+        self.tier = tier
+        self.__batch_size = batch_size
+        self.__n_process = n_process
+        self.__ner_windows = (ner_window_size, ner_window_overlap)
+        self.__pdf_workers = pdf_workers
+        self.__pdf_chunk_size = pdf_chunk_size
+        # Saving is never incremental: an incremental update keeps the
+        # original page content in the file, which would undo the redaction
+        self.__pdf_save_options = { "garbage": pdf_garbage, "clean": pdf_clean, "deflate": pdf_deflate }
+        self.cache = cache
+        self.__spacy_tiers: dict[str, SpacyRedactor] = {}
+        self.__spacy_lock = threading.Lock()
+        self.__pools: dict[str, ProcessPoolExecutor] = {}
+        self.__pools_lock = threading.Lock()
+        self.__warm = False
+
+        self.__regex_timeouts = (regex_pattern_timeout, regex_document_timeout)
+        self.regex = RegexRedactor(pattern_timeout=regex_pattern_timeout, document_timeout=regex_document_timeout)
+        self.spacy = self.get_spacy(tier) if load else None
+
+
+    def load(self):
+        """
+        Loads the default tier's model and the PDF and DOCX libraries
+        without running the model, so it's safe to fork afterwards (torch
+        and OpenMP thread pools started by inference don't survive a fork).
+        """
+        import pymupdf
+        import modules.docx
+
+        self.spacy = self.get_spacy()
+
+
+    def warm_up(self):
+        """
+        Loads everything like `load()` (unless it already was), then runs a
+        short text through the regex patterns and the model, so the first
+        real request doesn't pay for any of it. Nothing is cached. In a
+        forking server it runs in every worker, after the fork.
+        """
+        self.load()
+        text = "Warm up: Mr. John Smith was born on March 3, 1990, call 555-123-4567."
+        self.regex.find_spans(text)
+
+        if self.spacy is not None:
+            self.spacy.find_spans(self.regex.get_honorifics_pattern(), text, self.spacy.create_nlp_doc(text))
+
+        self.__warm = True
+
+
+    def is_warm(self) -> bool:
+        return self.__warm
+
+
+    def get_spacy(self, tier: str | None = None) -> SpacyRedactor | None:
+        """
+        Gets the SpaCy redactor for an NER tier, loading its model the
+        first time the tier is asked for.
+
+        Parameters:
+            tier:       One of the redactor's `tiers`, defaults to its default tier
+
+        Returns:
+            spacy:      The SpaCy redactor, or None for the "regex" tier
+        """
+        tier = tier or self.tier
+
+        if tier not in self.tiers:
+            raise Exception(f"NER tier `{tier}` isn't available, expected one of: {', '.join(self.tiers)}")
+
+        if tier == "regex":
+            return None
+
+        with self.__spacy_lock:
+            if tier not in self.__spacy_tiers:
+                window_size, window_overlap = self.__ner_windows
+                self.__spacy_tiers[tier] = SpacyRedactor(tier, batch_size=self.__batch_size, n_process=self.__n_process, window_size=window_size, window_overlap=window_overlap)
+
+        return self.__spacy_tiers[tier]
+
+
+    def redact_wrapper(self, input_path: str, output_path: str, *, tier: str | None = None):
         """
         Wrapper function to execute specific redaction methods
         for files of specific file extensions/types.
@@ -18,18 +172,233 @@ class PiiRedactor:
         Paramters:
             input_path:     Path to input file to read and redact
             output_path:    Path to output file to store redacted file
+            tier:           NER tier to use instead of the redactor's default
+        """
+
+        self.redact_many([ (input_path, output_path) ], tier=tier)
+
+
+    def redact_many(self, paths: list[tuple[str, str]], *, tier: str | None = None, progress: Callable[[int], None] | None = None):
+        """
+        Redacts several files at once. The text of every file (and every
+        PDF page) goes through the NLP model in one batched pass, then the
+        resulting docs are mapped back to their pages and files.
+
+        Parameters:
+            paths:      (input_path, output_path) pairs of the files to redact
+            tier:       NER tier to use instead of the redactor's default
+            progress:   Called with the number of files done so far, before the
+                        NLP pass and after each file. Raising from it stops the run
+        """
+        spacy = self.get_spacy(tier)
+        progress = progress or (lambda done: None)
+        items = []
+        output_paths = []
+        done = 0
+
+        for input_path, output_path in paths:
+            file_ext = input_path.split(".")[-1].lower()
+            match(file_ext):
+                case "pdf" if self.__pdf_workers > 1:
+                    # Workers open the file themselves, so it's redacted from its path
+                    key = self.__cache_key(spacy, self.__read_bytes(input_path), file_ext)
+                    data = self.cache.get(key) if key is not None else None
+
+                    metrics.record_document(file_ext)
+
+                    if data is None:
+                        self.redact_pdf(input_path, output_path, tier=tier)
+
+                        if key is not None:
+                            self.cache.put(key, self.__read_bytes(output_path))
+                    else:
+                        self.__write_output(output_path, data)
+
+                    done += 1
+                    progress(done)
+
+                case "pdf" | "docx":
+                    items.append( (self.__read_bytes(input_path), file_ext) )
+                    output_paths.append(output_path)
+
+                case _:
+                    items.append( (self.__read_text(input_path), file_ext) )
+                    output_paths.append(output_path)
+
+        results = self.redact_data(items, tier=tier, progress=lambda count: progress(done + count))
+
+        for output_path, result in zip(output_paths, results):
+            self.__write_output(output_path, result)
+
+
+    def redact_data(self, items: list[tuple[bytes | str | IO, str]], *, tier: str | None = None, progress: Callable[[int], None] | None = None) -> list[bytes | str]:
         """
+        Redacts several documents held in memory at once, without touching
+        the disk. Like `redact_many()`, every text and PDF page goes through
+        the NLP model in one batched pass.
 
-        file_ext = input_path.split(".")[-1]
-        match(file_ext):
-            case "pdf":
-                self.redact_pdf(input_path, output_path)
-                
-            case _:
-                self.redact_text(input_path, output_path)
-    
+        Parameters:
+            items:      (data, file type) of every document. The data is bytes,
+                        str or a file-like object, the file type its extension
+                        ("pdf", "docx", anything else is read as text)
+            tier:       NER tier to use instead of the redactor's default
+            progress:   Called with the number of documents done so far, before
+                        the NLP pass and after each document, and again between
+                        PDF pages and NLP batches. Raising from it stops the run
 
-    def redact_text(self, input_path: str, output_path: str, *, save: bool = True, text: str = "") -> None | str:
+        Returns:
+            results:    The redacted documents in the same order, bytes for PDFs
+                        and DOCX, str for text
+        """
+        spacy = self.get_spacy(tier)
+        progress = progress or (lambda done: None)
+        results: list[bytes | str | None] = [ None ] * len(items)
+        prepared = []
+        done = 0
+
+        # Long documents check in between their steps too, so a deadline
+        # in `progress` doesn't have to wait for a whole document
+        check = lambda: progress(done)
+
+        for i, (data, file_type) in enumerate(items):
+            data = self.__read_data(data, file_type)
+            metrics.record_document(file_type)
+
+            # Documents redacted before with the same configuration come from the cache
+            key = self.__cache_key(spacy, data, file_type)
+            cached = self.cache.get(key) if key is not None else None
+
+            if cached is not None:
+                results[i] = cached if file_type in self.BINARY_TYPES else cached.decode("utf-8")
+                done += 1
+                progress(done)
+                continue
+
+            with metrics.document(str(i)):
+                match(file_type):
+                    case "pdf" if self.__use_pdf_workers(data):
+                        # Split across the PDF workers right away, the pages
+                        # don't go through this process' NLP pass
+                        results[i] = self.__redact_pdf_parallel(data, None, tier or self.tier, check)
+
+                        if key is not None:
+                            self.cache.put(key, results[i])
+
+                        done += 1
+                        progress(done)
+
+                    case "pdf":
+                        pdf_doc, word_indexes = self.__prepare_pdf(data, check=check)
+                        texts = [ word_index.get_text() for word_index in word_indexes ]
+                        prepared.append( (i, functools.partial(self.__finish_pdf, check=check), (pdf_doc, word_indexes), texts, key) )
+
+                    case "docx":
+                        # The whole document is one text, so one NLP doc
+                        from modules.docx import DocxText
+
+                        with metrics.timed("docx_read"):
+                            docx_text = DocxText(data)
+
+                        prepared.append( (i, self.__finish_docx, docx_text, [ docx_text.get_text() ], key) )
+
+                    case _:
+                        content = self.__prepare_text(data)
+                        prepared.append( (i, self.__finish_text, content, [content], key) )
+
+        progress(done)
+        nlp_docs = iter(self.__create_nlp_docs(spacy, [ text for _, _, _, texts, _ in prepared for text in texts ], check))
+
+        for i, finish, state, texts, key in prepared:
+            with metrics.document(str(i)):
+                results[i] = finish(spacy, state, texts, [ next(nlp_docs) for _ in texts ], None)
+
+            if key is not None:
+                self.cache.put(key, results[i].encode("utf-8") if isinstance(results[i], str) else results[i])
+
+            done += 1
+            progress(done)
+
+        return results
+
+
+    def scan(self, input_path: str, *, tier: str | None = None, first_hit: bool = False) -> dict:
+        """
+        Scans a file for PII without redacting it, see `scan_data()`.
+        """
+        file_ext = input_path.split(".")[-1].lower()
+        data = self.__read_bytes(input_path) if file_ext in self.BINARY_TYPES else self.__read_text(input_path)
+
+        return self.scan_data([ (data, file_ext) ], tier=tier, first_hit=first_hit)[0]
+
+
+    def scan_data(self, items: list[tuple[bytes | str | IO, str]], *, tier: str | None = None, first_hit: bool = False) -> list[dict]:
+        """
+        Finds the PII of several documents held in memory without producing
+        redacted documents. Regex and NER both run on the original text (the
+        words text of each PDF page), regex findings win where they overlap.
+
+        With `first_hit` each document stops at its first finding: the regex
+        patterns run first and stop at the first match, the NLP model only
+        runs on documents they found nothing in, `batch_size` pages at a time,
+        until an entity turns up. Clean documents still go through every
+        pattern and the model, but nothing is rewritten or saved.
+
+        Parameters:
+            items:      (data, file type) of every document, like for `redact_data()`
+            tier:       NER tier to use instead of the redactor's default
+            first_hit:  Whether to stop at each document's first finding
+
+        Returns:
+            results:    Per document, in the same order, whether it has PII and
+                        its findings sorted by offset (by page first for PDFs).
+                        A finding has its category ("regex" or "ner"), label
+                        (the replacement) and start and end offsets, for PDFs
+                        into the page's words text, with the page number and
+                        the rectangles covering it
+        """
+        spacy = self.get_spacy(tier)
+        # Per document, the texts to scan and each one's page word index (None for text and DOCX)
+        documents = []
+
+        with metrics.timed("scan"):
+            for data, file_type in items:
+                data = self.__read_data(data, file_type)
+
+                match(file_type):
+                    case "pdf":
+                        # Pages are extracted as they're scanned, a first hit stops before the rest
+                        documents.append(self.__pdf_units(data))
+
+                    case "docx":
+                        from modules.docx import DocxText
+                        documents.append( [ (DocxText(data).get_text(), None) ] )
+
+                    case _:
+                        documents.append( [ (data, None) ] )
+
+            if first_hit:
+                findings = [ self.__scan_first(spacy, units) for units in documents ]
+            else:
+                findings = self.__scan_all(spacy, [ list(units) for units in documents ])
+
+        return [ { "pii": bool(found), "findings": found } for found in findings ]
+
+
+    def redact_docx(self, input_file: str, output_file: str, *, tier: str | None = None):
+        if not input_file.lower().endswith(".docx"):
+            raise Exception("Input file for DOCX redaction is NOT a DOCX file!")
+
+        self.redact_many([ (input_file, output_file) ], tier=tier)
+
+
+    def redact_string(self, text: str, *, tier: str | None = None) -> str:
+        """
+        Redacts a single text held in memory.
+        """
+        return self.redact_data([ (text, "txt") ], tier=tier)[0]
+
+
+    def redact_text(self, input_path: str, output_path: str, *, save: bool = True, text: str = "", tier: str | None = None) -> None | str:
         """
         Redacts the given text file then store the redacted contents into a new file if `save` is True, else this method will redact the provided text string then returns the redacted text.
 
@@ -38,59 +407,491 @@ class PiiRedactor:
             output_path:    Path to output file to store redacted contents in
             save:           Whether to save redacted content or not
             text:           The text to redact if `save` is False
+            tier:           NER tier to use instead of the redactor's default
 
         Returns:
             content:        The redacted text content if `save` is False
         """
-        content = ""
-
         if save:
-            if not os.path.exists(input_path):
-                raise Exception(f"The input path to `redact_text()` doesn't exist: {input_path}")
-
-            with open(input_path, "r") as file:
-                content = file.read()
+            content = self.__read_text(input_path)
         else:
             if not text:
                 raise Exception("Text not provided to `redact_text()` with `save=False`")
 
             content = text
 
-        # Apply regex redaction first
-        content = self.regex.redact_text(content)
+        spacy = self.get_spacy(tier)
+        content = self.__prepare_text(content)
+        nlp_docs = self.__create_nlp_docs(spacy, [ content ])
+
+        content = self.__finish_text(spacy, content, [ content ], nlp_docs, output_path if save else None)
+
+        # Return the redacted text if not saving redacted output
+        if not save:
+            return content
+
+
+    def redact_text_stream(self, input_path: str, output_path: str, *, tier: str | None = None, chunk_size: int = stream.CHUNK_SIZE, overlap: int = stream.OVERLAP, progress: Callable[[int], None] | None = None):
+        """
+        Redacts a text file of any size with bounded memory. The file is
+        read in chunks cut at paragraph/sentence boundaries, each chunk is
+        redacted with `overlap` characters of context on both sides so
+        PII crossing a boundary is still caught, and the output is written
+        as it goes.
+
+        Names are only matched again within the chunk they were recognized
+        in, unlike `redact_text()` which matches them across the whole file.
+
+        Parameters:
+            input_path:     Path to input file to read and redact
+            output_path:    Path to output file to store redacted contents in
+            tier:           NER tier to use instead of the redactor's default
+            chunk_size:     Characters read from the input at a time
+            overlap:        Characters of context kept on each side of a chunk boundary
+            progress:       Called with the number of characters written so far after
+                            each chunk. Raising from it stops the run
+        """
+        if not os.path.exists(input_path):
+            raise Exception(f"The input path to `redact_text_stream()` doesn't exist: {input_path}")
+
+        if not 0 <= overlap < chunk_size:
+            raise Exception("`overlap` must be smaller than `chunk_size`")
+
+        spacy = self.get_spacy(tier)
+
+        with open(input_path, "r") as input_file, open(output_path, "w") as output_file:
+            # Regex redaction first, SpaCy redaction runs on its output like in `redact_text()`
+            redacted = stream.redact_stream(stream.read_chunks(input_file, chunk_size), self.regex.find_spans, overlap=overlap)
+
+            if spacy is not None:
+                honorifics_pattern = self.regex.get_honorifics_pattern()
+                find_spans = lambda text: spacy.find_spans(honorifics_pattern, text, spacy.create_nlp_doc(text))
+                redacted = stream.redact_stream(redacted, find_spans, overlap=overlap)
+
+            written = 0
+            for chunk in redacted:
+                output_file.write(chunk)
+                written += len(chunk)
+
+                if progress is not None:
+                    progress(written)
 
-        # Then apply SpaCy redactions
-        honorifics_pattern = self.regex.get_honorifics_pattern()
-        content = self.spacy.get_texts_to_redact(honorifics_pattern, content, redact_now=True)
+
+    def redact_pdf(self, input_file: str, output_file: str, *, tier: str | None = None):
+        if self.__use_pdf_workers(input_file):
+            return self.__redact_pdf_parallel(input_file, output_file, tier or self.tier)
+
+        spacy = self.get_spacy(tier)
+        doc, word_indexes = self.__prepare_pdf(input_file)
+        texts = [ word_index.get_text() for word_index in word_indexes ]
+
+        # Run every page through the NLP model in batches
+        nlp_docs = self.__create_nlp_docs(spacy, texts)
+
+        self.__finish_pdf(spacy, (doc, word_indexes), texts, nlp_docs, output_file)
+
+
+    def find_pdf_rects(self, input_file: str, pages: range | None = None, *, tier: str | None = None) -> list[list[fitz.Rect]]:
+        """
+        Finds the rectangles to redact on some pages of a PDF without
+        redacting them, which is what each PDF worker process runs.
+
+        Parameters:
+            input_file:     Path to the PDF file
+            pages:          Page numbers to look at, defaults to every page
+            tier:           NER tier to use instead of the redactor's default
+
+        Returns:
+            rects:          The rectangles of each page in `pages`, in order
+        """
+        spacy = self.get_spacy(tier)
+        doc, word_indexes = self.__prepare_pdf(input_file, pages)
+
+        with _pymupdf_lock:
+            doc.close()
+
+        nlp_docs = self.__create_nlp_docs(spacy, [ word_index.get_text() for word_index in word_indexes ])
+
+        return [ self.__page_rects(spacy, word_index, nlp_doc) for word_index, nlp_doc in zip(word_indexes, nlp_docs) ]
+
+
+    def close(self):
+        """
+        Shuts down the PDF worker processes, if any were started.
+        """
+        with self.__pools_lock:
+            for pool in self.__pools.values():
+                pool.shutdown()
+
+            self.__pools.clear()
+
+
+    def __use_pdf_workers(self, input_file: str | bytes) -> bool:
+        if self.__pdf_workers <= 1:
+            return False
+
+        with _pymupdf_lock, self.__open_pdf(input_file) as doc:
+            page_count = len(doc)
+
+        # Small documents aren't worth the trip to the workers
+        return page_count > self.__pdf_chunk_size
+
+
+    def __redact_pdf_parallel(self, input_file: str | bytes, output_file: str | None, tier: str, check: Callable[[], None] | None = None) -> bytes | None:
+        import pymupdf as fitz
+
+        # Workers open the PDF themselves, one held in memory is spooled to a
+        # temporary file they all read rather than sent along with every chunk
+        if isinstance(input_file, bytes):
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as file:
+                file.write(input_file)
+
+            try:
+                return self.__redact_pdf_parallel(file.name, output_file, tier, check)
+            finally:
+                os.remove(file.name)
+
+        with _pymupdf_lock, self.__open_pdf(input_file) as doc:
+            page_count = len(doc)
+
+        chunks = [ range(start, min(start + self.__pdf_chunk_size, page_count)) for start in range(0, page_count, self.__pdf_chunk_size) ]
+
+        pool = self.__get_pool(tier)
+        futures = [ pool.submit(_find_pdf_rects, input_file, chunk.start, chunk.stop) for chunk in chunks ]
+        page_rects = []
+
+        try:
+            for future in futures:
+                if check is not None:
+                    check()
+
+                page_rects += future.result()
+        finally:
+            # Chunks no worker has started yet are dropped if the run stops
+            for future in futures:
+                future.cancel()
+
+        # Pages are redacted in order, exactly like the serial path does
+        with _pymupdf_lock:
+            doc = self.__open_pdf(input_file)
+
+            with metrics.timed("pdf_redact"):
+                for page, rects in zip(doc, page_rects):
+                    redact_rects(page, [ fitz.Rect(r) for r in rects ])
+
+            # Without an output file the redacted PDF is returned as bytes
+            with metrics.timed("pdf_save"):
+                if output_file is None:
+                    return doc.tobytes(**self.__pdf_save_options)
+
+                doc.save(output_file, **self.__pdf_save_options)
+
+
+    def __get_pool(self, tier: str) -> ProcessPoolExecutor:
+        # One pool per tier, each worker loads its model once and keeps it.
+        # Workers are spawned rather than forked so they don't inherit the
+        # parent's threads and loaded models
+        with self.__pools_lock:
+            if tier not in self.__pools:
+                self.__pools[tier] = ProcessPoolExecutor(
+                    max_workers=self.__pdf_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_pdf_worker,
+                    initargs=(tier, self.__batch_size, *self.__ner_windows, *self.__regex_timeouts),
+                )
+
+            return self.__pools[tier]
+
+
+    def get_fingerprint(self, tier: str | None = None) -> str:
+        """
+        Hash of everything besides the input that decides a tier's outputs:
+        the cache format version, the regex patterns, the NER model and how
+        PDFs are saved. Outputs made under another fingerprint may differ
+        from what redacting the same input again gives.
+        """
+        spacy = self.get_spacy(tier)
+        ner_fingerprint = spacy.get_fingerprint() if spacy is not None else "regex"
+
+        return make_key(b"", repr(sorted(self.__pdf_save_options.items())), self.regex.get_fingerprint(), ner_fingerprint)
+
+
+    def __cache_key(self, spacy: SpacyRedactor | None, data: bytes | str, file_type: str) -> str | None:
+        if self.cache is None:
+            return None
+
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        # The output format follows the file type (and how PDFs are saved), and
+        # the output itself the regex patterns and the NER model (or its absence
+        # on the "regex" tier)
+        ner_fingerprint = spacy.get_fingerprint() if spacy is not None else "regex"
+        save_fingerprint = repr(sorted(self.__pdf_save_options.items())) if file_type == "pdf" else ""
+
+        return make_key(data, file_type, save_fingerprint, self.regex.get_fingerprint(), ner_fingerprint)
+
+
+    def __create_nlp_docs(self, spacy: SpacyRedactor | None, texts: list[str], check: Callable[[], None] | None = None) -> list[Doc | None]:
+        # No NER on the "regex" tier
+        if spacy is None:
+            return [ None ] * len(texts)
+
+        return spacy.create_nlp_docs(texts, check=check)
+
+
+    def __read_data(self, data: bytes | str | IO, file_type: str) -> bytes | str:
+        if hasattr(data, "read"):
+            data = data.read()
+
+        if file_type in self.BINARY_TYPES and not isinstance(data, bytes):
+            raise Exception(f"{file_type.upper()} data must be given as bytes")
+
+        if file_type not in self.BINARY_TYPES and isinstance(data, bytes):
+            data = data.decode("utf-8")
+
+        return data
+
+
+    def __pdf_units(self, data: bytes) -> Iterator[tuple[str, WordIndex]]:
+        with _pymupdf_lock:
+            doc = self.__open_pdf(data)
+
+        try:
+            for page in range(len(doc)):
+                with _pymupdf_lock:
+                    word_index = WordIndex(doc[page].get_text("words"))
+
+                yield word_index.get_text(), word_index
+        finally:
+            with _pymupdf_lock:
+                doc.close()
+
+
+    def __scan_first(self, spacy: SpacyRedactor | None, units: Iterable[tuple[str, WordIndex | None]]) -> list[dict]:
+        scanned = []
+
+        try:
+            # Every page's regex patterns before any NLP
+            for page, (text, word_index) in enumerate(units):
+                span = self.regex.find_first(text, pdf=word_index is not None)
+
+                if span is not None:
+                    return [ self.__finding("regex", span, page, word_index) ]
+
+                scanned.append( (text, word_index) )
+        finally:
+            # Stops the page extraction of PDFs
+            if hasattr(units, "close"):
+                units.close()
+
+        if spacy is None:
+            return []
+
+        for chunk in range(0, len(scanned), self.__batch_size):
+            batch = scanned[chunk:chunk + self.__batch_size]
+
+            for page, (_, word_index), nlp_doc in zip(range(chunk, len(scanned)), batch, spacy.create_nlp_docs([ text for text, _ in batch ])):
+                span = spacy.find_first(nlp_doc)
+
+                if span is not None:
+                    return [ self.__finding("ner", span, page, word_index) ]
+
+        return []
+
+
+    def __scan_all(self, spacy: SpacyRedactor | None, documents: list[list[tuple[str, WordIndex | None]]]) -> list[list[dict]]:
+        # One NLP pass over every text of every document, like `redact_data()`
+        nlp_docs = iter(self.__create_nlp_docs(spacy, [ text for units in documents for text, _ in units ]))
+        findings = []
+
+        for units in documents:
+            found = []
+
+            for page, (text, word_index) in enumerate(units):
+                nlp_doc = next(nlp_docs)
+                spans = SpanSet()
+                categories = {}
+                regex_spans = self.regex.find_pdf_spans(text) if word_index is not None else self.regex.find_spans(text)
+                ner_spans = spacy.find_spans(self.regex.get_honorifics_pattern(), text, nlp_doc) if spacy is not None else []
+
+                # Keyed by start, a part joining an accepted span keeps that span's category
+                for category, span in [ *( ("regex", span) for span in regex_spans ), *( ("ner", span) for span in ner_spans ) ]:
+                    for part in spans.add(span):
+                        categories.setdefault(part.start, category)
+
+                found.extend( self.__finding(categories[span.start], span, page, word_index) for span in spans )
+
+            findings.append(found)
+
+        return findings
+
+
+    def __finding(self, category: str, span: Span, page: int, word_index: WordIndex | None) -> dict:
+        finding = { "category": category, "label": span.replace, "start": span.start, "end": span.end }
+
+        if word_index is not None:
+            finding["page"] = page
+            finding["rects"] = [ [ r.x0, r.y0, r.x1, r.y1 ] for r in word_index.rects_for(span.start, span.end) ]
+
+        return finding
+
+
+    def __read_text(self, input_path: str) -> str:
+        if not os.path.exists(input_path):
+            raise Exception(f"The input path to `redact_text()` doesn't exist: {input_path}")
+
+        with open(input_path, "r") as file:
+            return file.read()
+
+
+    def __read_bytes(self, input_path: str) -> bytes:
+        if not os.path.exists(input_path):
+            raise Exception(f"The input path doesn't exist: {input_path}")
+
+        with open(input_path, "rb") as file:
+            return file.read()
+
+
+    def __write_output(self, output_path: str, result: bytes | str):
+        if isinstance(result, bytes):
+            with open(output_path, "wb") as file:
+                file.write(result)
+        else:
+            with open(output_path, "w") as file:
+                file.write(result)
+
+
+    def __prepare_text(self, content: str) -> str:
+        # Apply regex redaction first, SpaCy redactions run on the result
+        return self.regex.redact_text(content)
+
+
+    def __finish_text(self, spacy: SpacyRedactor | None, content: str, texts: list[str], nlp_docs: list[Doc | None], output_path: str | None) -> str:
+        if spacy is not None:
+            honorifics_pattern = self.regex.get_honorifics_pattern()
+            content = spacy.get_texts_to_redact(honorifics_pattern, content, redact_now=True, nlp_doc=nlp_docs[0])
 
         # Datatype checking
         if isinstance(content, list):
             raise Exception("`content` in `PiiRedactor.redact_text()` is somehow a list!")
 
-        # Return the redacted text if not saving redacted output
-        if not save:
-            return content
+        if output_path is not None:
+            with open(output_path, "w") as file:
+                file.write(content)
+
+        return content
+
+
+    def __finish_docx(self, spacy: SpacyRedactor | None, docx_text: DocxText, texts: list[str], nlp_docs: list[Doc | None], output_file: str | None) -> bytes | None:
+        # Regex and NER both run on the original text like for PDFs,
+        # regex spans win where they overlap
+        spans = SpanSet()
+
+        for span in self.regex.find_spans(texts[0]):
+            spans.add(span)
 
-        with open(output_path, "w") as file:
-            file.write(content)
+        if spacy is not None:
+            for span in spacy.find_spans(self.regex.get_honorifics_pattern(), texts[0], nlp_docs[0]):
+                spans.add(span)
 
+        with metrics.timed("docx_write"):
+            docx_text.apply_spans(list(spans))
 
-    def redact_pdf(self, input_file: str, output_file: str):
-        if not input_file.endswith(".pdf"):
+            # Without an output file the redacted document is returned as bytes
+            if output_file is None:
+                return docx_text.to_bytes()
+
+            docx_text.save(output_file)
+
+
+    def __open_pdf(self, input_file: str | bytes) -> fitz.Document:
+        import pymupdf as fitz
+
+        # PDFs held in memory are opened straight from their bytes
+        if isinstance(input_file, bytes):
+            return fitz.open(stream=input_file, filetype="pdf")
+
+        if not input_file.lower().endswith(".pdf"):
             raise Exception("Input file for PDF redaction is NOT a PDF file!")
 
-        doc = fitz.open(input_file)
+        return fitz.open(input_file)
+
+
+    def __prepare_pdf(self, input_file: str | bytes, pages: range | None = None, *, check: Callable[[], None] | None = None) -> tuple[fitz.Document, list[WordIndex]]:
+        timing = metrics.is_enabled()
+
+        with _pymupdf_lock, metrics.timed("pdf_extract"):
+            doc = self.__open_pdf(input_file)
+            word_indexes = []
+
+            # Each page's words are extracted once, the index maps matches in the
+            # joined words text back to where they are on the page
+            for number in (pages if pages is not None else range(len(doc))):
+                if check is not None:
+                    check()
+
+                start = time.perf_counter()
+                word_indexes.append( WordIndex(doc[number].get_text("words")) )
+
+                if timing:
+                    metrics.record_page(number, "extract", time.perf_counter() - start)
+
+        return doc, word_indexes
+
+
+    def __page_rects(self, spacy: SpacyRedactor | None, word_index: WordIndex, nlp_doc: Doc | None) -> list[fitz.Rect]:
+        # Regex redaction first, then SpaCy redaction
+        rects = self.regex.get_pdf_rects(word_index)
+
+        if spacy is not None:
+            rects += spacy.get_pdf_rects(word_index, self.regex.get_honorifics_pattern(), nlp_doc)
+
+        return rects
+
+
+    def __finish_pdf(self, spacy: SpacyRedactor | None, state: tuple[fitz.Document, list[WordIndex]], texts: list[str], nlp_docs: list[Doc | None], output_file: str | None, *, check: Callable[[], None] | None = None) -> bytes | None:
+        doc, word_indexes = state
+        timing = metrics.is_enabled()
+        page_seconds = []
+        page_rects = []
+
+        for word_index, nlp_doc in zip(word_indexes, nlp_docs):
+            if check is not None:
+                check()
+
+            start = time.perf_counter()
+            page_rects.append(self.__page_rects(spacy, word_index, nlp_doc))
+            page_seconds.append(time.perf_counter() - start)
+
+        with _pymupdf_lock:
+            with metrics.timed("pdf_redact"):
+                for page, rects, seconds in zip(doc, page_rects, page_seconds):
+                    start = time.perf_counter()
+                    redact_rects(page, rects)
+
+                    if timing:
+                        metrics.record_page(page.number, "redact", seconds + time.perf_counter() - start)
+
+            # Without an output file the redacted PDF is returned as bytes
+            with metrics.timed("pdf_save"):
+                if output_file is None:
+                    return doc.tobytes(**self.__pdf_save_options)
+
+                doc.save(output_file, **self.__pdf_save_options)
 
-        for page in doc:
-            words = page.get_text("words")
-            words_text = " ".join( [w[4] for w in words] )
 
-            nlp_doc = self.spacy.create_nlp_doc(words_text)
+# Redactor of a PDF worker process, loaded once by `_init_pdf_worker()`
+_pdf_worker_redactor: PiiRedactor | None = None
 
-            # Apply regex redaction first
-            self.regex.apply_pdf_redaction(page, words_text)
+def _init_pdf_worker(tier: str, batch_size: int, ner_window_size: int, ner_window_overlap: int, regex_pattern_timeout: float | None, regex_document_timeout: float | None):
+    global _pdf_worker_redactor
+    _pdf_worker_redactor = PiiRedactor(
+        tier=tier, batch_size=batch_size, ner_window_size=ner_window_size, ner_window_overlap=ner_window_overlap,
+        regex_pattern_timeout=regex_pattern_timeout, regex_document_timeout=regex_document_timeout
+    )
 
-            # Then apply Spacy redaction
-            self.spacy.apply_pdf_redaction(page, nlp_doc)
 
-        doc.save(output_file, garbage=3, clean=True, deflate=True)
+def _find_pdf_rects(input_file: str, start: int, stop: int) -> list[list[tuple]]:
+    # Rects are sent back as plain tuples
+    return [ [ tuple(r) for r in rects ] for rects in _pdf_worker_redactor.find_pdf_rects(input_file, range(start, stop)) ]
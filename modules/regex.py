@@ -1,41 +1,70 @@
+from __future__ import annotations
+import bisect
+import hashlib
+import time
+from itertools import accumulate
+from typing import TYPE_CHECKING
 import regex as re
-from pymupdf import Page
+from modules.spans import Span, apply_spans
+from modules.keywords import KeywordIndex
+from modules.trie import trie_alternation
+from modules.words import WordIndex
+from modules import metrics
+
+if TYPE_CHECKING:
+    from pymupdf import Rect
 
 class RegexRedactor:
-    def __init__(self):
+    def __init__(self, *, pattern_timeout: float | None = None, document_timeout: float | None = None):
+        """
+        Parameters:
+            pattern_timeout:    Seconds one pattern may search one document for. A
+                                pattern running out of it is reported as timed out and
+                                fails the document, it may have missed matches
+            document_timeout:   Seconds every pattern together may search one document
+                                for, running out of it fails the document too. Nothing
+                                is ever left unredacted without an error
+        """
+        self.__pattern_timeout = pattern_timeout
+        self.__document_timeout = document_timeout
         self.__honorifics_pattern = r'(?:Mr|Mrs|Ms|Miss|Mx|Dr)\.?'
         self.__patterns = [
             # Pattern, Replacement, [Optional additional flags]
 
             # Username
-            ( r'\b(?:SSO ID|SSO Username|Directory ID|Network ID|NetID|Net ID|LDAP ID|Active Directory ID|AD Username|Windows Login|Workstation Login|Computer Login|Portal ID|Portal Username|Profile ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_-]{5,15}', "[SYSTEM ID]", re.IGNORECASE ),
-            ( r'(?<=username\s*[:\-]?\s*)[A-Za-z0-9._-]+', "[USERNAME]", re.IGNORECASE ),
-            ( r'(?<=user name\s*[:\-]?\s*)[A-Za-z0-9._-]+', "[USERNAME]", re.IGNORECASE ),
-            ( r'\b(?:Username|User Name|UserID|User ID|System Username|Account Username|Login Username|Account Login|Login Name|Handle|Screen Name|Display Name|Profile Name)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{5,15}', "[SYSTEM USERNAME]", re.IGNORECASE ),
+            ( r'\b(?:SSO ID|SSO Username|Directory ID|Network ID|NetID|Net ID|LDAP ID|Active Directory ID|AD Username|Windows Login|Workstation Login|Computer Login|Portal ID|Portal Username|Profile ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_-]{5,15}', "[SYSTEM ID]", re.IGNORECASE ),
+            ( r'(?<=username\s*(?:[:\-]\s*)?)[A-Za-z0-9._-]+', "[USERNAME]", re.IGNORECASE ),
+            ( r'(?<=user name\s*(?:[:\-]\s*)?)[A-Za-z0-9._-]+', "[USERNAME]", re.IGNORECASE ),
+            ( r'\b(?:Username|User Name|UserID|User ID|System Username|Account Username|Login Username|Account Login|Login Name|Handle|Screen Name|Display Name|Profile Name)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{5,15}', "[SYSTEM USERNAME]", re.IGNORECASE ),
 
             # Login ID
-            ( r'\b(?:Email Login|Email Username|Office365 Login|Google Login|School Login Email|Office 365 Login)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{3,40}', "[EMAIL LOGIN]", re.IGNORECASE ),
-            ( r'(?<=login id\s*[:\-]?\s*)[A-Za-z0-9._-]+', "[LOGIN ID]", re.IGNORECASE ),
+            ( r'\b(?:Email Login|Email Username|Office365 Login|Google Login|School Login Email|Office 365 Login)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{3,40}', "[EMAIL LOGIN]", re.IGNORECASE ),
+            ( r'(?<=login id\s*(?:[:\-]\s*)?)[A-Za-z0-9._-]+', "[LOGIN ID]", re.IGNORECASE ),
 
-            # Email Addresses 
+            # Email Addresses
+            # (?:(?<![a-zA-Z0-9_.+-])|\G) - Only starts where the local part's characters start (or where the last match ended),
+            #                               a start inside them fails like the one before it, retrying each is quadratic
             # [a-zA-Z0-9_.+-]+ - Repeated one or more times: Any lowercase/capital letter, number, underscore, period, plus sign, and dash
             # @ - Symbol splitting local part and domain 
             # [a-zA-Z0-9-]+ - Repeated one or more times: Any lowercase/capital letter, number, and dash
             # \. - Matches one period
             # [a-zA-Z0-9-.]+ - Repeated one or more times: Any lowercase/capital letter, number, and dash
-            ( r'[a-zA-Z0-9_.+-]+\s*(?:@|\[at\])\s*[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+', "[EMAIL]" ),
+            ( r'(?:(?<![a-zA-Z0-9_.+-])|\G)[a-zA-Z0-9_.+-]+\s*(?:@|\[at\])\s*[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+', "[EMAIL]" ),
 
             # Social Handle
             ( r'@[A-Za-z0-9._-]+', "[SOCIAL MEDIA]" ),
 
             # Web URL
-            ( r'\b(?:https?://|www\.)[^\s]+|\b[a-z0-9.-]+\.(?:com|net|org|edu|gov)\b', "[URL]", re.IGNORECASE ),
+            # The bare domain only starts at the first word boundary of a run of host characters (or where the last
+            # match ended), a later start in the run fails like it does, retrying each is quadratic. The lookbehind
+            # after the run always holds, it only keeps the engine from rescanning the run for every "." it gives back
+            ( r'\b(?:https?://|www\.)[^\s]+|\b(?:\G|(?<!\b[a-z0-9.-]+?))[a-z0-9.-]+(?<=[a-z0-9.-])\.(?:com|net|org|edu|gov)\b', "[URL]", re.IGNORECASE ),
 
             # PO Box
-            ( r'\b(?:P\.?\s*O\.?\s*(?:Box|Bin)|Post\s+Office\s+(?:Box|Bin)|(?:Box|Bin)\s*#?\s*\d+|#\s*\d+)\b', "[PO BOX]", re.IGNORECASE ),
+            ( r'\b(?:P\.?\s*O\.?\s*(?:Box|Bin)|Post\s+Office\s+(?:Box|Bin)|(?:Box|Bin)\s*(?:#\s*)?\d+|#\s*\d+)\b', "[PO BOX]", re.IGNORECASE ),
 
             # Health Insurance Policy/Member numbers
-            ( r'(?:Policy No|Policy Number|Policy ID|Member #|Subscriber No|Coverage ID|Insurance #|Group ID|Plan ID|Plan #|Member ID|Policy #|Subscriber ID|Group #|Group Number|Insurance ID|Coverage #|Policy Reference|Policy Ref)\s*[:\-]?\s*[A-Za-z0-9-_/.]{4,20}', "[HEALTH INSURANCE #]", re.IGNORECASE ),
+            ( r'(?:Policy No|Policy Number|Policy ID|Member #|Subscriber No|Coverage ID|Insurance #|Group ID|Plan ID|Plan #|Member ID|Policy #|Subscriber ID|Group #|Group Number|Insurance ID|Coverage #|Policy Reference|Policy Ref)\s*(?:[:\-]\s*)?[A-Za-z0-9-_/.]{4,20}', "[HEALTH INSURANCE #]", re.IGNORECASE ),
 
             # Routing Number
             (
@@ -45,19 +74,19 @@ class RegexRedactor:
             ),
 
             # Bank Account Info
-            ( r'(?:Account Number|Account #|Acct No|Acct #|Bank Account|Savings Acct|Acct|Savings Account|Account Num|Acct Num|Acct Number|A/C No|A/C|ACCT#|AccountNo)\s*[:\.-]?\s*[0-9_/ .A-Za-z]{6,17}', "[BANK ACCOUNT]", re.IGNORECASE ),
+            ( r'(?:Account Number|Account #|Acct No|Acct #|Bank Account|Savings Acct|Acct|Savings Account|Account Num|Acct Num|Acct Number|A/C No|A/C|ACCT#|AccountNo)\s*(?:[:\.-]\s*)?[0-9_/ .A-Za-z]{6,17}', "[BANK ACCOUNT]", re.IGNORECASE ),
 
             # GPS Coordinate
-            ( r'(?:Lat|Lon|Lat/Lon|Latitude|Longitude|Long|Lat-Log|Lat-Lon|GPS|GPS COORDINATES|Lat/Long)\s*[,:.\-]?\s*[+-]?\d{1,3}\.\d+[NESW]?(?:\s*[, ]\s*[+-]?\d{1,3}\.\d+[NESW]?)?', "[COORDINATE]", re.IGNORECASE ),
+            ( r'(?:Lat|Lon|Lat/Lon|Latitude|Longitude|Long|Lat-Log|Lat-Lon|GPS|GPS COORDINATES|Lat/Long)\s*(?:[,:.\-]\s*)?[+-]?\d{1,3}\.\d+[NESW]?(?:\s*[, ]\s*[+-]?\d{1,3}\.\d+[NESW]?)?', "[COORDINATE]", re.IGNORECASE ),
 
             # GPS Device ID
-            ( r'\b(?:GPS ID|GPS Device ID|GPS Tracker ID|Tracking Device Number|Location Tracker ID|Unit ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{4,40}', "[GPS DEVICE]", re.IGNORECASE ),
+            ( r'\b(?:GPS ID|GPS Device ID|GPS Tracker ID|Tracking Device Number|Location Tracker ID|Unit ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{4,40}', "[GPS DEVICE]", re.IGNORECASE ),
 
             # Employment ID
-            ( r'\b(?:Employee Number|Employee #|Employee No|Employee ID|Worker ID|Worker Number|Staff ID|Staff Number|Staff #|HR ID|Payroll ID|Payroll Number|Pay ID|Badge Number|Badge #|Contractor ID|Vendor ID|Associate ID|Operator ID)\b\s*[:#=.–—-]?\s*[0-9]{3,9}', "[EMPLOYMENT #]", re.IGNORECASE ),
+            ( r'\b(?:Employee Number|Employee #|Employee No|Employee ID|Worker ID|Worker Number|Staff ID|Staff Number|Staff #|HR ID|Payroll ID|Payroll Number|Pay ID|Badge Number|Badge #|Contractor ID|Vendor ID|Associate ID|Operator ID)\b\s*(?:[:#=.–—-]\s*)?[0-9]{3,9}', "[EMPLOYMENT #]", re.IGNORECASE ),
 
             # Employment Role
-            #( r'\b(?:Job Title|Position Title|Role Title|Position|Job Level|Job Code|Employee Level|Band|Pay Grade|Pay Band|Department|Division|Team|Cost Center|Reporting To|Reports To|Supervisor|Supervisor Name|Manager|Manager Name|Direct Manager|Line Manager)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\s&/.-]{3,40}', "[EMPLOYMENT ROLE]", re.IGNORECASE ),
+            #( r'\b(?:Job Title|Position Title|Role Title|Position|Job Level|Job Code|Employee Level|Band|Pay Grade|Pay Band|Department|Division|Team|Cost Center|Reporting To|Reports To|Supervisor|Supervisor Name|Manager|Manager Name|Direct Manager|Line Manager)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\s&/.-]{3,40}', "[EMPLOYMENT ROLE]", re.IGNORECASE ),
 
             # Employment Evaluation Performance
             (
@@ -70,29 +99,29 @@ class RegexRedactor:
             ),
 
             # Employment Status
-            ( r'\b(?:Employment Status|Job Status|Employee Status|Work Status|Full-Time/Part-Time|FTE Status|Contract Type|Contract Status|Termination Reason|Separation Reason|Termination Type)\b\s*[:#=.–—-]?\s*[A-Za-z\s/-]{3,30}', "[EMPLOYMENT STATUS]", re.IGNORECASE ),
+            ( r'\b(?:Employment Status|Job Status|Employee Status|Work Status|Full-Time/Part-Time|FTE Status|Contract Type|Contract Status|Termination Reason|Separation Reason|Termination Type)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z\s/-]{3,30}', "[EMPLOYMENT STATUS]", re.IGNORECASE ),
 
             # Academic Transcript ID
-            ( r'\b(?:Transcript Number|Academic Record ID|Report ID)\b\s*[:#=.–—-]?\s*[0-9]{3,7}', "[TRANSCRIPT ID]", re.IGNORECASE ),
+            ( r'\b(?:Transcript Number|Academic Record ID|Report ID)\b\s*(?:[:#=.–—-]\s*)?[0-9]{3,7}', "[TRANSCRIPT ID]", re.IGNORECASE ),
 
             # Grades Score
-            ( r'\b(?:Grade|Final Grade|Course Grade|Letter Grade|Exam Grade|Test Grade|Quiz Grade|Assignment Grade|Midterm Grade|Final Exam Grade|Score|Test Score|Exam Score|Quiz Score|Assignment Score|Final Score|Overall Score|Percentage|Percent Score|Percent Grade)\b\s*[:#=.–—-]?\s*[A-Za-z0-9+\-%.\s]{1,10}', "[ACADEMIC GRADES]", re.IGNORECASE ),
+            ( r'\b(?:Grade|Final Grade|Course Grade|Letter Grade|Exam Grade|Test Grade|Quiz Grade|Assignment Grade|Midterm Grade|Final Exam Grade|Score|Test Score|Exam Score|Quiz Score|Assignment Score|Final Score|Overall Score|Percentage|Percent Score|Percent Grade)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9+\-%.\s]{1,10}', "[ACADEMIC GRADES]", re.IGNORECASE ),
 
             # GPA
-            ( r"\b(?:GPA|Cumulative GPA|Major GPA|Overall GPA|Term GPA|Semester GPA|Grade Point Average|CGPA|QPA)\b\s*[:#=.–—-]?\s*[0-9.]{1,5}", "[GPA]", re.IGNORECASE ),
+            ( r"\b(?:GPA|Cumulative GPA|Major GPA|Overall GPA|Term GPA|Semester GPA|Grade Point Average|CGPA|QPA)\b\s*(?:[:#=.–—-]\s*)?[0-9.]{1,5}", "[GPA]", re.IGNORECASE ),
 
             # Class Rank
-            ( r"\b(?:Class Rank|Rank in Class|Rank|Standing|Academic Standing|Class Standing|Rank/GPA|Percentile Rank|Percentile|Top Percent|Top %|Dean's List Status|Probation Status|Academic Status)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\s%/.-]{3,30}", "[CLASS RANK]", re.IGNORECASE ),
+            ( r"\b(?:Class Rank|Rank in Class|Rank|Standing|Academic Standing|Class Standing|Rank/GPA|Percentile Rank|Percentile|Top Percent|Top %|Dean's List Status|Probation Status|Academic Status)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\s%/.-]{3,30}", "[CLASS RANK]", re.IGNORECASE ),
 
             # Test Score
-            ( r'\b(?:SAT Score|ACT Score|GRE Score|GMAT Score|LSAT Score|MCAT Score|TOEFL Score|IELTS Score|Standardized Test Score|Entrance Exam Score|Admission Test Score)\b\s*[:#=.–—-]?\s*[0-9.]{2,5}', "[TEST SCORE]", re.IGNORECASE ),
+            ( r'\b(?:SAT Score|ACT Score|GRE Score|GMAT Score|LSAT Score|MCAT Score|TOEFL Score|IELTS Score|Standardized Test Score|Entrance Exam Score|Admission Test Score)\b\s*(?:[:#=.–—-]\s*)?[0-9.]{2,5}', "[TEST SCORE]", re.IGNORECASE ),
 
             # Education ID
             ( r'\b(?:Student Number|Student #|Student No|Student ID|Campus ID|Campus-Wide ID|Banner ID|School ID|College ID|University ID|Enrollment ID|CWID|Registration ID|Applicant ID|Application Number|Candidate ID)\b(?:\s*[:#=.–—-]\s+)[A-Z0-9]{3,10}', "[EDUCATION ID]", re.IGNORECASE ),
 
             # Generic Record ID
             (
-                r'\b(?:Employee ID|Emp ID|Staff ID|Badge #|ID Badge|Banner ID|TTU ID|Customer ID|Client ID|User ID|Member ID|Login ID|ID #|ID Number|Record ID|Profile ID)\b\s*[#:.\-]?\s*[a-zA-Z0-9_-]{4,15}',
+                r'\b(?:Employee ID|Emp ID|Staff ID|Badge #|ID Badge|Banner ID|TTU ID|Customer ID|Client ID|User ID|Member ID|Login ID|ID #|ID Number|Record ID|Profile ID)\b\s*(?:[#:.\-]\s*)?[a-zA-Z0-9_-]{4,15}',
                 "[GENERIC ID]",
                 re.IGNORECASE
             ),
@@ -101,43 +130,86 @@ class RegexRedactor:
             ( r"\b[0-9]{2}-[0-9]{7}\b", "[TIN]" ),
 
             # License Keys
-            ( r'\b(?:License Key|Product Key|Software Key|Activation Key|Registration Key|Serial Key|Serial Code)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{5,40}', "[LICENSE KEY]", re.IGNORECASE ),
+            ( r'\b(?:License Key|Product Key|Software Key|Activation Key|Registration Key|Serial Key|Serial Code)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{5,40}', "[LICENSE KEY]", re.IGNORECASE ),
 
             # Authentication Secrets
-            ( r'\b(?:X-API-Key|API_KEY|SESSION_TOKEN|AUTHORIZATION|Set-Cookie|API Key|API Token|Access Token|Auth Token|Authorization|Bearer|JWT|Session ID|SessionID|Secret|API Secret|OAuth Token|PrivateKey|PublicKey|Key|Token|Cookie)\b\s*[:#=.–—-]?\s*[0-9A-Za-z_=./+\-]{15,200}', "[AUTH SECRET]",  re.IGNORECASE),
+            ( r'\b(?:X-API-Key|API_KEY|SESSION_TOKEN|AUTHORIZATION|Set-Cookie|API Key|API Token|Access Token|Auth Token|Authorization|Bearer|JWT|Session ID|SessionID|Secret|API Secret|OAuth Token|PrivateKey|PublicKey|Key|Token|Cookie)\b\s*(?:[:#=.–—-]\s*)?[0-9A-Za-z_=./+\-]{15,200}', "[AUTH SECRET]",  re.IGNORECASE),
 
             # Financial Aid ID
-            ( r'\b(?:FAFSA ID|Aid ID|Award ID|Loan Servicer ID|Student Aid Number|Federal School Code)\b\s*[:#=.–—-]?\s*[A-Za-z0-9]{3,12}', "[FINANCIAL AID ID]", re.IGNORECASE ),
+            ( r'\b(?:FAFSA ID|Aid ID|Award ID|Loan Servicer ID|Student Aid Number|Federal School Code)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9]{3,12}', "[FINANCIAL AID ID]", re.IGNORECASE ),
 
             # Financial Identifiers
-            ( r'\b(?:Loan Number|Loan #|Loan ID|Mortgage Number|Mortgage ID|Loan Account|Mortgage Account|Claim Number|Claim #|Claim ID|Case ID|Contract Number|Contract #|Agreement Number|Agreement #|Billing Account Number|Billing ID|Reference Number|Ref #|Customer Number)\b\s*[:#=.–—-]?\s*[0-9A-Za-z_/.\\-]{6,25}', "[FINANCIAL ID]", re.IGNORECASE ),
+            ( r'\b(?:Loan Number|Loan #|Loan ID|Mortgage Number|Mortgage ID|Loan Account|Mortgage Account|Claim Number|Claim #|Claim ID|Case ID|Contract Number|Contract #|Agreement Number|Agreement #|Billing Account Number|Billing ID|Reference Number|Ref #|Customer Number)\b\s*(?:[:#=.–—-]\s*)?[0-9A-Za-z_/.\\-]{6,25}', "[FINANCIAL ID]", re.IGNORECASE ),
 
             # NPI
-            ( r'\b(?:NPI|NPI Number|NPI #|NPI ID|NPI No)\b\s*[:#=.–—-]?\s*[0-9]{10}', "[NPI]", re.IGNORECASE ),
+            ( r'\b(?:NPI|NPI Number|NPI #|NPI ID|NPI No)\b\s*(?:[:#=.–—-]\s*)?[0-9]{10}', "[NPI]", re.IGNORECASE ),
 
             # DEA Number
-            ( r'\b(?:DEA|DEA #|DEA Number|DEA No|DEA ID)\b\s*[:#=.–—-]?\s*[A-Za-z]{2}[0-9]{7}', "[DEA #]", re.IGNORECASE ),
+            ( r'\b(?:DEA|DEA #|DEA Number|DEA No|DEA ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z]{2}[0-9]{7}', "[DEA #]", re.IGNORECASE ),
+
+            # United States Driver License Numbers
+            (
+                [
+                    r"\d{7}",                       # AL, AK, DE, ME, OR, DC, WV
+                    r"[a-zA-Z]\d{8}",               # AZ, GA, NE, VA
+                    r"\d{9}",                       # AZ, CT, HI, IA, LA, MT, NM, SC, UT
+                    r"9\d{8}",                      # AR
+                    r"[a-zA-Z]\d{7}",               # CA
+                    r"\d{2}-\d{3}-\d{4}",           # CO
+                    r"[a-zA-Z](\d{3}-*){2}\d{2}-*\d{3}-*\d", # FL
+                    r"[a-zA-Z]{2}\d{6}[a-zA-Z]",    # ID
+                    r"[a-zA-Z]\d{3}-*(\d{4}-*){2}", # IL
+                    r"\d{4}-\d{2}-\d{4}",           # IN
+                    r"\d{3}[a-zA-Z]{2}\d{4}",       # IA
+                    r"[a-zA-Z](\d{2}-){2}\d{4}",    # KA
+                    r"[a-zA-Z]\d{2}-\d{3}-\d{4}",   # KY
+                    r"[a-zA-Z]-*(\d{3}-*){4}",      # MD
+                    r"[a-zA-Z]\d{9}",               # MA, MO, OK
+                    r"[a-zA-Z](\s\d{3}){4}",        # MI
+                    r"[a-zA-Z]\d{12}",              # MI, MN
+                    r"\d{3}-\d{2}-\d{4}",           # MS
+                    r"([0][1-9]|[1][0-2])\d{3}([1-9]\d{3})", # MT
+                    r"\d{10}",                      # NV
+                    r"([0][1-9]|[1][0-2])([a-zA-Z]{3})(0[1-9]|[1-2][0-9]|3[0-1])\d", # NH
+                    r"[a-zA-Z]\d{4}-*(\d{5}-*){2}", # NJ
+                    r"(\d{3}){2}\s\d{3}",           # NY
+                    r"\d{12}",                      # NC
+                    r"[a-zA-Z]{3}-\d{2}-\d{4}",     # ND
+                    r"\d{8}",                       # OH, SD, TX, VT
+                    r"[a-zA-Z]{1}\d{4,8}",          # OH
+                    r"[a-zA-Z]{2}\d{3,7}",          # OH
+                    r"\d{2}( \d{3}){2}",            # PA
+                    r"[1-9]{2}\d{5}",               # RI
+                    r"\d{7,9}",                     # TN
+                    r"\d{7}[a-zA-Z]",               # VT
+                    r"[a-zA-Z](\d{2}-){2}\d{4}",    # VA
+                    r"[a-zA-Z]{3}\*\*[a-zA-Z]{2}\d{3}[a-zA-Z]\d", # WA
+                    r"[a-zA-Z]\d{6}",               # WV
+                    r"[a-zA-Z]\d{3}-(\d{4}-){2}\d{2}", # WI
+                    r"\d{6}-\d{3}",                 # WY
+                ],
+                "[DRIVER LICENSE #]", re.IGNORECASE ),
 
             # Professional License ID
-            ( r'\b(?:Medical License|Nursing License|RN License|LPN License|NP License|PA License|Physician License|Provider License|Provider ID|Practitioner ID|State License|License #|License Number|Bar Number|Bar License|Attorney ID|Attorney Number|Professional ID|Certification ID|Registry ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9-]{5,15}', "[LICENSE ID]", re.IGNORECASE ),
+            ( r'\b(?:Medical License|Nursing License|RN License|LPN License|NP License|PA License|Physician License|Provider License|Provider ID|Practitioner ID|State License|License #|License Number|Bar Number|Bar License|Attorney ID|Attorney Number|Professional ID|Certification ID|Registry ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9-]{5,15}', "[LICENSE ID]", re.IGNORECASE ),
 
             # IMEI
             ( r'(?i)(?<=IMEI.{0,100})[0-9]{14,15}', "[IMEI]", re.IGNORECASE ),
 
             # IMSI
-            ( r'\b(?:IMSI|IMSI Number|IMSI #|IMSI No|Subscriber IMSI)\b\s*[:#=.–—-]?\s*[0-9]{15}', "[IMSE]", re.IGNORECASE ),
+            ( r'\b(?:IMSI|IMSI Number|IMSI #|IMSI No|Subscriber IMSI)\b\s*(?:[:#=.–—-]\s*)?[0-9]{15}', "[IMSE]", re.IGNORECASE ),
 
             # ICCID
-            ( r'\b(?:ICCID|ICCID Number|ICCID #|SIM ICCID|SIM Card Number|SIM Serial Number|SIM Number|SIM ID)\b\s*[:#=.–—-]?\s*[0-9]{19,22}', "[ICCID]", re.IGNORECASE ),
+            ( r'\b(?:ICCID|ICCID Number|ICCID #|SIM ICCID|SIM Card Number|SIM Serial Number|SIM Number|SIM ID)\b\s*(?:[:#=.–—-]\s*)?[0-9]{19,22}', "[ICCID]", re.IGNORECASE ),
 
             # Device ID
-            ( r'\b(?:Device ID|Device Number|Device Code|Machine ID|Machine Identifier|Host ID|Hostname|Computer Name|System Name|Workstation Name)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{5,15}', "[DEVICE ID]", re.IGNORECASE ),
+            ( r'\b(?:Device ID|Device Number|Device Code|Machine ID|Machine Identifier|Host ID|Hostname|Computer Name|System Name|Workstation Name)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{5,15}', "[DEVICE ID]", re.IGNORECASE ),
 
             # Generic Serial Number
-            ( r'\b(?:Serial|Serial Number|Serial No|Serial #|S/N|SN|Device Serial|Device Serial Number|Phone Serial|Laptop Serial|Computer Serial|Mac Serial|iPhone Serial|Asset Tag|Asset ID|Asset Number|Product Serial|Product ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9-]{6,20}', "[GENERIC SERIAL #]", re.IGNORECASE ),
+            ( r'\b(?:Serial|Serial Number|Serial No|Serial #|S/N|SN|Device Serial|Device Serial Number|Phone Serial|Laptop Serial|Computer Serial|Mac Serial|iPhone Serial|Asset Tag|Asset ID|Asset Number|Product Serial|Product ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9-]{6,20}', "[GENERIC SERIAL #]", re.IGNORECASE ),
 
             # Biometric ID
-            ( r'\b(?:Fingerprint|Fingerprint ID|Fingerprint Number|Fingerprint Scan|Finger ID|FP ID|Fingerprint Code|Retina Scan|Retina ID|Retina Number|Iris Scan|Iris ID|Eye Scan|Voice ID|Voiceprint|Voiceprint ID|Voice Authentication ID|Face ID|Facial ID|Facial Recognition ID|Face Recognition ID|DNA ID|DNA Number|Genome ID|Genetic ID|Genetic Record)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\-]{6,32}', "[BIOMETRIC ID]", re.IGNORECASE ),
+            ( r'\b(?:Fingerprint|Fingerprint ID|Fingerprint Number|Fingerprint Scan|Finger ID|FP ID|Fingerprint Code|Retina Scan|Retina ID|Retina Number|Iris Scan|Iris ID|Eye Scan|Voice ID|Voiceprint|Voiceprint ID|Voice Authentication ID|Face ID|Facial ID|Facial Recognition ID|Face Recognition ID|DNA ID|DNA Number|Genome ID|Genetic ID|Genetic Record)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\-]{6,32}', "[BIOMETRIC ID]", re.IGNORECASE ),
 
             # Password
             ( r'\b(?:Password|Temp Password|Temporary Password|New Password|Old Password|Password Hint|Passcode)\b\s[:#=.–—-]?\s\S{6,64}', "[PASSWORD]", re.IGNORECASE ),
@@ -160,86 +232,86 @@ class RegexRedactor:
             ),
 
             # Tracking Number
-            ( r'\b(?:Tracking Number|Tracking #|USPS Tracking Number|UPS Tracking Number|FedEx Tracking Number|DHL Tracking ID|Generic Tracking #|Shipment ID|Package ID|Parcel ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{5,40}', "[TRACKING #]", re.IGNORECASE ),
+            ( r'\b(?:Tracking Number|Tracking #|USPS Tracking Number|UPS Tracking Number|FedEx Tracking Number|DHL Tracking ID|Generic Tracking #|Shipment ID|Package ID|Parcel ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{5,40}', "[TRACKING #]", re.IGNORECASE ),
 
             # Bluetooth / WiFi
-            ( r'\b(?:WiFi Address|Bluetooth MAC|BLE Address|WiFi MAC|Wireless ID|Wi-Fi Identifier)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{5,40}', "[BLUETOOTH/WIFI]", re.IGNORECASE ),
+            ( r'\b(?:WiFi Address|Bluetooth MAC|BLE Address|WiFi MAC|Wireless ID|Wi-Fi Identifier)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{5,40}', "[BLUETOOTH/WIFI]", re.IGNORECASE ),
 
             # Location Code
-            ( r'\b(?:Building Code|Site ID|Location ID|Site Code|Location Code|Office Location|Department Location|Building Number|Floor Number|Room Number|Physical Location ID|Facility Code)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{3,40}', "[LOCATION CODE]", re.IGNORECASE ),
+            ( r'\b(?:Building Code|Site ID|Location ID|Site Code|Location Code|Office Location|Department Location|Building Number|Floor Number|Room Number|Physical Location ID|Facility Code)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{3,40}', "[LOCATION CODE]", re.IGNORECASE ),
 
 
             # Billing Identifier
-            ( r'\b(?:Billing ID|Billing Number|Billing Account|Billing Account Number|Statement Number|Statement ID|Invoice Number|Invoice #|Invoice ID|Bill Pay ID|Payment ID|Customer Billing ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{6,25}', "[BILLING ID]", re.IGNORECASE ),
+            ( r'\b(?:Billing ID|Billing Number|Billing Account|Billing Account Number|Statement Number|Statement ID|Invoice Number|Invoice #|Invoice ID|Bill Pay ID|Payment ID|Customer Billing ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{6,25}', "[BILLING ID]", re.IGNORECASE ),
 
             # Subscription Membership ID
-            ( r'\b(?:Subscription Number|Subscription ID|Subscription Account|Member Billing ID|Membership Number|Membership Account|Plan Number|Plan ID|Policy Billing ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{5,25}', "[SUBSCRIPT MEMBERSHIP ID]", re.IGNORECASE ),
+            ( r'\b(?:Subscription Number|Subscription ID|Subscription Account|Member Billing ID|Membership Number|Membership Account|Plan Number|Plan ID|Policy Billing ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{5,25}', "[SUBSCRIPT MEMBERSHIP ID]", re.IGNORECASE ),
 
             # Payment ID
-            ( r'\b(?:Payment Reference|Payment Reference Number|Transaction Reference|Reference Number|Reference ID|Transaction ID|Payout ID|Disbursement ID|Claim Payment ID|Refund ID|Refund Reference)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{6,30}', "[PAYMENT ID]", re.IGNORECASE ),
+            ( r'\b(?:Payment Reference|Payment Reference Number|Transaction Reference|Reference Number|Reference ID|Transaction ID|Payout ID|Disbursement ID|Claim Payment ID|Refund ID|Refund Reference)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{6,30}', "[PAYMENT ID]", re.IGNORECASE ),
 
             # Ecommerce Transaction ID
-            ( r'\b(?:Order ID|Order Number|Receipt Number|Receipt ID|Checkout ID|Cart ID|Purchase ID|Sales Order Number|POS Transaction ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._-]{6,30}', "[TRANSACT ID]", re.IGNORECASE ),
+            ( r'\b(?:Order ID|Order Number|Receipt Number|Receipt ID|Checkout ID|Cart ID|Purchase ID|Sales Order Number|POS Transaction ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._-]{6,30}', "[TRANSACT ID]", re.IGNORECASE ),
 
             # Emergency Contact Info
-            ( r'\b(?:Emergency Contact|Emergency Contact Name|Emergency Contact Number|Emergency Contact Phone|Emergency Contact Relationship|Emergency Contact Person|ICE Contact|In Case Of Emergency Contact|Emergency Phone|Emergency Mobile)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\s().+\-]{3,40}', "[EMERGENCY CONTACT]", re.IGNORECASE ),
+            ( r'\b(?:Emergency Contact|Emergency Contact Name|Emergency Contact Number|Emergency Contact Phone|Emergency Contact Relationship|Emergency Contact Person|ICE Contact|In Case Of Emergency Contact|Emergency Phone|Emergency Mobile)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\s().+\-]{3,40}', "[EMERGENCY CONTACT]", re.IGNORECASE ),
 
             # Household Info
-            ( r"\b(?:Spouse Name|Partner Name|Husband Name|Wife Name|Father Name|Mother Name|Guardian Name|Child Name|Dependent Name|Son Name|Daughter Name|Parent Name|Sibling Name|Next of Kin|Next-Of-Kin|Family Member|Family Member Name)\b\s*[:#=.–—-]?\s*[A-Za-z\s'.-]{3,40}", "[HOUSEHOLD INFO]", re.IGNORECASE ),
+            ( r"\b(?:Spouse Name|Partner Name|Husband Name|Wife Name|Father Name|Mother Name|Guardian Name|Child Name|Dependent Name|Son Name|Daughter Name|Parent Name|Sibling Name|Next of Kin|Next-Of-Kin|Family Member|Family Member Name)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z\s'.-]{3,40}", "[HOUSEHOLD INFO]", re.IGNORECASE ),
 
             # Relationship Info
-            ( r'\b(?:Relationship|Relationship to You|Relation|Guardian|Dependent|Dependent Name|Dependent ID|Next of Kin|Next-Of-Kin)\b\s*[:#=.–—-]?\s*[A-Za-z\s-]{3,30}', "[RELATIONSHIP]", re.IGNORECASE ),
+            ( r'\b(?:Relationship|Relationship to You|Relation|Guardian|Dependent|Dependent Name|Dependent ID|Next of Kin|Next-Of-Kin)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z\s-]{3,30}', "[RELATIONSHIP]", re.IGNORECASE ),
 
             # Household Demographic
-            ( r'\b(?:Household Size|Number of Children|Number of Adults|Number of Dependents|Married Filing Status|Filing Status|Family Income Bracket)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\s+$,.-]{1,40}', "[HOUSEHOLD DEMOGRAPH]", re.IGNORECASE ),
+            ( r'\b(?:Household Size|Number of Children|Number of Adults|Number of Dependents|Married Filing Status|Filing Status|Family Income Bracket)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\s+$,.-]{1,40}', "[HOUSEHOLD DEMOGRAPH]", re.IGNORECASE ),
 
             # Earnings
-            ( r'\b(?:Salary|Base Salary|Annual Salary|Yearly Salary|Starting Salary|Current Salary|Hourly Rate|Hourly Wage|Pay Rate|Rate of Pay|Wage|Overtime Rate|Bonus|Annual Bonus|Signing Bonus|Commission|Commission Rate|Total Compensation|Total Comp|Pay Grade|Pay Band|Pay Level|Job Level|Salary Band|Compensation|Compensation Amount)\b\s*[:#=.–—-]?\s*[0-9,$%_.k\s\-]{4,25}', "[EARNINGS]", re.IGNORECASE ),
+            ( r'\b(?:Salary|Base Salary|Annual Salary|Yearly Salary|Starting Salary|Current Salary|Hourly Rate|Hourly Wage|Pay Rate|Rate of Pay|Wage|Overtime Rate|Bonus|Annual Bonus|Signing Bonus|Commission|Commission Rate|Total Compensation|Total Comp|Pay Grade|Pay Band|Pay Level|Job Level|Salary Band|Compensation|Compensation Amount)\b\s*(?:[:#=.–—-]\s*)?[0-9,$%_.k\s\-]{4,25}', "[EARNINGS]", re.IGNORECASE ),
 
             # Course Case Docket ID
-            ( r'\b(?:Case Number|Case No|Case #|Court Case Number|Court Case No|Docket Number|Docket No|Docket #|Citation Number|Citation No|Citation #|Ticket Number|Ticket No|Ticket #|Warrant Number|Warrant No|Warrant #|Summons Number|Summons No|Summons #)\b\s*[:#=.–—-]?\s*[A-Za-z0-9./\-]{5,25}', "[COURSE CASE DOCKET]", re.IGNORECASE ),
+            ( r'\b(?:Case Number|Case No|Case #|Court Case Number|Court Case No|Docket Number|Docket No|Docket #|Citation Number|Citation No|Citation #|Ticket Number|Ticket No|Ticket #|Warrant Number|Warrant No|Warrant #|Summons Number|Summons No|Summons #)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9./\-]{5,25}', "[COURSE CASE DOCKET]", re.IGNORECASE ),
 
             # Law Incident Correction
-            ( r'\b(?:Incident Number|Incident No|Incident #|Incident ID|Report Number|Report No|Report #|Police Report Number|Police Case Number|Arrest Number|Arrest No|Arrest ID|Booking Number|Booking No|Booking ID|Inmate Number|Inmate ID|Jail ID|Prisoner Number|Offender ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9./\-]{5,25}', "[LAW INCIDENT CORRECTION]", re.IGNORECASE ),
+            ( r'\b(?:Incident Number|Incident No|Incident #|Incident ID|Report Number|Report No|Report #|Police Report Number|Police Case Number|Arrest Number|Arrest No|Arrest ID|Booking Number|Booking No|Booking ID|Inmate Number|Inmate ID|Jail ID|Prisoner Number|Offender ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9./\-]{5,25}', "[LAW INCIDENT CORRECTION]", re.IGNORECASE ),
 
             # Government Benefit Claim ID
-            ( r'\b(?:Medicare Number|Medicare ID|Medicaid Number|Medicaid ID|Social Security Claim Number|SS Claim Number|Benefit Claim Number|Benefit ID|Claim Number|Claim No|Claim #|Unemployment Claim ID|Unemployment Claim Number|SNAP Case Number|Food Stamps Case Number|VA File Number|VA Claim Number|Veterans Claim ID|Pension Claim Number|Disability Claim Number)\b\s*[:#=.–—-]?\s*[A-Za-z0-9./\-]{5,20}', "[GOV. BENEFIT CLAIM]", re.IGNORECASE ),
+            ( r'\b(?:Medicare Number|Medicare ID|Medicaid Number|Medicaid ID|Social Security Claim Number|SS Claim Number|Benefit Claim Number|Benefit ID|Claim Number|Claim No|Claim #|Unemployment Claim ID|Unemployment Claim Number|SNAP Case Number|Food Stamps Case Number|VA File Number|VA Claim Number|Veterans Claim ID|Pension Claim Number|Disability Claim Number)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9./\-]{5,20}', "[GOV. BENEFIT CLAIM]", re.IGNORECASE ),
 
             # Immigration Citizenship ID
-            ( r'\b(?:Alien Registration Number|Alien Number|A-Number|A Number|USCIS Case Number|USCIS Receipt Number|Receipt Number|Immigration Case Number|Visa Number|Visa No|Green Card Number|Green Card No|Naturalization Certificate Number|Naturalization Number|Citizenship Certificate Number|Passport Application Number)\b\s*[:#=.–—-]?\s*[A-Za-z0-9]{8,16}', "[IMMIGRATION CITIZENSHIP]", re.IGNORECASE ),
+            ( r'\b(?:Alien Registration Number|Alien Number|A-Number|A Number|USCIS Case Number|USCIS Receipt Number|Receipt Number|Immigration Case Number|Visa Number|Visa No|Green Card Number|Green Card No|Naturalization Certificate Number|Naturalization Number|Citizenship Certificate Number|Passport Application Number)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9]{8,16}', "[IMMIGRATION CITIZENSHIP]", re.IGNORECASE ),
 
             # Bitcoin Address
             ( r'\b(?:[13][a-km-zA-HJ-NP-Z1-9]{25,34}|bc1[0-9ac-hj-np-z]{11,71})\b', "[BITCOIN ADDRESS]" ),
 
             # Ethereum Address
-            ( r'\b(?:Ethereum Address|ETH Address|ERC20 Address|ERC-20 Address|Token Address|Contract Address|Wallet Address|Crypto Address)\b\s*[:#=.–—-]?\s*0[xX][0-9a-fA-F]{40}', "[ETH ADDRESS]", re.IGNORECASE ),
+            ( r'\b(?:Ethereum Address|ETH Address|ERC20 Address|ERC-20 Address|Token Address|Contract Address|Wallet Address|Crypto Address)\b\s*(?:[:#=.–—-]\s*)?0[xX][0-9a-fA-F]{40}', "[ETH ADDRESS]", re.IGNORECASE ),
 
             # Solana Address
             ( r'\b0[xX][0-9a-fA-F]{40}\b', "[ETH ADDRESS]" ),
 
             # Ripple Address
-            ( r'\b(?:XRP Address|Ripple Address|XRP Wallet|Ripple Wallet|XRP Account|Ripple Account|XRP Deposit Address)\b\s*[:#=.–—-]?\s*r[1-9A-HJ-NP-Za-km-z]{24,34}', "[XRP ADDRESS]", re.IGNORECASE ),
+            ( r'\b(?:XRP Address|Ripple Address|XRP Wallet|Ripple Wallet|XRP Account|Ripple Account|XRP Deposit Address)\b\s*(?:[:#=.–—-]\s*)?r[1-9A-HJ-NP-Za-km-z]{24,34}', "[XRP ADDRESS]", re.IGNORECASE ),
 
             # Litecoin Address
-            ( r'\b(?:Litecoin Address|LTC Address|Litecoin Wallet|LTC Wallet|LTC Deposit Address)\b\s*[:#=.–—-]?\s*[LM3][a-km-zA-HJ-NP-Z1-9]{25,34}', "[LTC ADDRESS]", re.IGNORECASE ),
+            ( r'\b(?:Litecoin Address|LTC Address|Litecoin Wallet|LTC Wallet|LTC Deposit Address)\b\s*(?:[:#=.–—-]\s*)?[LM3][a-km-zA-HJ-NP-Z1-9]{25,34}', "[LTC ADDRESS]", re.IGNORECASE ),
 
             # Generic Crypto Address
-            ( r'\b(?:Crypto Address|Cryptocurrency Address|Wallet Address|Deposit Address|Blockchain Address)\b\s*[:#=.–—-]?\s*[A-Za-z0-9]{20,70}', "[CRYPTO ADDRESS]", re.IGNORECASE ),
+            ( r'\b(?:Crypto Address|Cryptocurrency Address|Wallet Address|Deposit Address|Blockchain Address)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9]{20,70}', "[CRYPTO ADDRESS]", re.IGNORECASE ),
 
             # Session Tracking Tokens
-            ( r'\b(?:Session ID|SessionID|Session Identifier|Session Token|Session Key|Auth Session ID|Login Session ID|Tracking ID|TrackingID|Tracking Token|Tracking Code|Request ID|RequestID|Correlation ID|CorrelationID|Client Trace ID|Trace ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{8,128}', "[SESSION TOKEN]", re.IGNORECASE ),
+            ( r'\b(?:Session ID|SessionID|Session Identifier|Session Token|Session Key|Auth Session ID|Login Session ID|Tracking ID|TrackingID|Tracking Token|Tracking Code|Request ID|RequestID|Correlation ID|CorrelationID|Client Trace ID|Trace ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{8,128}', "[SESSION TOKEN]", re.IGNORECASE ),
 
             # Analytics Marketing ID
-            ( r'\b(?:Analytics ID|AnalyticsID|Google Analytics ID|GA ID|GAID|Gclid|Client ID|ClientID|Adobe Visitor ID|Visitor ID|Marketing ID|Tracking Cookie|Tracking Cookie ID|Campaign ID|CampaignID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{6,64}', "[ANALYTICS ID]", re.IGNORECASE ),
+            ( r'\b(?:Analytics ID|AnalyticsID|Google Analytics ID|GA ID|GAID|Gclid|Client ID|ClientID|Adobe Visitor ID|Visitor ID|Marketing ID|Tracking Cookie|Tracking Cookie ID|Campaign ID|CampaignID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{6,64}', "[ANALYTICS ID]", re.IGNORECASE ),
 
             # Device Browser Fingerprint ID
-            ( r'\b(?:Device Fingerprint|Fingerprint ID|FingerprintID|Browser ID|BrowserID|Device ID Hash|Device Hash|Machine Fingerprint|Client Fingerprint|Device Signature|Browser Signature)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{16,128}', "[BROWSER FINGERPRINT]", re.IGNORECASE ),
+            ( r'\b(?:Device Fingerprint|Fingerprint ID|FingerprintID|Browser ID|BrowserID|Device ID Hash|Device Hash|Machine Fingerprint|Client Fingerprint|Device Signature|Browser Signature)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{16,128}', "[BROWSER FINGERPRINT]", re.IGNORECASE ),
 
             # UUID/GUID
             ( r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b', "[UUID/GUID]" ),
 
             # Hash Values
-            ( r'\b(?:Hash|Hash Value|Checksum|Digest|MD5|SHA1|SHA-1|SHA256|SHA-256|SHA512|SHA-512|Integrity Hash|File Hash|Verification Hash)\b\s*[:#=.–—-]?\s*(?:[0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64}|[0-9a-fA-F]{128})', "[HASHSUM]", re.IGNORECASE ),
+            ( r'\b(?:Hash|Hash Value|Checksum|Digest|MD5|SHA1|SHA-1|SHA256|SHA-256|SHA512|SHA-512|Integrity Hash|File Hash|Verification Hash)\b\s*(?:[:#=.–—-]\s*)?(?:[0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64}|[0-9a-fA-F]{128})', "[HASHSUM]", re.IGNORECASE ),
 
             # User Agent ID
             (
@@ -256,31 +328,31 @@ class RegexRedactor:
             ( r'\b(?:AKIA|ASIA|AGPA|AIDA|ANPA)[0-9A-Z]{16}\b', "[CLOUD KEY]" ),
 
             # Cloud Key
-            ( r'\b(?:AWS Access Key|AWS Secret Key|AWS Key|AWS Credentials|AWS Secret Access Key|AWS AccessKey|AWS SecretAccessKey|Azure Client Secret|Azure Secret|Azure Key|GCP Service Key|GCP API Key|Google Cloud Key|Cloud API Key)\b\s*[:#=.–—-]?\s*(?:AKIA[0-9A-Z]{16}|[A-Za-z0-9_\-+/=]{20,200})', "[CLOUD KEY]", re.IGNORECASE ),
+            ( r'\b(?:AWS Access Key|AWS Secret Key|AWS Key|AWS Credentials|AWS Secret Access Key|AWS AccessKey|AWS SecretAccessKey|Azure Client Secret|Azure Secret|Azure Key|GCP Service Key|GCP API Key|Google Cloud Key|Cloud API Key)\b\s*(?:[:#=.–—-]\s*)?(?:AKIA[0-9A-Z]{16}|[A-Za-z0-9_\-+/=]{20,200})', "[CLOUD KEY]", re.IGNORECASE ),
 
             # API Key
-            ( r'\b(?:API Key|APIKey|Access Key|AccessKey|Secret Key|SecretKey|Private Key|PrivateKey|Public Key|PublicKey|Client Secret|ClientSecret|Client Key|ClientKey|Consumer Key|ConsumerKey|Consumer Secret|ConsumerSecret|App Secret|AppSecret|App Key|AppKey)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_\-=/+]{16,200}', "[API KEY]", re.IGNORECASE ),
+            ( r'\b(?:API Key|APIKey|Access Key|AccessKey|Secret Key|SecretKey|Private Key|PrivateKey|Public Key|PublicKey|Client Secret|ClientSecret|Client Key|ClientKey|Consumer Key|ConsumerKey|Consumer Secret|ConsumerSecret|App Secret|AppSecret|App Key|AppKey)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_\-=/+]{16,200}', "[API KEY]", re.IGNORECASE ),
 
             # Crypto Key
             ( r'(-----BEGIN (?:PGP PUBLIC KEY BLOCK|PGP PRIVATE KEY BLOCK|RSA PRIVATE KEY|RSA PUBLIC KEY|OPENSSH PRIVATE KEY|EC PRIVATE KEY)-----[\s\S]+?-----END (?:PGP PUBLIC KEY BLOCK|PGP PRIVATE KEY BLOCK|RSA PRIVATE KEY|RSA PUBLIC KEY|OPENSSH PRIVATE KEY|EC PRIVATE KEY)-----)', "[CRYPTO KEY]", re.IGNORECASE ),
 
             # Environment Variable
-            ( r'\b(?:ENV|Environment Variable|Environment Key|Secret|Secret Key|App Secret|APP_SECRET|SECRET_KEY|API_SECRET|DB_PASSWORD|DATABASE_PASSWORD|JWT_SECRET|TOKEN_SECRET)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_\-+/=]{6,200}', "[ENV VARIABLE]", re.IGNORECASE ),
+            ( r'\b(?:ENV|Environment Variable|Environment Key|Secret|Secret Key|App Secret|APP_SECRET|SECRET_KEY|API_SECRET|DB_PASSWORD|DATABASE_PASSWORD|JWT_SECRET|TOKEN_SECRET)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_\-+/=]{6,200}', "[ENV VARIABLE]", re.IGNORECASE ),
 
             # Software Build ID
-            ( r'\b(?:Build ID|Build Number|Release ID|Release Number|Version ID|Version Number|Commit Hash|Git Commit|Build Tag|Release Tag|Artifact ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{3,40}', "[SOFTWARE BUILD ID]", re.IGNORECASE ),
+            ( r'\b(?:Build ID|Build Number|Release ID|Release Number|Version ID|Version Number|Commit Hash|Git Commit|Build Tag|Release Tag|Artifact ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{3,40}', "[SOFTWARE BUILD ID]", re.IGNORECASE ),
 
             # Debug Error Tokens
-            ( r'\b(?:Error ID|ErrorID|Error Code|Exception ID|ExceptionID|Bug ID|BugID|Crash ID|Crash Report ID|Debug Token|Debug ID|TraceToken|Trace Token|Failure ID)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{3,40}', "[ERROR TOKEN]", re.IGNORECASE ),
+            ( r'\b(?:Error ID|ErrorID|Error Code|Exception ID|ExceptionID|Bug ID|BugID|Crash ID|Crash Report ID|Debug Token|Debug ID|TraceToken|Trace Token|Failure ID)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{3,40}', "[ERROR TOKEN]", re.IGNORECASE ),
 
             # File Paths
-            ( r'\b(?:File Path|Path|Directory|Folder Path|System Path|User Path|Home Directory|Working Directory)\b\s*[:#=.–—-]?\s*(?:[A-Za-z]:\\[^\s]+|\/[A-Za-z0-9._\-\/]+)', "[FILE PATH]", re.IGNORECASE ),
+            ( r'\b(?:File Path|Path|Directory|Folder Path|System Path|User Path|Home Directory|Working Directory)\b\s*(?:[:#=.–—-]\s*)?(?:[A-Za-z]:\\[^\s]+|\/[A-Za-z0-9._\-\/]+)', "[FILE PATH]", re.IGNORECASE ),
 
             # Medical Metadata
-            ( r'\b(?:Diagnosis Code|Dx Code|ICD Code|ICD10|ICD-10|Procedure Code|CPT Code|Treatment Code|Lab Code|Test Code|Provider Code)\b\s*[:#=.–—-]?\s*(?:[A-Z][0-9A-Z]{2}(?:\.[0-9A-Z]{1,4})?|[0-9]{5})', "[MEDICAL METADATA]", re.IGNORECASE ),
+            ( r'\b(?:Diagnosis Code|Dx Code|ICD Code|ICD10|ICD-10|Procedure Code|CPT Code|Treatment Code|Lab Code|Test Code|Provider Code)\b\s*(?:[:#=.–—-]\s*)?(?:[A-Z][0-9A-Z]{2}(?:\.[0-9A-Z]{1,4})?|[0-9]{5})', "[MEDICAL METADATA]", re.IGNORECASE ),
 
             # Financial Metadata
-            ( r'\b(?:Routing Code|SWIFT Code|BIC Code|Bank Code|Branch Code|Sort Code|Tax Code|EFT Code|ACH Code)\b\s*[:#=.–—-]?\s*(?:[A-Z0-9]{8,11}|[0-9]{2}-?[0-9]{2}-?[0-9]{2})', "[FINANCIAL METADATA]", re.IGNORECASE ),
+            ( r'\b(?:Routing Code|SWIFT Code|BIC Code|Bank Code|Branch Code|Sort Code|Tax Code|EFT Code|ACH Code)\b\s*(?:[:#=.–—-]\s*)?(?:[A-Z0-9]{8,11}|[0-9]{2}-?[0-9]{2}-?[0-9]{2})', "[FINANCIAL METADATA]", re.IGNORECASE ),
 
             # Shipping Fulfillment ID (label + value, with natural language in between)
             (
@@ -294,27 +366,27 @@ class RegexRedactor:
             ( r'\b(?:WH|BIN|PLT|RACK)[-_][A-Z0-9]{3,6}\b', "[SHIPPING ID]", re.IGNORECASE ),
 
             # Employer Internal Codes
-            ( r'\b(?:Cost Center|Cost Center Code|Dept Code|Department Code|Org Code|Business Unit Code|Location Code|Office Code|Work Unit Code)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{3,20}', "[INTERNAL EMPLOYMENT CODE]", re.IGNORECASE ),
+            ( r'\b(?:Cost Center|Cost Center Code|Dept Code|Department Code|Org Code|Business Unit Code|Location Code|Office Code|Work Unit Code)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{3,20}', "[INTERNAL EMPLOYMENT CODE]", re.IGNORECASE ),
 
             # Sensitive GEO Code
-            ( r'\b(?:GPS Code|Geo Code|Geolocation Code|Map Grid|Census Tract|Block Code|Area Code|Region Code|District Code)\b\s*[:#=.–—-]?\s*[A-Za-z0-9._\-]{3,20}', "[GEO CODE]", re.IGNORECASE ),
+            ( r'\b(?:GPS Code|Geo Code|Geolocation Code|Map Grid|Census Tract|Block Code|Area Code|Region Code|District Code)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9._\-]{3,20}', "[GEO CODE]", re.IGNORECASE ),
 
             # Sensitive Account Metadata
-            ( r'\b(?:Account Tier|Membership Level|Loyalty Level|Reward ID|Reward Number|Subscriber Level|Service Tier)\b\s*[:#=.–—-]?\s*[A-Za-z0-9\s._\-]{3,40}', "[ACCOUNT METADATA]", re.IGNORECASE ),
+            ( r'\b(?:Account Tier|Membership Level|Loyalty Level|Reward ID|Reward Number|Subscriber Level|Service Tier)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9\s._\-]{3,40}', "[ACCOUNT METADATA]", re.IGNORECASE ),
             
             # Medical Record Number
-            ( r'(?i)medical\s*(?:record)?\s*(?:number|num|#)?[:\s]{0,10}(\d{6,12})\b', "[MEDICAL RECORD #]", re.IGNORECASE ),
+            ( r'(?i)medical\s*(?:record\s*)?(?:number|num|#)?[:\s]{0,10}(\d{6,12})\b', "[MEDICAL RECORD #]", re.IGNORECASE ),
 
 
             # Passport
-            ( r'\b(?:Loan Number|Loan #|Loan ID|Mortgage Number|Mortgage ID|Loan Account|Mortgage Account|Claim Number|Claim #|Claim ID|Case ID|Contract Number|Contract #|Agreement Number|Agreement #|Policy Reference|Policy Ref|Billing Account Number|Billing ID|Reference Number|Ref #|Customer Number)\b\s*[:#=.–—-]?\s*[0-9A-Za-z_/.\\-]{6,25}', "[PASSPORT #]", re.IGNORECASE ),
+            ( r'\b(?:Loan Number|Loan #|Loan ID|Mortgage Number|Mortgage ID|Loan Account|Mortgage Account|Claim Number|Claim #|Claim ID|Case ID|Contract Number|Contract #|Agreement Number|Agreement #|Policy Reference|Policy Ref|Billing Account Number|Billing ID|Reference Number|Ref #|Customer Number)\b\s*(?:[:#=.–—-]\s*)?[0-9A-Za-z_/.\\-]{6,25}', "[PASSPORT #]", re.IGNORECASE ),
             ( r'passport.*?[A-Z]{1}[0-9]{8}', "[PASSPORT #]", re.IGNORECASE ),
 
             # UPS-style tracking IDs
             ( r'\b1Z[0-9A-Z]{16}\b', "[TRACKING #]", re.IGNORECASE ),
 
             # Vehicle Identifier Number
-            ( r'\b(?:Reg Number|Tag #|Registration #|License Plate|License Plate Number|Plate #|Vehicle ID|Vehicle Number|Fleet ID|Tag Number|Registration Number)\b\s*[:#=.–—-]?\s*[A-Za-z0-9_.-]{5,40}', "[VIN]", re.IGNORECASE ),
+            ( r'\b(?:Reg Number|Tag #|Registration #|License Plate|License Plate Number|Plate #|Vehicle ID|Vehicle Number|Fleet ID|Tag Number|Registration Number)\b\s*(?:[:#=.–—-]\s*)?[A-Za-z0-9_.-]{5,40}', "[VIN]", re.IGNORECASE ),
             ( r'[A-HJ-NPR-Z0-9]{17}', "[VIN]" ),
 
             # Age
@@ -386,61 +458,39 @@ class RegexRedactor:
             ( r'(?<!ERR-)\b[A-Z]{3}-?\d{4}\b', "[LICENSE PLATE #]" ),
             
             # Generic Student ID
-            ( r'[A-Z]{1}[0-9]{6,8}', "[STUDENT #]" ),
-
-            # United States Driver License Numbers
-            (
-                [
-                    r"\d{7}",                       # AL, AK, DE, ME, OR, DC, WV
-                    r"[a-zA-Z]\d{8}",               # AZ, GA, NE, VA
-                    r"\d{9}",                       # AZ, CT, HI, IA, LA, MT, NM, SC, UT
-                    r"9\d{8}",                      # AR
-                    r"[a-zA-Z]\d{7}",               # CA
-                    r"\d{2}-\d{3}-\d{4}",           # CO
-                    r"[a-zA-Z](\d{3}-*){2}\d{2}-*\d{3}-*\d", # FL
-                    r"[a-zA-Z]{2}\d{6}[a-zA-Z]",    # ID
-                    r"[a-zA-Z]\d{3}-*(\d{4}-*){2}", # IL
-                    r"\d{4}-\d{2}-\d{4}",           # IN
-                    r"\d{3}[a-zA-Z]{2}\d{4}",       # IA
-                    r"[a-zA-Z](\d{2}-){2}\d{4}",    # KA
-                    r"[a-zA-Z]\d{2}-\d{3}-\d{4}",   # KY
-                    r"[a-zA-Z]-*(\d{3}-*){4}",      # MD
-                    r"[a-zA-Z]\d{9}",               # MA, MO, OK
-                    r"[a-zA-Z](\s\d{3}){4}",        # MI
-                    r"[a-zA-Z]\d{12}",              # MI, MN
-                    r"\d{3}-\d{2}-\d{4}",           # MS
-                    r"([0][1-9]|[1][0-2])\d{3}([1-9]\d{3})", # MT
-                    r"\d{10}",                      # NV
-                    r"([0][1-9]|[1][0-2])([a-zA-Z]\{3})(0[1-9]|[1-2][0-9]|3[0-1])\d", # NH
-                    r"[a-zA-Z]\d{4}-*(\d{5}-*){2}", # NJ
-                    r"(\d{3}){2}\s\d{3}",           # NY
-                    r"\d{12}",                      # NC
-                    r"[a-zA-Z]{3}-\d{2}-\d{4}",     # ND
-                    r"\d{8}",                       # OH, SD, TX, VT
-                    r"[a-zA-Z]{1}\d{4,8}",          # OH
-                    r"[a-zA-Z]{2}\d{3,7}",          # OH
-                    r"\d{2}( \d{3}){2}",            # PA
-                    r"[1-9]{2}\d{5}",               # RI
-                    r"\d{7,9}",                     # TN
-                    r"\d{7}[a-zA-Z]",               # VT
-                    r"[a-zA-Z](\d{2}-){2}\d{4}",    # VA
-                    r"[a-zA-Z]{3}\*\*[a-zA-Z]{2}\d{3}[a-zA-Z]\d", # WA
-                    r"[a-zA-Z]\d{6}",               # WV
-                    r"[a-zA-Z]\d{3}-(\d{4}-){2}\d{2}", # WI
-                    r"\d{6}-\d{3}",                 # WY
-                ],
-                "[DRIVER LICENSE #]" )
+            ( r'[A-Z]{1}[0-9]{6,8}', "[STUDENT #]" )
         ]
 
+        # Label a pattern given as a list of formats has to follow, by replacement. Most of
+        # the formats are bare runs of digits, so they only count right after their label
+        self.__list_labels = {
+            "[DRIVER LICENSE #]": r"\b(?:(?:Driver'?s?|Driving)\s+Licen[cs]e|DLN|DL|D\.L\.)(?:\s*(?:(?:Number|No|Num|ID)\b\.?|#))?",
+        }
 
-    def get_honorifics_pattern(self) -> str:
-        return self.__honorifics_pattern
+        self.__compiled_patterns = self.__compile_patterns()
+        self.__keyword_index = KeywordIndex([ pattern.pattern for pattern, _ in self.__compiled_patterns ])
 
-    def get_regex_patterns(self) -> list[str | list]:
-        return self.__patterns
+        # Patterns the keywords of each label turn on
+        self.__label_patterns = { replace: self.__keyword_index.active(replace) for _, replace in self.__compiled_patterns }
 
-    def redact_text(self, text: str) -> str:
-        content = text
+        # Name each pattern's timings are reported under, its replacement
+        # numbered when several patterns share one
+        self.__pattern_names = []
+        counts = {}
+        for _, replace in self.__compiled_patterns:
+            counts[replace] = counts.get(replace, 0) + 1
+            self.__pattern_names.append( f"{replace} {counts[replace]}" if counts[replace] > 1 else replace )
+
+
+    def __compile_patterns(self) -> list[tuple[re.Pattern, str]]:
+        """
+        Compiles every pattern in `self.__patterns` once so redaction
+        calls don't have to rebuild flags or hit the regex cache.
+
+        Returns:
+            compiled:   (compiled pattern, replacement) pairs in priority order
+        """
+        compiled = []
 
         for pattern, replace, *extra_flags in self.__patterns:
             flags = re.M
@@ -448,33 +498,239 @@ class RegexRedactor:
             for f in extra_flags:
                 flags |= f
 
-            if not isinstance(pattern, list):
-                content = re.sub(pattern, replace, content, flags=flags)
-                continue
+            # Every format in one alternation factored by common prefixes, behind the
+            # label. The longest format wins rather than the first listed, and the
+            # formats' groups are non-capturing so the PDF path only covers `value`
+            if isinstance(pattern, list):
+                pattern = rf"{self.__list_labels[replace]}\s*(?:[:#=.–—-]\s*)?(?P<value>{trie_alternation(pattern)})(?![A-Za-z0-9])"
+                flags |= re.POSIX
 
-        return content
+            compiled.append( (re.compile(pattern, flags), replace) )
 
+        return compiled
 
-    def apply_pdf_redaction(self, page: Page, words_text: str):
-        for pattern, replace, *extra_flags in self.__patterns:
-            flags = re.M
 
-            for f in extra_flags:
-                flags |= f
+    def get_honorifics_pattern(self) -> str:
+        return self.__honorifics_pattern
 
-            # TODO: do pattern for driver's license which is the only "pattern"
-            #       with a list of patterns
-            if isinstance(pattern, list):
-                continue
+    def get_regex_patterns(self) -> list[str | list]:
+        return self.__patterns
+
+    def get_fingerprint(self) -> str:
+        """
+        Hash of everything that decides what gets redacted (patterns,
+        replacements, flags and honorifics), so anything derived from
+        this configuration can tell when it changed.
+        """
+        return hashlib.sha256(repr( (self.__honorifics_pattern, self.__patterns, self.__list_labels) ).encode()).hexdigest()
+
+    def get_active_patterns(self, text: str) -> list[tuple[re.Pattern, str]]:
+        """
+        Returns the compiled patterns worth running on `text`, in priority
+        order. Patterns anchored on label keywords are skipped when none of
+        their keywords appear in the text.
+        """
+        return [ self.__compiled_patterns[i] for i in self.__keyword_index.active(text) ]
+
+    def find_spans(self, text: str) -> list[Span]:
+        """
+        Finds every span to redact in `text`, the same text sequential
+        substitutions redacted. Each active pattern runs once, in priority
+        order, on the text as the patterns before it left it (their matches
+        replaced by labels), so a match partly covered by an earlier one or
+        next to an earlier label is found like it was. Instead of rewriting
+        the text, the original characters each match covers become spans.
+
+        Parameters:
+            text:       The text to search
+
+        Returns:
+            spans:      Non-overlapping spans sorted by start offset
+        """
+        spans = []
+        deadline = self.__deadline()
+
+        # The substituted text in pieces, each with its offset in `text` (None for labels)
+        pieces = [ (text, 0) ]
+        current = text
+        active = set(self.__keyword_index.active(text))
+
+        with metrics.timed("regex"):
+            for i in range(len(self.__compiled_patterns)):
+                if i not in active:
+                    continue
 
-            for matched in re.finditer(pattern, words_text, flags=flags):
-                matched_text = matched.group(matched.lastindex) if matched.lastindex else matched.group()
-                matched_text = matched_text.strip()
+                _, replace = self.__compiled_patterns[i]
+                matches = [ matched for matched in self.__find_matches(i, current, deadline) if matched.end() > matched.start() ]
 
-                rects = page.search_for(matched_text)
-                
-                if not rects:
+                if not matches:
                     continue
 
-                for r in rects:
-                    page.draw_rect(r, fill=(0,0,0), overlay=True)
+                pieces = self.__substitute(pieces, matches, replace, spans)
+                current = "".join( piece for piece, _ in pieces )
+
+                # A label can hold the keywords of a later pattern
+                active.update(self.__label_patterns[replace])
+
+        return sorted(spans)
+
+    def redact_text(self, text: str) -> str:
+        return apply_spans(text, self.find_spans(text))
+
+
+    def find_pdf_spans(self, words_text: str) -> list[Span]:
+        """
+        Finds the spans to black out on a PDF page. Unlike `find_spans()`
+        every match is kept since overlapping rectangles are merged anyway,
+        and a pattern's last capture group (the PII without its label) is
+        used in place of the whole match when it has one.
+
+        Parameters:
+            words_text: The page's words joined by spaces
+
+        Returns:
+            spans:      Spans of `words_text`, in pattern order and possibly overlapping
+        """
+        spans = []
+        deadline = self.__deadline()
+
+        with metrics.timed("regex"):
+            for i in self.__keyword_index.active(words_text):
+                _, replace = self.__compiled_patterns[i]
+
+                for matched in self.__find_matches(i, words_text, deadline):
+                    spans.append( Span(*self.__pdf_span(matched), replace) )
+
+        return spans
+
+    def find_first(self, text: str, *, pdf: bool = False) -> Span | None:
+        """
+        Finds any one span to redact in `text`, stopping at the first
+        pattern (in priority order) that matches at all.
+
+        Parameters:
+            text:       The text to search
+            pdf:        Whether `text` is a PDF page's words text, the span
+                        is then the one `find_pdf_spans()` would give
+
+        Returns:
+            span:       The first match of the first matching pattern, or None
+                        when nothing in `text` needs redacting
+        """
+        deadline = self.__deadline()
+
+        with metrics.timed("regex"):
+            for i in self.__keyword_index.active(text):
+                _, replace = self.__compiled_patterns[i]
+
+                for matched in self.__find_matches(i, text, deadline, first=True):
+                    return Span(*(self.__pdf_span(matched) if pdf else matched.span()), replace)
+
+        return None
+
+    def get_pdf_rects(self, word_index: WordIndex) -> list[Rect]:
+        return [ r for start, end, _ in self.find_pdf_spans(word_index.get_text()) for r in word_index.rects_for(start, end) ]
+
+    def get_compiled_patterns(self) -> list[tuple[re.Pattern, str]]:
+        return self.__compiled_patterns
+
+    def get_pattern_names(self) -> list[str]:
+        return self.__pattern_names
+
+    def __deadline(self) -> float | None:
+        return time.perf_counter() + self.__document_timeout if self.__document_timeout else None
+
+    def __find_matches(self, index: int, text: str, deadline: float | None, *, first: bool = False) -> list[re.Match]:
+        """
+        Runs one pattern over `text` within the time budgets.
+
+        Parameters:
+            index:      Index of the pattern in `self.__compiled_patterns`
+            text:       The text to search
+            deadline:   `time.perf_counter()` value the document's budget runs out at
+            first:      Whether to stop at the first match
+
+        Returns:
+            matches:    The pattern's matches, an exception is raised instead when
+                        it runs out of time
+        """
+        pattern, _ = self.__compiled_patterns[index]
+        start = time.perf_counter()
+        timeout = self.__pattern_timeout
+
+        if deadline is not None:
+            if start >= deadline:
+                raise Exception(f"Regex redaction ran out of its {self.__document_timeout}s budget for the document")
+
+            timeout = min(timeout or deadline - start, deadline - start)
+
+        matches = []
+
+        try:
+            for matched in pattern.finditer(text, timeout=timeout):
+                matches.append(matched)
+
+                if first:
+                    break
+        except TimeoutError:
+            metrics.record_timeout(self.__pattern_names[index])
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                raise Exception(f"Regex redaction ran out of its {self.__document_timeout}s budget for the document, `{self.__pattern_names[index]}` was running")
+
+            raise Exception(f"Regex pattern `{self.__pattern_names[index]}` ran out of its {self.__pattern_timeout}s budget, the document can't be redacted safely")
+
+        self.__record_pattern(index, start, len(matches))
+
+        return matches
+
+    def __substitute(self, pieces: list[tuple[str, int | None]], matches: list[re.Match], replace: str, spans: list[Span]) -> list[tuple[str, int | None]]:
+        """
+        Replaces one pattern's matches in the substituted text by its label.
+
+        Parameters:
+            pieces:     The substituted text in pieces, each with its offset
+                        in the original text (None for labels)
+            matches:    The pattern's non-empty matches in the joined pieces
+            replace:    The pattern's label
+            spans:      Spans the original text each match covers are added to
+
+        Returns:
+            pieces:     The pieces of the text with the matches replaced
+        """
+        starts = list(accumulate( (len(piece) for piece, _ in pieces[:-1]), initial=0 ))
+        result = []
+
+        def take(start: int, end: int, matched: bool):
+            j = bisect.bisect_right(starts, start) - 1
+
+            while start < end:
+                piece, origin = pieces[j]
+                stop = min(end, starts[j] + len(piece))
+
+                if not matched:
+                    result.append( (piece[start - starts[j]:stop - starts[j]], None if origin is None else origin + start - starts[j]) )
+                elif origin is not None:
+                    spans.append( Span(origin + start - starts[j], origin + stop - starts[j], replace) )
+
+                start = stop
+                j += 1
+
+        pos = 0
+
+        for matched in matches:
+            take(pos, matched.start(), False)
+            take(matched.start(), matched.end(), True)
+            result.append( (replace, None) )
+            pos = matched.end()
+
+        take(pos, starts[-1] + len(pieces[-1][0]), False)
+
+        return [ (piece, origin) for piece, origin in result if piece ]
+
+    def __pdf_span(self, matched: re.Match) -> tuple[int, int]:
+        return matched.span(matched.lastindex) if matched.lastindex else matched.span()
+
+    def __record_pattern(self, index: int, start: float, matches: int):
+        if metrics.is_enabled():
+            metrics.record_pattern(self.__pattern_names[index], time.perf_counter() - start, matches)
@@ -1,12 +1,115 @@
-import spacy
+from __future__ import annotations
+import functools
+import hashlib
+import importlib.util
+from typing import TYPE_CHECKING, Callable
 from dateutil.parser import parse
 import regex as re
-from pymupdf import Page, Rect
-from spacy.tokens import Doc
+from modules.spans import Span, SpanSet, apply_spans
+from modules.words import WordIndex
+from modules.windows import WINDOW_OVERLAP, WINDOW_SIZE, WindowedDoc, join_entities, split_windows, stitch
+from modules import metrics
+
+# SpaCy (and PyMuPDF) are only imported once a model is loaded (or a PDF handled)
+if TYPE_CHECKING:
+    from pymupdf import Rect
+    from spacy.tokens import Doc
+
+# Entity texts hinting at a relative date ("last week", "3 days ago"), not a PII one
+RELATIVE_KEYWORDS = [
+    "ago", "from now", "next", "last", "past", "future",
+    "today", "yesterday", "tomorrow", "this", "coming", "previous",
+    "day", "days", "month", "months", "year", "years",
+    "week", "weeks", "spring", "fall", "autumn", "summer", "winter"
+]
+
+NUMBER_PREFIX = re.compile(r"\d{1,4}")
+WEEKDAY_DATE = re.compile(r"\b(?:(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day),?\s+(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t|tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s+\d{1,2}(?:,\s*\d{2,4})?\b", re.M)
+BIRTH_YEAR = re.compile(r"\[NAME\]\s*\((\d{4})\)", re.M | re.IGNORECASE)
+BOUNDARY = re.compile(r"\b")
+
+# Entries kept by the memo shared by every document (and thread) of the process
+DATE_MEMO_SIZE = 16384
+
+@functools.lru_cache(maxsize=DATE_MEMO_SIZE)
+def is_true_date(text: str) -> bool:
+    """
+    Whether a DATE entity's text is a PII date rather than a bare number or
+    a relative date. Memoized, the same dates come up in document after
+    document and parsing them is the slow part.
+    """
+    if NUMBER_PREFIX.match(text.strip()):
+        return False
+
+    if WEEKDAY_DATE.match(text):
+        return True
+
+    if any(keyword in text.lower() for keyword in RELATIVE_KEYWORDS):
+        return False
+
+    try:
+        parse(text, fuzzy=True)
+        return True
+    except:
+        return False
+
+
+def memo_stats() -> dict[str, dict[str, int]]:
+    """
+    Returns:
+        stats:      Hits, misses, size and capacity of every memo
+    """
+    return {
+        name: { "hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize }
+        for name, info in (("dates", is_true_date.cache_info()),)
+    }
+
 
 class SpacyRedactor:
-    def __init__(self):
-        self.__nlp = spacy.load("en_core_web_trf")
+    # NER model per engine tier, from most accurate to fastest
+    MODELS = {
+        "trf": "en_core_web_trf",
+        "lg": "en_core_web_lg",
+        "md": "en_core_web_md",
+        "sm": "en_core_web_sm",
+    }
+
+    # Only NER is needed for PERSON/DATE entities
+    EXCLUDED_COMPONENTS = [ "tagger", "morphologizer", "parser", "senter", "attribute_ruler", "lemmatizer" ]
+
+    def __init__(self, tier: str = "trf", *, batch_size: int = 8, n_process: int = 1, window_size: int = WINDOW_SIZE, window_overlap: int = WINDOW_OVERLAP):
+        """
+        Parameters:
+            tier:           Which NER model to load, one of the keys of `SpacyRedactor.MODELS`
+            batch_size:     Number of texts fed to the model per batch by `create_nlp_docs()`
+            n_process:      Number of processes `create_nlp_docs()` runs the model in
+            window_size:    Characters of a longer text the model sees at a time, the
+                            windows' entities are stitched back onto the whole text
+            window_overlap: Characters of context on each side of a window
+        """
+        if tier not in self.MODELS:
+            raise Exception(f"Unknown NER tier `{tier}`, expected one of: {', '.join(self.MODELS)}")
+
+        if not 0 <= window_overlap < window_size:
+            raise Exception("`window_overlap` must be smaller than `window_size`")
+
+        import spacy
+
+        self.__tier = tier
+        self.__nlp = spacy.load(self.MODELS[tier], exclude=self.EXCLUDED_COMPONENTS)
+
+        # The CNN pipelines share `tok2vec` between the excluded components while
+        # NER has its own, so it's dead weight unless something still listens to it
+        if "tok2vec" in self.__nlp.pipe_names and not self.__nlp.get_pipe("tok2vec").listening_components:
+            self.__nlp.remove_pipe("tok2vec")
+
+        if window_size + 2 * window_overlap > self.__nlp.max_length:
+            raise Exception(f"Windows of {window_size} characters plus their overlap don't fit the model's `max_length` of {self.__nlp.max_length}")
+
+        self.__batch_size = batch_size
+        self.__n_process = n_process
+        self.__window_size = window_size
+        self.__window_overlap = window_overlap
         self.__nlp_patterns = [
             ("PERSON", "[NAME]"),
             ("DATE", "[DATE]"),
@@ -15,8 +118,95 @@ class SpacyRedactor:
 
         self.__honorifics = [ "Mr", "Mrs", "Ms", "Miss", "Mx", "Dr" ]
 
-    def create_nlp_doc(self, text: str):
-        return self.__nlp(text)
+    def get_tier(self) -> str:
+        return self.__tier
+
+    @classmethod
+    def installed_tiers(cls) -> list[str]:
+        """
+        Returns:
+            tiers:      The tiers whose model package is installed, in `MODELS` order
+        """
+        # Looking the packages up doesn't import them, nor SpaCy, which takes about a second
+        return [ tier for tier, model in cls.MODELS.items() if importlib.util.find_spec(model) is not None ]
+
+    def get_fingerprint(self) -> str:
+        """
+        Hash of the loaded model (name, version and pipeline), of how long
+        texts are windowed and of the entity labels and honorifics used, so
+        anything derived from this configuration can tell when it changed.
+        """
+        meta = self.__nlp.meta
+        config = (
+            meta.get("lang"), meta.get("name"), meta.get("version"), self.__nlp.pipe_names,
+            self.__window_size, self.__window_overlap, self.__nlp_patterns, self.__honorifics,
+        )
+
+        return hashlib.sha256(repr(config).encode()).hexdigest()
+
+    def create_nlp_doc(self, text: str) -> Doc | WindowedDoc:
+        # Windowed texts go through `nlp.pipe` like a batch of their windows
+        if len(text) > self.__window_size:
+            return self.create_nlp_docs([ text ])[0]
+
+        with metrics.timed("ner"):
+            return self.__nlp(text)
+
+    def create_nlp_docs(self, texts: list[str], *, check: Callable[[], None] | None = None) -> list[Doc | WindowedDoc]:
+        """
+        Runs the model over many texts at once with `nlp.pipe`, which
+        batches them into far fewer forward passes than calling
+        `create_nlp_doc()` on each text. Texts longer than the window size
+        are split into windows (see `windows.split_windows()`), and every
+        text and window is fed to the model shortest first, so each batch
+        holds texts of about the same length and pads little. The windows'
+        entities are stitched back into one `WindowedDoc` per text, the
+        memory used stays that of one batch however long the text.
+
+        Parameters:
+            texts:      The texts to process
+            check:      Called before each batch, raising from it stops the pass
+
+        Returns:
+            nlp_docs:   One NLP doc per text, in the same order
+        """
+        if not texts:
+            return []
+
+        with metrics.timed("ner"):
+            return self.__create_nlp_docs(texts, check or (lambda: None))
+
+    def __create_nlp_docs(self, texts: list[str], check: Callable[[], None]) -> list[Doc | WindowedDoc]:
+        windows = [ split_windows(text, self.__window_size, self.__window_overlap) for text in texts ]
+        pieces = sorted(
+            ( (i, window) for i, text_windows in enumerate(windows) for window in text_windows ),
+            key=lambda piece: piece[1].end - piece[1].start
+        )
+
+        nlp_docs = [ None ] * len(texts)
+        entities = { i: [] for i, text_windows in enumerate(windows) if len(text_windows) > 1 }
+        piece_docs = self.__nlp.pipe(
+            ( texts[i][window.start:window.end] for i, window in pieces ),
+            batch_size=self.__batch_size, n_process=self.__n_process
+        )
+
+        check()
+
+        for n, ((i, window), nlp_doc) in enumerate(zip(pieces, piece_docs), 1):
+            # The model runs lazily a batch at a time, checking in between
+            # stops it before the next batch
+            if n % self.__batch_size == 0:
+                check()
+
+            if i in entities:
+                entities[i].extend(stitch(window, nlp_doc.ents))
+            else:
+                nlp_docs[i] = nlp_doc
+
+        for i, text_entities in entities.items():
+            nlp_docs[i] = join_entities(text_entities)
+
+        return nlp_docs
 
     def process_dates(self, nlp_doc) -> list[str]:
         """
@@ -30,144 +220,178 @@ class SpacyRedactor:
         Returns:
             true_dates: the list of PII dates to redact
         """
-        true_dates = []
-        RELATIVE_KEYWORDS = [
-            "ago", "from now", "next", "last", "past", "future",
-            "today", "yesterday", "tomorrow", "this", "coming", "previous",
-            "day", "days", "month", "months", "year", "years",
-            "week", "weeks", "spring", "fall", "autumn", "summer", "winter"
-        ]
+        return [ ent.text for ent in self.__true_date_ents(nlp_doc.ents) ]
 
-        for ent in nlp_doc.ents:
-            if not ent.label_ == "DATE":
-                continue
+    def __true_date_ents(self, ents) -> list:
+        """
+        Same as `process_dates()` but keeps the DATE entities themselves,
+        so their character offsets are still available.
+        """
+        with metrics.timed("dates"):
+            return self.__filter_date_ents(ents)
 
-            if re.match(r"\d{1,4}", ent.text.strip()):
-                continue
-            
-            if re.match(r"\b(?:(?:Mon|Tues|Wednes|Thurs|Fri|Satur|Sun)day),?\s+(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:t|tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\s+\d{1,2}(?:,\s*\d{2,4})?\b", ent.text, re.M):
-                true_dates.append(ent.text)
-                continue
+    def __filter_date_ents(self, ents) -> list:
+        return [ ent for ent in ents if ent.label_ == "DATE" and is_true_date(ent.text) ]
 
-            if any(keyword in ent.text.lower() for keyword in RELATIVE_KEYWORDS):
-                continue
 
-            try:
-                date = parse(ent.text, fuzzy=True)
-                true_dates.append(ent.text)
-            except:
-                pass
-        
-        return true_dates
+    def get_pdf_rects(self, word_index: WordIndex, honorifics_pattern: str, nlp_doc: Doc) -> list[Rect]:
+        """
+        Finds the rectangles of every entity and mention in a PDF page. The
+        spans are found in the page's words text the same way as for plain
+        text, then mapped to rectangles through the page's word index.
+
+        Parameters:
+            word_index:         The page's word index
+            honorifics_pattern: Regex of honorifics allowed in front of names
+            nlp_doc:            The NLP doc made from the page's words text
+
+        Returns:
+            rects:              The rectangles to draw over
+        """
+        spans = self.find_spans(honorifics_pattern, word_index.get_text(), nlp_doc)
 
+        return [ r for start, end, _ in spans for r in word_index.rects_for(start, end) ]
 
-    def search_for(self, page: Page, search_text: str) -> list[Rect]:
+    def find_spans(self, honorifics_pattern: str, text: str, nlp_doc: Doc) -> list[Span]:
         """
-        Custom `search_for` method mimicking PyMuPDF's own `search_for`
-        method to differentiate redaction of single-word name ("John" or "Doe")
-        vs multi-word name ("John Doe" or "Jane Doe")
+        Finds every span of `text` to redact from the NLP doc's entities in
+        a single scan. Besides the entities' own offsets, every other mention
+        of a PERSON (with or without an honorific) or a true DATE is found with
+        one combined alternation. Overlaps go to the entity found first, the
+        same order the previous per-entity substitutions ran in.
 
         Parameters:
-            page:           The PyMuPDF page class
-            search_text:    The name string to search for
+            honorifics_pattern: Regex of honorifics allowed in front of names
+            text:               The text `nlp_doc` was made from
+            nlp_doc:            The NLP doc containing labeled entities
 
         Returns:
-            rects:          A list of rectangles where the PII names are
-                            located in to be drawn over
+            spans:              Non-overlapping spans sorted by start offset
         """
-        search_text = search_text.strip()
+        with metrics.timed("spacy_spans"):
+            return self.__find_spans(honorifics_pattern, text, nlp_doc)
 
-        rects = []
-        words = page.get_text("words")
+    def find_first(self, nlp_doc: Doc) -> Span | None:
+        """
+        Finds the first entity of the NLP doc that would be redacted, without
+        looking for its other mentions.
 
-        split = search_text.split()
+        Parameters:
+            nlp_doc:    The NLP doc containing labeled entities
 
-        # Determine if name is multi-word
-        if len(split) > 1:
-            # Just directly search for it using PyMuPDF's `search_for` method
-            rects = page.search_for(search_text)
-            
-            # Additionally search for full name with honorifics
-            for h in self.__honorifics:
-                tmp_rects = page.search_for(f"{h}. {search_text}")
-                if not tmp_rects:
-                    continue
-                rects = rects + tmp_rects
-
-            return rects
-
-        # Mimics PyMuPDF's `search_for` functionality by searching through
-        # the words and adding the matchin word's rectangle position to `rects`
-        for w in words:
-            text = w[4]
-            if text == search_text:
-                x0, y0, x1, y1, *_ = w
-                rect = Rect(x0, y0, x1, y1)
-                rects.append(rect)
-
-        # Additionally search for single-word names with honorifics
-        for h in self.__honorifics:
-            tmp_rects = page.search_for(f"{h}. {search_text}")
-            if not tmp_rects:
+        Returns:
+            span:       The first PERSON or true DATE entity, or None
+        """
+        replaces = dict(self.__nlp_patterns)
+
+        for ent in nlp_doc.ents:
+            if ent.label_ not in replaces or not ent.text.strip():
                 continue
-            rects = rects + tmp_rects
 
-        return rects
+            if ent.label_ == "DATE" and not is_true_date(ent.text):
+                continue
+
+            return Span(ent.start_char, ent.end_char, replaces[ent.label_])
+
+        return None
 
+    def __find_spans(self, honorifics_pattern: str, text: str, nlp_doc: Doc) -> list[Span]:
+        # Case-folded entity text -> (priority, replacement, entity text), names kept apart
+        # since only they can be preceded by an honorific
+        mentions = { "name": {}, "other": {} }
+        candidates = []
 
-    def apply_pdf_redaction(self, page: Page, nlp_doc: Doc):
         for label, replace in self.__nlp_patterns:
-            entities = [ ent.text for ent in nlp_doc.ents if ent.label_ == label ] if not label=="DATE" else self.process_dates(nlp_doc)
-            
-            for e in entities:
-                rects = page.search_for(e) if not label == "PERSON" else self.search_for(page, e)
-                
-                if not rects:
+            ents = [ ent for ent in nlp_doc.ents if ent.label_ == label ] if not label=="DATE" else self.__true_date_ents(nlp_doc.ents)
+            group = mentions["name" if label == "PERSON" else "other"]
+
+            for ent in ents:
+                entity_text = ent.text.strip()
+
+                if not entity_text:
                     continue
 
-                for r in rects:
-                    page.draw_rect(r, fill=(0,0,0), overlay=True)
+                if entity_text.casefold() not in group:
+                    group[entity_text.casefold()] = (len(candidates), replace, entity_text)
 
+                priority, *_ = group[entity_text.casefold()]
+                candidates.append( (priority, ent.start_char, ent.end_char, replace) )
 
-    def get_texts_to_redact(self, honorifics_pattern: str, text: str, *, redact_now: bool = False) -> list[str] | str:
-        texts_to_redact = []
-        content = text
-        nlp_doc = self.__nlp(text)
+        for name, group in mentions.items():
+            if group:
+                honorific = honorifics_pattern if name == "name" else None
+                candidates.extend(self.__find_mentions(text, group, honorific))
 
-        for label, replace in self.__nlp_patterns:
-            entities = [ ent.text for ent in nlp_doc.ents if ent.label_ == label ] if not label=="DATE" else self.process_dates(nlp_doc)
-            
-            print(label, entities)
-            for entity_text in entities:
-                entity_text = entity_text.strip()
-
-                # If entities is a list of names, additional get their honorifics version
-                if label == "PERSON":
-                    flags = re.M | re.IGNORECASE
-                    honor_pattern = rf"\b{honorifics_pattern}\.?\s*{re.escape(entity_text)}\b"
-                    
-                    if redact_now:
-                        content = re.sub(honor_pattern, replace, content, flags=flags)
-                    else:
-                        honor_matches = re.findall(honor_pattern, text, flags=re.M | re.IGNORECASE)
-                        texts_to_redact.extend(honor_matches)
-
-                
-                if redact_now:
-                    content = re.sub(rf"\b{re.escape(entity_text)}\b", replace, content, flags=re.M | re.IGNORECASE)
+        spans = SpanSet()
+        for _, start, end, replace in sorted(candidates):
+            spans.add( Span(start, end, replace) )
+
+        # Go over the redacted content and redact birth year associated with names
+        years = []
+        for cm in BIRTH_YEAR.finditer(apply_spans(text, spans)):
+            if cm.lastindex and cm.group(cm.lastindex) not in years:
+                years.append(cm.group(cm.lastindex))
+
+        if years:
+            for matched in re.finditer("|".join(years), text, flags=re.M):
+                spans.add( Span(matched.start(), matched.end(), "[DATE]") )
+
+        return list(spans)
+
+
+    def __find_mentions(self, text: str, mentions: dict[str, tuple[int, str, str]], honorifics_pattern: str | None) -> list[tuple[int, int, int, str]]:
+        """
+        Finds every mention of the given entity texts in one scan over `text`.
+
+        Parameters:
+            text:               The text to search
+            mentions:           Case-folded entity text -> (priority, replacement, entity text)
+            honorifics_pattern: Regex of honorifics allowed in front of the mentions, if any
+
+        Returns:
+            candidates:         (priority, start, end, replacement) of every mention
+        """
+        entries = sorted(mentions.values())
+        honorific = rf"(?:{honorifics_pattern}\.?\s*)?" if honorifics_pattern else ""
+        alternation = "|".join( re.escape(entity_text) for *_, entity_text in entries )
+        # Compiled per document and kept out of the regex module's cache, the alternation
+        # holds that document's entities so it's rarely seen again
+        pattern = re.compile(rf"\b{honorific}(?P<mention>{alternation})\b", re.M | re.IGNORECASE, cache_pattern=False)
+
+        # Mentions that can start at the same offset are prefixes of one another
+        families = {
+            key: [ entry for other, entry in mentions.items() if other.startswith(key) or key.startswith(other) ]
+            for key in mentions
+        }
+
+        candidates = []
+
+        # Overlapped so every offset reports the highest priority mention starting there
+        # (the bare mention after an honorific is reported at its own offset), the rest
+        # of its family is then checked directly
+        for matched in pattern.finditer(text, overlapped=True):
+            mention_start = matched.start("mention")
+            key = matched.group("mention").casefold()
+
+            for priority, replace, entity_text in families.get(key, entries):
+                end = mention_start + len(entity_text)
+
+                if text[mention_start:end].casefold() != entity_text.casefold() or not BOUNDARY.match(text, end):
                     continue
 
-                texts_to_redact.append(text)
+                candidates.append( (priority, matched.start(), end, replace) )
 
-        # Go over the redacted content and redact birth year associated with names
-        for cm in re.finditer(r"\[NAME\]\s*\((\d{4})\)", content, flags=re.M | re.IGNORECASE):
-            if not cm.lastindex:
-                continue
+        return candidates
+
+
+    def get_texts_to_redact(self, honorifics_pattern: str, text: str, *, redact_now: bool = False, nlp_doc: Doc | None = None) -> list[str] | str:
+        # Reuse the NLP doc if it was already made in a batch
+        if nlp_doc is None:
+            nlp_doc = self.create_nlp_doc(text)
 
-            content = re.sub(cm.group(cm.lastindex), "[DATE]", content, flags=re.M)
-            texts_to_redact.append(cm.group(cm.lastindex))
+        spans = self.find_spans(honorifics_pattern, text, nlp_doc)
 
         if redact_now:
-            return content
+            return apply_spans(text, spans)
 
-        return texts_to_redact
+        return [ text[start:end] for start, end, _ in spans ]
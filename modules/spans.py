@@ -0,0 +1,133 @@
+import bisect
+from typing import NamedTuple, Iterable
+
+class Span(NamedTuple):
+    start: int
+    end: int
+    replace: str
+
+
+class SpanSet:
+    """
+    Sorted collection of non-overlapping spans. Spans are accepted
+    first come, first served, so adding them in priority order gives
+    overlapping text to the earlier one. A span partly covered already
+    still has the rest of its text accepted, so nothing a lower priority
+    span matched is ever left unredacted.
+    """
+    def __init__(self):
+        self.__starts: list[int] = []
+        self.__ends: list[int] = []
+        self.__spans: list[Span] = []
+
+    def __len__(self) -> int:
+        return len(self.__spans)
+
+    def __iter__(self):
+        return iter(self.__spans)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        i = bisect.bisect_right(self.__starts, start)
+
+        if i > 0 and self.__ends[i - 1] > start:
+            return True
+
+        return i < len(self.__starts) and self.__starts[i] < end
+
+    def add(self, span: Span) -> list[Span]:
+        """
+        Adds the parts of `span` no accepted span covers yet, each with the
+        span's replacement. When the span was partly covered, its parts join
+        the accepted spans with the same replacement they touch, so a name
+        partly redacted already reads "[NAME]" rather than "[NAME][NAME]".
+
+        Parameters:
+            span:       The span to add
+
+        Returns:
+            added:      The spans the accepted parts ended up in, empty when
+                        the span is empty or already covered entirely
+        """
+        parts = []
+
+        if span.start >= span.end:
+            return parts
+
+        i = bisect.bisect_right(self.__starts, span.start)
+        pos = max(span.start, self.__ends[i - 1]) if i > 0 else span.start
+
+        # Fill every gap between the accepted spans the new one reaches over
+        while pos < span.end:
+            gap_end = min(self.__starts[i], span.end) if i < len(self.__starts) else span.end
+
+            if pos < gap_end:
+                parts.append( Span(pos, gap_end, span.replace) )
+
+            if i == len(self.__starts) or self.__starts[i] >= span.end:
+                break
+
+            pos = max(pos, self.__ends[i])
+            i += 1
+
+        partial = parts != [ span ]
+        added = []
+
+        for part in parts:
+            i = bisect.bisect_right(self.__starts, part.start)
+            self.__starts.insert(i, part.start)
+            self.__ends.insert(i, part.end)
+            self.__spans.insert(i, part)
+
+            if partial:
+                part = self.__merge(i)
+
+            # Parts go left to right, a part can only have joined the one before
+            if added and added[-1].start == part.start:
+                added[-1] = part
+            else:
+                added.append(part)
+
+        return added
+
+    def __merge(self, i: int) -> Span:
+        # Joins the span at `i` with the neighbours it touches that have the same replacement
+        span = self.__spans[i]
+        lo, hi = i, i + 1
+
+        if lo > 0 and self.__ends[lo - 1] == span.start and self.__spans[lo - 1].replace == span.replace:
+            lo -= 1
+
+        if hi < len(self.__spans) and self.__starts[hi] == span.end and self.__spans[hi].replace == span.replace:
+            hi += 1
+
+        merged = Span(self.__starts[lo], self.__ends[hi - 1], span.replace)
+        self.__starts[lo:hi] = [ merged.start ]
+        self.__ends[lo:hi] = [ merged.end ]
+        self.__spans[lo:hi] = [ merged ]
+
+        return merged
+
+
+def apply_spans(text: str, spans: Iterable[Span]) -> str:
+    """
+    Builds the redacted text in a single join by replacing every span
+    with its replacement label.
+
+    Parameters:
+        text:       The original text the spans were found in
+        spans:      Non-overlapping spans sorted by start offset
+
+    Returns:
+        content:    The text with every span replaced
+    """
+    parts = []
+    pos = 0
+
+    for start, end, replace in spans:
+        parts.append(text[pos:start])
+        parts.append(replace)
+        pos = end
+
+    parts.append(text[pos:])
+
+    return "".join(parts)
@@ -0,0 +1,99 @@
+from typing import Callable, Iterable, Iterator, TextIO
+from modules.spans import Span, apply_spans
+
+# Characters read from the input per chunk, kept well under spaCy's
+# default `nlp.max_length` of 1,000,000 characters
+CHUNK_SIZE = 256 * 1024
+
+# Characters of context kept on each side of a chunk boundary
+OVERLAP = 4 * 1024
+
+# Characters of pending text a single span may hold back from being written,
+# a span reaching past them fails the document instead of growing it further
+MAX_PENDING = 16 * CHUNK_SIZE
+
+# Places to cut a chunk at, from most to least preferred
+BOUNDARIES = [ "\n\n", "\n", ". ", " " ]
+
+def read_chunks(file: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Reads a text file `chunk_size` characters at a time.
+    """
+    while chunk := file.read(chunk_size):
+        yield chunk
+
+
+def find_cut(text: str, start: int, end: int) -> int:
+    """
+    Finds where to cut `text` between `start` and `end`, preferring a
+    paragraph break, then a line break, the end of a sentence and finally
+    any space. Falls back to `end` when there's none.
+    """
+    for boundary in BOUNDARIES:
+        i = text.rfind(boundary, start, end)
+
+        if i != -1:
+            return i + len(boundary)
+
+    return end
+
+
+def redact_stream(pieces: Iterable[str], find_spans: Callable[[str], list[Span]], *, overlap: int = OVERLAP, max_pending: int = MAX_PENDING) -> Iterator[str]:
+    """
+    Redacts a stream of text pieces with bounded memory. Pending text is
+    searched together with the last `overlap` characters already written
+    (so look-behinds still see their labels) and is only written up to a
+    paragraph/sentence-aligned cut at least `overlap` characters before
+    its end. The rest is searched again with the next piece, so matches
+    crossing a boundary are still found whole. A cut is never made inside
+    a span, so a span covering more than `max_pending` characters of
+    pending text raises rather than holding all of it in memory.
+
+    Parameters:
+        pieces:         The text to redact, in order
+        find_spans:     Finds the non-overlapping, sorted spans to redact in a text
+        overlap:        Characters of context kept on each side of a cut
+        max_pending:    Characters of pending text a span may hold back at most
+
+    Returns:
+        redacted:   The redacted text, in order
+    """
+    context = ""
+    pending = ""
+    pieces = iter(pieces)
+    done = False
+
+    while not done:
+        piece = next(pieces, None)
+        done = piece is None
+        pending += piece or ""
+
+        # Wait for enough text to be able to cut before the overlap
+        if not done and len(pending) <= overlap:
+            continue
+
+        window = context + pending
+        offset = len(context)
+        spans = find_spans(window)
+        cut = len(window) if done else find_cut(window, offset, len(window) - overlap)
+
+        for span in spans:
+            if span.start < cut < span.end:
+                cut = span.start
+
+        # A span covers all of the pending text, read more before cutting
+        if cut <= offset and not done:
+            if len(pending) > max_pending:
+                raise Exception(f"A single match covers more than {max_pending} characters of the stream, it can't be redacted in chunks")
+
+            continue
+
+        yield apply_spans(window[offset:cut], [
+            # Spans reaching back into already written context are clipped to it
+            Span(max(start, offset) - offset, end - offset, replace)
+            for start, end, replace in spans
+            if end > offset and start < cut
+        ])
+
+        context = window[max(0, cut - overlap):cut]
+        pending = window[cut:]
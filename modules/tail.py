@@ -0,0 +1,201 @@
+from __future__ import annotations
+import json
+import os
+import time
+from typing import TYPE_CHECKING, Callable
+from modules.spans import Span, SpanSet, apply_spans
+from modules import stream
+
+if TYPE_CHECKING:
+    from modules.pii_redactor import PiiRedactor
+
+class TailRedactor:
+    """
+    Redacts a growing text file (e.g. an application log) incrementally.
+    Every run only redacts the complete lines appended since the last one
+    and appends them to the redacted output. A line still being written
+    waits for its newline.
+
+    A checkpoint keeps the byte offsets of the input and output reached so
+    far and is saved after the output is synced. A run interrupted between
+    the two finds more output than the checkpoint accounts for. That
+    output is cut back and redone, so no line is written twice or skipped.
+    The checkpoint holds no text, and the overlap window is read back from
+    the input. If the input is truncated or replaced (rotated), it is redacted
+    again from its start, appended after what's already written. An
+    unfinished last line of the old file is then lost.
+    """
+    def __init__(self, redactor: PiiRedactor, input_path: str, output_path: str, *, checkpoint_path: str | None = None, tier: str | None = None, chunk_size: int = stream.CHUNK_SIZE, overlap: int = stream.OVERLAP):
+        """
+        Parameters:
+            redactor:           The redactor to use
+            input_path:         The text file to follow
+            output_path:        The redacted file to append to
+            checkpoint_path:    JSON checkpoint, `<output_path>.checkpoint.json` by default
+            tier:               NER tier to use instead of the redactor's default
+            chunk_size:         Bytes of complete lines redacted at a time
+            overlap:            Bytes of already redacted input searched again as context,
+                                so patterns crossing from one run into the next still see their labels
+        """
+        if not 0 <= overlap < chunk_size:
+            raise Exception("`overlap` must be smaller than `chunk_size`")
+
+        self.__redactor = redactor
+        self.__input_path = input_path
+        self.__output_path = output_path
+        self.__checkpoint_path = checkpoint_path or f"{output_path}.checkpoint.json"
+        self.__tier = tier
+        self.__chunk_size = chunk_size
+        self.__overlap = overlap
+
+    def get_checkpoint(self) -> dict:
+        """
+        Returns:
+            checkpoint:     Input and output byte offsets reached and the
+                            input's inode, zeros before the first run
+        """
+        try:
+            with open(self.__checkpoint_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return { "input_offset": 0, "output_offset": 0, "inode": None }
+
+    def update(self) -> dict:
+        """
+        Redacts every complete line appended to the input since the last
+        checkpoint.
+
+        Returns:
+            progress:   Bytes of input read and of output written by this
+                        run, and the input offset reached
+        """
+        if not os.path.exists(self.__input_path):
+            raise Exception(f"The input path to follow doesn't exist: {self.__input_path}")
+
+        checkpoint = self.get_checkpoint()
+        stat = os.stat(self.__input_path)
+        progress = { "read": 0, "written": 0 }
+
+        # Truncated or rotated, the new content starts over from its beginning
+        if checkpoint["inode"] is not None and (stat.st_ino != checkpoint["inode"] or stat.st_size < checkpoint["input_offset"]):
+            checkpoint["input_offset"] = 0
+
+        checkpoint["inode"] = stat.st_ino
+
+        with open(self.__input_path, "rb") as input_file, self.__open_output(checkpoint["output_offset"]) as output_file:
+            while (block := self.__read_lines(input_file, checkpoint["input_offset"])) is not None:
+                context = self.__read_context(input_file, checkpoint["input_offset"])
+                redacted = self.__redact(context, block.decode("utf-8")).encode("utf-8")
+
+                output_file.write(redacted)
+                output_file.flush()
+                os.fsync(output_file.fileno())
+
+                checkpoint["input_offset"] += len(block)
+                checkpoint["output_offset"] += len(redacted)
+                self.__save_checkpoint(checkpoint)
+
+                progress["read"] += len(block)
+                progress["written"] += len(redacted)
+
+        # Also records a new inode when nothing was appended yet
+        self.__save_checkpoint(checkpoint)
+
+        return { **progress, "offset": checkpoint["input_offset"] }
+
+    def follow(self, interval: float = 1.0, progress: Callable[[dict], None] | None = None):
+        """
+        Keeps redacting what's appended to the input, checking every
+        `interval` seconds, until interrupted. A missing input is waited for.
+
+        Parameters:
+            interval:   Seconds between checks
+            progress:   Called with the result of every run that read anything
+        """
+        while True:
+            if os.path.exists(self.__input_path):
+                result = self.update()
+
+                if result["read"] and progress is not None:
+                    progress(result)
+
+            time.sleep(interval)
+
+    def __open_output(self, output_offset: int):
+        if not os.path.exists(self.__output_path):
+            if output_offset > 0:
+                raise Exception(f"The redacted output is missing, delete the checkpoint to start over: {self.__checkpoint_path}")
+
+            return open(self.__output_path, "wb")
+
+        output_file = open(self.__output_path, "r+b")
+        size = output_file.seek(0, os.SEEK_END)
+
+        if size < output_offset:
+            output_file.close()
+            raise Exception(f"The redacted output is shorter than its checkpoint, delete the checkpoint to start over: {self.__checkpoint_path}")
+
+        # Output written after the last checkpoint is redone
+        output_file.truncate(output_offset)
+        output_file.seek(output_offset)
+
+        return output_file
+
+    def __read_lines(self, input_file, offset: int) -> bytes | None:
+        """
+        Reads about `chunk_size` bytes from `offset`, cut after the last
+        newline. Returns None when there's no complete line left.
+        """
+        input_file.seek(offset)
+        data = b""
+
+        while block := input_file.read(self.__chunk_size):
+            data += block
+            end = data.rfind(b"\n")
+
+            # A line longer than a chunk is read whole
+            if end != -1:
+                return data[:end + 1]
+
+        return None
+
+    def __read_context(self, input_file, offset: int) -> str:
+        start = max(0, offset - self.__overlap)
+        input_file.seek(start)
+
+        # The window may start inside a multi-byte character
+        return input_file.read(offset - start).decode("utf-8", errors="ignore")
+
+    def __redact(self, context: str, text: str) -> str:
+        # Regex and NER both run on the original text like for DOCX, regex spans win
+        # where they overlap. Spans reaching back into the context are clipped to the new text
+        window = context + text
+        offset = len(context)
+        spans = SpanSet()
+
+        for span in self.__redactor.regex.find_spans(window):
+            spans.add(span)
+
+        spacy = self.__redactor.get_spacy(self.__tier)
+
+        if spacy is not None:
+            honorifics_pattern = self.__redactor.regex.get_honorifics_pattern()
+
+            for span in spacy.find_spans(honorifics_pattern, window, spacy.create_nlp_doc(window)):
+                spans.add(span)
+
+        return apply_spans(text, [
+            Span(max(start, offset) - offset, end - offset, replace)
+            for start, end, replace in spans
+            if end > offset
+        ])
+
+    def __save_checkpoint(self, checkpoint: dict):
+        # Written next to the file then renamed over it, so a crash keeps the old one
+        tmp_path = f"{self.__checkpoint_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(tmp_path, self.__checkpoint_path)
@@ -0,0 +1,143 @@
+from modules.pattern_source import class_end, read_quantifier
+
+def _group_end(pattern: str, i: int) -> int:
+    """
+    Returns the index just past the group opened at `pattern[i]`.
+    """
+    depth = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == "\\":
+            i += 2
+            continue
+
+        if char == "[":
+            i = class_end(pattern, i)
+            continue
+
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+
+            if depth == 0:
+                return i + 1
+
+        i += 1
+
+    raise Exception(f"Unbalanced parenthesis in pattern `{pattern}`")
+
+
+def atoms(pattern: str) -> list[str]:
+    """
+    Splits a regex pattern into its atoms (a character, an escape, a class or
+    a group) each with its quantifier. Capturing groups are made non-capturing
+    so the pattern can be embedded without shifting the caller's groups.
+
+    Parameters:
+        pattern:    The regex pattern source
+
+    Returns:
+        atoms:      The pattern's atoms, joined back they match the same text
+    """
+    result = []
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == "|":
+            # Alternatives at the top level can't be split, the whole pattern is one atom
+            return [ f"(?:{_non_capturing(pattern)})" ]
+
+        if char == "\\":
+            end = i + 2
+            atom = pattern[i:end]
+        elif char == "[":
+            end = class_end(pattern, i)
+            atom = pattern[i:end]
+        elif char == "(":
+            end = _group_end(pattern, i)
+            atom = _non_capturing(pattern[i:end])
+        else:
+            end = i + 1
+            atom = char
+
+        _, i = read_quantifier(pattern, end)
+        result.append(atom + pattern[end:i])
+
+    return result
+
+
+def _non_capturing(pattern: str) -> str:
+    """
+    Rewrites every capturing group of `pattern` as a non-capturing one.
+    """
+    result = []
+    i = 0
+
+    while i < len(pattern):
+        char = pattern[i]
+
+        if char == "\\":
+            result.append(pattern[i:i + 2])
+            i += 2
+        elif char == "[":
+            end = class_end(pattern, i)
+            result.append(pattern[i:end])
+            i = end
+        elif char == "(" and not pattern.startswith("(?", i):
+            result.append("(?:")
+            i += 1
+        else:
+            result.append(char)
+            i += 1
+
+    return "".join(result)
+
+
+def trie_alternation(patterns: list[str]) -> str:
+    """
+    Builds one alternation matching whatever any of `patterns` matches, with
+    the atoms the patterns start with factored out into a trie. Patterns
+    sharing a prefix (or duplicates) are then only tried past the point
+    they differ instead of each from the start.
+
+    Alternatives are tried in order, compile the result with `regex.POSIX`
+    for the longest match at each position instead.
+
+    Parameters:
+        patterns:   The regex patterns to combine
+
+    Returns:
+        pattern:    The combined pattern source, without capturing groups
+    """
+    # Atom -> child node, `None` marks the end of a pattern
+    root = {}
+
+    for pattern in patterns:
+        node = root
+
+        for atom in atoms(pattern):
+            node = node.setdefault(atom, {})
+
+        node[None] = {}
+
+    return _emit(root)
+
+
+def _emit(node: dict) -> str:
+    branches = [ atom + _emit(child) for atom, child in node.items() if atom is not None ]
+
+    if not branches:
+        return ""
+
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    # The patterns ending here make everything after this point optional
+    if None in node:
+        return body + "?" if len(branches) > 1 else f"(?:{body})?"
+
+    return body
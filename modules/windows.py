@@ -0,0 +1,114 @@
+from typing import NamedTuple
+import regex as re
+from modules.stream import find_cut
+
+# Characters of a long text the NER model sees at a time. Far under spaCy's
+# `nlp.max_length`, and short enough that the windows of a batch pad little
+WINDOW_SIZE = 8 * 1024
+
+# Characters of context added on each side of a window, longer than any entity
+WINDOW_OVERLAP = 512
+
+WHITESPACE = re.compile(r"\s+")
+LAST_WHITESPACE = re.compile(r"(?r)\s")
+
+class Window(NamedTuple):
+    # The text the model runs on
+    start: int
+    end: int
+    # The part of it whose entities are kept, the rest is context
+    own_start: int
+    own_end: int
+
+
+class Entity(NamedTuple):
+    """
+    The parts of a spaCy entity the redactors use, with its offsets in the
+    whole text rather than in the window it was found in.
+    """
+    text: str
+    label_: str
+    start_char: int
+    end_char: int
+
+
+class WindowedDoc:
+    """
+    Stands in for the spaCy doc of a text the model ran on in windows. Only
+    the entities are kept, stitched back onto the whole text's offsets, so
+    the windows' docs are freed as soon as they're read.
+    """
+    def __init__(self, ents: list[Entity]):
+        self.ents = tuple(ents)
+
+
+def split_windows(text: str, size: int = WINDOW_SIZE, overlap: int = WINDOW_OVERLAP) -> list[Window]:
+    """
+    Splits a text into windows of at most `size` characters (plus the
+    overlap), cut at a paragraph break, then a line break, the end of a
+    sentence and finally any space like `stream.find_cut()`. Every window
+    also sees up to `overlap` characters on each side, trimmed to whitespace,
+    so an entity crossing a cut is found whole by the window it starts in.
+    A text of at most `size` characters is a single window.
+
+    Parameters:
+        text:       The text to split
+        size:       Characters of text each window owns at most
+        overlap:    Characters of context on each side of a window
+
+    Returns:
+        windows:    The windows in order, whose owned parts cover the text
+    """
+    cuts = [ 0 ]
+
+    # A cut is never made in the first half of a window, so windows stay big
+    while len(text) - cuts[-1] > size:
+        cuts.append(find_cut(text, cuts[-1] + size // 2, cuts[-1] + size))
+
+    cuts.append(len(text))
+    windows = []
+
+    for own_start, own_end in zip(cuts, cuts[1:]):
+        start = max(0, own_start - overlap)
+        end = min(len(text), own_end + overlap)
+
+        # Context starts and ends on whole words where there's whitespace to cut at
+        if start < own_start and (matched := WHITESPACE.search(text, start, own_start)):
+            start = matched.end()
+
+        if own_end < end and (matched := LAST_WHITESPACE.search(text, own_end, end)):
+            end = matched.start()
+
+        windows.append(Window(start, end, own_start, own_end))
+
+    return windows
+
+
+def stitch(window: Window, ents) -> list[Entity]:
+    """
+    Returns:
+        entities:   The window's entities starting in the part of the text it
+                    owns, offset onto the whole text
+    """
+    return [
+        Entity(ent.text, ent.label_, window.start + ent.start_char, window.start + ent.end_char)
+        for ent in ents
+        if window.own_start <= window.start + ent.start_char < window.own_end
+    ]
+
+
+def join_entities(entities: list[Entity]) -> WindowedDoc:
+    """
+    Joins the entities stitched from every window of a text. An entity
+    overlapping one that starts before it (found by the window before,
+    across their cut) is dropped.
+    """
+    ents = []
+
+    for entity in sorted(entities, key=lambda entity: entity.start_char):
+        if ents and entity.start_char < ents[-1].end_char:
+            continue
+
+        ents.append(entity)
+
+    return WindowedDoc(ents)
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import bisect
+from typing import TYPE_CHECKING
+
+# PyMuPDF is only imported once a PDF is actually handled
+if TYPE_CHECKING:
+    from pymupdf import Page, Rect
+
+# Share of a rectangle's height left out at its top and bottom when the text
+# under it is removed, see `redact_rects()`
+REDACT_INSET = 0.25
+
+class WordIndex:
+    """
+    Index of a PDF page's words, built once from `page.get_text("words")`.
+    The words are joined with single spaces into the page text the NLP
+    model and regex patterns run on, and every word remembers its character
+    offsets in that text, so a match's span maps straight back to the
+    rectangles it covers without searching the page again.
+    """
+    def __init__(self, words: list[tuple]):
+        """
+        Parameters:
+            words:  The words of a page as returned by `page.get_text("words")`
+        """
+        from pymupdf import Rect
+
+        self.__starts: list[int] = []
+        self.__ends: list[int] = []
+        self.__rects: list[Rect] = []
+        self.__lines: list[tuple[int, int]] = []
+
+        texts = []
+        pos = 0
+
+        for x0, y0, x1, y1, text, block, line, *_ in words:
+            texts.append(text)
+            self.__starts.append(pos)
+            self.__ends.append(pos + len(text))
+            self.__rects.append( Rect(x0, y0, x1, y1) )
+            self.__lines.append( (block, line) )
+
+            pos += len(text) + 1
+
+        self.__text = " ".join(texts)
+
+    def __len__(self) -> int:
+        return len(self.__rects)
+
+    def get_text(self) -> str:
+        return self.__text
+
+    def rects_for(self, start: int, end: int) -> list[Rect]:
+        """
+        Maps a span of the page text to the rectangles of the words it
+        touches. Consecutive words on the same line are merged into one
+        rectangle so the gaps between them are covered too.
+
+        Parameters:
+            start:      Start offset of the span in the page text
+            end:        End offset of the span in the page text
+
+        Returns:
+            rects:      The rectangles to redact, one per line
+        """
+        from pymupdf import Rect
+
+        rects = []
+        line = None
+
+        first = bisect.bisect_right(self.__ends, start)
+        last = bisect.bisect_left(self.__starts, end)
+
+        for i in range(first, last):
+            if self.__lines[i] == line:
+                rects[-1] |= self.__rects[i]
+            else:
+                rects.append( Rect(self.__rects[i]) )
+                line = self.__lines[i]
+
+        return rects
+
+def merge_rects(rects: list[Rect]) -> list[Rect]:
+    """
+    De-duplicates rectangles and merges the ones that overlap or touch on
+    the same line, so regex and NER hits on the same words become one
+    redaction.
+
+    Parameters:
+        rects:      The rectangles of a page, in any order
+
+    Returns:
+        merged:     The merged rectangles, top to bottom and left to right
+    """
+    from pymupdf import Rect
+
+    merged: list[Rect] = []
+
+    for r in sorted( (Rect(r) for r in rects), key=lambda r: (r.y0, r.x0) ):
+        for i in range(len(merged) - 1, -1, -1):
+            m = merged[i]
+
+            # Only the rectangles of the current line can still be merged with
+            if m.y1 <= r.y0:
+                merged.append(r)
+                break
+
+            same_line = min(m.y1, r.y1) - max(m.y0, r.y0) >= min(m.height, r.height) / 2
+
+            if same_line and r.x0 <= m.x1 and m.x0 <= r.x1:
+                merged[i] = m | r
+                break
+        else:
+            merged.append(r)
+
+    return merged
+
+
+def redact_rects(page: Page, rects: list[Rect]):
+    """
+    Truly redacts rectangles of a page: the text under them is removed from
+    the page's content and a black box is left in its place. All of a page's
+    rectangles go in one redaction pass, which rewrites its content once,
+    and the boxes are drawn in one go after it. Images and vector graphics
+    under the rectangles are left alone, the boxes cover them.
+
+    Parameters:
+        page:       The page to redact
+        rects:      The rectangles to redact, merged first with `merge_rects()`
+    """
+    import pymupdf as fitz
+
+    if not rects:
+        return
+
+    rects = merge_rects(rects)
+
+    # Any character whose box touches a redaction is removed, and word boxes
+    # often overlap the lines above and below, so only their inner band is
+    # redacted. The black boxes are drawn at full size afterwards
+    for r in rects:
+        inset_y = r.height * REDACT_INSET
+        page.add_redact_annot(fitz.Rect(r.x0 + 0.5, r.y0 + inset_y, r.x1 - 0.5, r.y1 - inset_y), fill=False, cross_out=False)
+
+    page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+
+    shape = page.new_shape()
+
+    for r in rects:
+        shape.draw_rect(r)
+
+    shape.finish(color=None, fill=(0,0,0))
+    shape.commit(overlay=True)
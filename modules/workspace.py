@@ -0,0 +1,128 @@
+import os
+import shutil
+import threading
+import time
+import uuid
+import regex as re
+
+WORKSPACE_ID = re.compile(r"[0-9a-f]{32}")
+
+class Workspace:
+    """
+    Upload and result folders of one request, both named after its id so
+    concurrent requests (from any worker process) never share files.
+    """
+    def __init__(self, workspace_id: str, upload_root: str, result_root: str):
+        self.id = workspace_id
+        self.upload_path = os.path.join(upload_root, workspace_id)
+        self.result_path = os.path.join(result_root, workspace_id)
+
+        # Job state lives with the results so every worker process can read it.
+        # Uploaded names go through `secure_filename` which never starts them with a dot
+        self.state_path = os.path.join(self.result_path, ".job.json")
+
+    def get_result_files(self) -> list[str]:
+        return [ filename for filename in sorted(os.listdir(self.result_path)) if not filename.startswith(".") ]
+
+
+class WorkspaceStore:
+    """
+    Creates workspaces under the upload and result folders and deletes
+    them once they haven't been touched for `ttl` seconds.
+    """
+    def __init__(self, upload_root: str, result_root: str, *, ttl: float = 3600):
+        """
+        Parameters:
+            upload_root:    Folder the workspaces' upload folders are made in
+            result_root:    Folder the workspaces' result folders are made in
+            ttl:            Seconds since its last change after which a workspace
+                            is deleted, keep it above the job timeout
+        """
+        self.__upload_root = upload_root
+        self.__result_root = result_root
+        self.__ttl = ttl
+        self.__cleanup_thread: threading.Thread | None = None
+
+    def create(self) -> Workspace:
+        workspace = Workspace(uuid.uuid4().hex, self.__upload_root, self.__result_root)
+        os.makedirs(workspace.upload_path)
+        os.makedirs(workspace.result_path)
+
+        return workspace
+
+    def get(self, workspace_id: str) -> Workspace | None:
+        """
+        Returns the workspace with the given id, or None if there's no such
+        workspace (or the id isn't one this store could have made).
+        """
+        if not WORKSPACE_ID.fullmatch(workspace_id):
+            return None
+
+        workspace = Workspace(workspace_id, self.__upload_root, self.__result_root)
+
+        if not os.path.isdir(workspace.result_path):
+            return None
+
+        return workspace
+
+    def remove(self, workspace: Workspace):
+        shutil.rmtree(workspace.upload_path, ignore_errors=True)
+        shutil.rmtree(workspace.result_path, ignore_errors=True)
+
+    def cleanup(self) -> list[str]:
+        """
+        Deletes every workspace that hasn't changed for `ttl` seconds.
+
+        Returns:
+            removed:    Ids of the deleted workspaces
+        """
+        removed = []
+        now = time.time()
+        workspace_ids = set()
+
+        for root in (self.__upload_root, self.__result_root):
+            if os.path.isdir(root):
+                workspace_ids.update( name for name in os.listdir(root) if WORKSPACE_ID.fullmatch(name) )
+
+        for workspace_id in sorted(workspace_ids):
+            workspace = Workspace(workspace_id, self.__upload_root, self.__result_root)
+
+            if now - self.__last_change(workspace) > self.__ttl:
+                self.remove(workspace)
+                removed.append(workspace_id)
+
+        return removed
+
+    def start_cleanup(self, interval: float = 60):
+        """
+        Runs `cleanup()` every `interval` seconds in a daemon thread. Every
+        worker process may run its own, deleting a workspace twice is harmless.
+        """
+        if self.__cleanup_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+
+                try:
+                    self.cleanup()
+                except OSError:
+                    pass
+
+        self.__cleanup_thread = threading.Thread(target=loop, name="workspace-cleanup", daemon=True)
+        self.__cleanup_thread.start()
+
+    def __last_change(self, workspace: Workspace) -> float:
+        last_change = 0
+
+        for path in (workspace.upload_path, workspace.result_path):
+            if not os.path.isdir(path):
+                continue
+
+            last_change = max(last_change, os.path.getmtime(path))
+
+            for entry in os.scandir(path):
+                last_change = max(last_change, entry.stat().st_mtime)
+
+        return last_change
@@ -0,0 +1,73 @@
+import os
+import zipfile
+from typing import Iterator
+
+# Already compressed formats, deflating them again costs CPU for nothing
+STORED_EXTENSIONS = [ ".pdf", ".docx", ".zip", ".png", ".jpg", ".jpeg", ".gif" ]
+
+# Bytes read from each file at a time
+CHUNK_SIZE = 1024 * 1024
+
+class _Sink:
+    """
+    Write-only, non-seekable file object that just collects what the zip
+    writer gives it until the next `drain()`. Without `seek()`, `zipfile`
+    writes sizes and CRCs after each entry's data instead of going back to
+    patch its header.
+    """
+    def __init__(self):
+        self.__chunks: list[bytes] = []
+        self.__position = 0
+
+    def write(self, data) -> int:
+        self.__chunks.append(bytes(data))
+        self.__position += len(data)
+
+        return len(data)
+
+    def tell(self) -> int:
+        return self.__position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.__chunks)
+        self.__chunks = []
+
+        return data
+
+
+def stream_zip(files: list[tuple[str, str]], *, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Builds a zip archive on the fly, yielding its bytes as they're produced
+    so it never has to be held in memory (or on disk) as a whole.
+
+    Parameters:
+        files:      (path, name in the archive) of every file to add
+        chunk_size: Bytes read from each file at a time
+
+    Returns:
+        chunks:     The archive's bytes, in order
+    """
+    sink = _Sink()
+
+    with zipfile.ZipFile(sink, "w") as zf:
+        for path, arcname in files:
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            ext = os.path.splitext(arcname)[1].lower()
+            info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+            with open(path, "rb") as source, zf.open(info, "w") as entry:
+                while data := source.read(chunk_size):
+                    entry.write(data)
+
+                    if chunk := sink.drain():
+                        yield chunk
+
+            if chunk := sink.drain():
+                yield chunk
+
+    # The central directory is written when the archive is closed
+    if chunk := sink.drain():
+        yield chunk
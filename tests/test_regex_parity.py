@@ -0,0 +1,110 @@
+"""
+Differential tests of the span based regex redaction against the
+sequential substitutions it replaced: no character of a text may be left
+unredacted that running every pattern's `sub()` in order redacted.
+
+Run from the repository root:
+    python -m pytest -q tests
+"""
+import random
+import pytest
+import regex as re
+from modules.keywords import required_literals
+from modules.pattern_source import read_quantifier
+from modules.regex import RegexRedactor
+from modules.spans import Span, SpanSet
+
+# Pieces random texts are made of besides the patterns' own label literals
+PIECES = [
+    " ", ": ", "#", "-", ".", "@", "/", "\n", "Mr.", "Dr.", "www.", ".com", "A1234567", "12345", "123-45-6789",
+    "555-123-4567", "john.doe", "handle-1234", "x@y.org", "1990", "07/04/1990", "ABC123DEF",
+]
+
+REDACTOR = RegexRedactor()
+
+def sequential_uncovered(text: str) -> set[int]:
+    """
+    Redacts `text` with every pattern's substitution in turn, keeping track
+    of where each character left came from.
+
+    Returns:
+        offsets:    Offsets of the characters of `text` left unredacted
+    """
+    chars = [ (c, i) for i, c in enumerate(text) ]
+
+    for pattern, replace in REDACTOR.get_compiled_patterns():
+        current = "".join( c for c, _ in chars )
+        result = []
+        pos = 0
+
+        for matched in pattern.finditer(current):
+            result += chars[pos:matched.start()]
+            result += [ (c, None) for c in replace ]
+            pos = matched.end()
+
+        chars = result + chars[pos:]
+
+    return { i for _, i in chars if i is not None }
+
+
+def span_uncovered(text: str) -> set[int]:
+    covered = { i for span in REDACTOR.find_spans(text) for i in range(span.start, span.end) }
+    return set(range(len(text))) - covered
+
+
+def random_texts(seed: int, count: int) -> list[str]:
+    labels = sorted({ literal for pattern, _ in REDACTOR.get_compiled_patterns() for literal in required_literals(pattern.pattern) or [] })
+    rng = random.Random(seed)
+
+    return [
+        "".join( rng.choice(labels) if rng.random() < 0.4 else rng.choice(PIECES) for _ in range(rng.randint(2, 8)) )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "see www.foo.com-@handle-1234 5678",
+    "Provider Code: A1234567",
+    "Release Number Mr.Dr.Fingerprint Number: 12",
+    "Acct: SESSION_TOKENMr.SNAP Case NumberA1234567",
+    "Hash Value\nBuilding NumberAttorney NumberABC123DEFA1234567555-123-4567",
+])
+def test_partly_overlapping_matches(text):
+    assert span_uncovered(text) == sequential_uncovered(text)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_random_texts(seed):
+    for text in random_texts(seed, 300):
+        assert span_uncovered(text) == sequential_uncovered(text), text
+
+
+def test_span_set_fills_gaps():
+    spans = SpanSet()
+    spans.add( Span(2, 4, "[A]") )
+    spans.add( Span(6, 8, "[B]") )
+
+    assert spans.add( Span(0, 10, "[C]") ) == [ Span(0, 2, "[C]"), Span(4, 6, "[C]"), Span(8, 10, "[C]") ]
+    assert spans.add( Span(3, 9, "[D]") ) == []
+    assert list(spans) == [ Span(0, 2, "[C]"), Span(2, 4, "[A]"), Span(4, 6, "[C]"), Span(6, 8, "[B]"), Span(8, 10, "[C]") ]
+
+
+def test_span_set_joins_partly_covered_spans():
+    spans = SpanSet()
+    spans.add( Span(0, 3, "[NAME]") )
+    spans.add( Span(8, 11, "[NAME]") )
+
+    # "Ann" then "Ann Lee" reads "[NAME]", not "[NAME][NAME]"
+    assert spans.add( Span(0, 7, "[NAME]") ) == [ Span(0, 7, "[NAME]") ]
+    assert spans.add( Span(5, 11, "[NAME]") ) == [ Span(0, 11, "[NAME]") ]
+    # Spans that merely touch stay apart, like back to back matches of one pattern
+    assert spans.add( Span(11, 14, "[NAME]") ) == [ Span(11, 14, "[NAME]") ]
+    assert list(spans) == [ Span(0, 11, "[NAME]"), Span(11, 14, "[NAME]") ]
+
+
+@pytest.mark.parametrize("quantifier", [ "{,}", "{,3}", "{2,}", "{2}", "{2}?", "{1,2,3}", "{2,x}", "{a}", "{}" ])
+def test_quantifiers_read_like_the_regex_module(quantifier):
+    pattern = f"x{quantifier}"
+    literal = re.compile(pattern).fullmatch(pattern) is not None
+
+    assert read_quantifier(pattern, 1)[1] == (1 if literal else len(pattern))